@@ -0,0 +1 @@
+"""Offline micro-benchmarks of the crawler."""
@@ -0,0 +1,309 @@
+"""Offline micro-benchmarks of the company extraction and feed payloads.
+
+Every benchmark runs over the synthetic corpus of each company size and reports the
+best and mean time per item over the repeats, as well as the memory allocated per
+item: the peak while the benchmark runs and what is still referenced afterwards,
+e.g. the extracted companies. The Apify API is replaced with the local stand-in in
+``benchmarks.fake_apify``, which the tests use as well, and no request leaves the
+process.
+
+Run e.g.::
+
+    python -m benchmarks.extraction --output .benchmarks/extraction.json
+    python -m benchmarks.extraction --compare .benchmarks/extraction.json
+
+The JSON results of two runs can be compared with ``--compare``, which prints the
+ratio of the times per item of the benchmarks present in both.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fake_apify import FakeApifyClient
+from benchmarks.fixtures import COMPANY_SIZES, corpus, dump_corpus
+from parma_mining.crunchbase.analytics_client import AnalyticsClient
+from parma_mining.crunchbase.apify_runs import ApifyRunManager
+from parma_mining.crunchbase.client import CrunchbaseClient, extract_items
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+from parma_mining.crunchbase.model import RawResponseModel, ResponseModel
+from parma_mining.mining_common import json_codec
+
+# companies of every size in the corpus, the large ones take far longer each
+DEFAULT_COUNTS = {"small": 500, "median": 200, "large": 5}
+ORGANIZATION_URL = "https://www.crunchbase.com/organization/"
+
+
+def make_client(**attributes) -> CrunchbaseClient:
+    """Return a crawler client without persistent caches or network access."""
+    client = CrunchbaseClient()
+    client.discovery_cache = DiscoveryCache(":memory:")
+    client.item_archive = None
+    for name, value in attributes.items():
+        setattr(client, name, value)
+    return client
+
+
+def bench_get_company_details(items: list[dict]) -> Callable[[], list]:
+    """Scrape every company in its own Actor run of the Apify stand-in."""
+    by_url = {
+        ORGANIZATION_URL + item["identifier"]["permalink"]: item for item in items
+    }
+    client = make_client()
+    client.run_manager = ApifyRunManager(
+        FakeApifyClient(
+            lambda run_input: [
+                by_url[url] for url in run_input["scrapeCompanyUrls.urls"]
+            ]
+        )
+    )
+    client.run_manager.poll_interval = 0
+
+    async def scrape():
+        # every round scrapes again instead of serving the company cache
+        return [
+            await client.get_company_details([url], bypass_cache=True) for url in by_url
+        ]
+
+    return lambda: asyncio.run(scrape())
+
+
+def bench_extract_company(items: list[dict], **attributes) -> Callable[[], list]:
+    """Extract the companies one by one."""
+    client = make_client(**attributes)
+    return lambda: [client.extract_company(item) for item in items]
+
+
+def bench_extract_company_lazy_dump(items: list[dict]) -> Callable[[], list]:
+    """Extract lazy views of the companies and dump them as they are fed."""
+    client = make_client(extraction_mode="lazy")
+    return lambda: [client.extract_company(item).model_dump() for item in items]
+
+
+def bench_extract_companies_columnar(items: list[dict]) -> Callable[[], list]:
+    """Extract all companies in a single batch with Polars."""
+    client = make_client(extraction_mode="columnar", columnar_min_items=1)
+    return lambda: client.extract_companies(items)
+
+
+def bench_extract_items(items: list[dict]) -> Callable[[], list]:
+    """Extract the companies like a worker of the extraction pool does."""
+    return lambda: extract_items(items)
+
+
+def bench_updated_model_dump(items: list[dict]) -> Callable[[], list]:
+    """Dump extracted companies to JSON strings."""
+    companies = [
+        company
+        for company in make_client().extract_companies(items)
+        if company is not None
+    ]
+    return lambda: [company.updated_model_dump() for company in companies]
+
+
+def _feed_client() -> tuple[AnalyticsClient, list[int]]:
+    """Return an analytics client recording the size of the bodies it would send."""
+    analytics_client = AnalyticsClient()
+    sent: list[int] = []
+
+    async def send_post_content(token: str, api_endpoint, content: bytes):
+        sent.append(len(content))
+        return {}
+
+    analytics_client.send_post_content = send_post_content  # type: ignore[method-assign]
+    return analytics_client, sent
+
+
+def bench_feed_raw_data(items: list[dict]) -> Callable[[], list]:
+    """Build the feed request bodies of extracted companies."""
+    analytics_client, sent = _feed_client()
+    responses = [
+        ResponseModel(source_name="crunchbase", company_id=str(index), raw_data=company)
+        for index, company in enumerate(make_client().extract_companies(items))
+        if company is not None
+    ]
+
+    async def feed():
+        sent.clear()
+        for response in responses:
+            await analytics_client.feed_raw_data("token", response)
+        return list(sent)
+
+    return lambda: asyncio.run(feed())
+
+
+def bench_feed_raw_data_passthrough(items: list[dict]) -> Callable[[], list]:
+    """Build the feed request bodies of undecoded dataset items."""
+    analytics_client, sent = _feed_client()
+    responses = [
+        RawResponseModel(
+            source_name="crunchbase",
+            company_id=str(index),
+            raw_data=json_codec.encode(item),
+        )
+        for index, item in enumerate(items)
+    ]
+
+    async def feed():
+        sent.clear()
+        for response in responses:
+            await analytics_client.feed_raw_data("token", response)
+        return list(sent)
+
+    return lambda: asyncio.run(feed())
+
+
+BENCHMARKS: dict[str, Callable[[list[dict]], Callable[[], list]]] = {
+    "get_company_details": bench_get_company_details,
+    "extract_company": bench_extract_company,
+    "extract_company_validated": lambda items: bench_extract_company(
+        items, validate_extraction=True
+    ),
+    "extract_company_lazy_dump": bench_extract_company_lazy_dump,
+    "extract_companies_columnar": bench_extract_companies_columnar,
+    "extract_items": bench_extract_items,
+    "updated_model_dump": bench_updated_model_dump,
+    "feed_raw_data": bench_feed_raw_data,
+    "feed_raw_data_passthrough": bench_feed_raw_data_passthrough,
+}
+
+
+def measure(run: Callable[[], list], items: int, repeat: int) -> dict:
+    """Time a benchmark and trace the memory it allocates.
+
+    The benchmark runs once to warm up the caches, ``repeat`` times to be timed and
+    once more with tracemalloc, which slows it down, to measure the allocations.
+    """
+    run()
+    timings = []
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = run()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "items": items,
+        "repeat": len(timings),
+        "best_seconds_per_item": min(timings) / items,
+        "mean_seconds_per_item": sum(timings) / len(timings) / items,
+        "peak_bytes_per_item": (peak - baseline) / items,
+        "retained_bytes_per_item": (retained - baseline) / items,
+    }
+
+
+def run_benchmarks(
+    names: list[str], counts: dict[str, int], repeat: int, seed: int = 0
+) -> list[dict]:
+    """Run the benchmarks over the corpus of every company size."""
+    results = []
+    for size, count in counts.items():
+        items = corpus(count, size, seed)
+        for name in names:
+            result = {
+                "benchmark": name,
+                "size": size,
+                **measure(BENCHMARKS[name](items), count, repeat),
+            }
+            print(
+                f"{name:<28} {size:<7} "
+                f"{result['best_seconds_per_item'] * 1e6:>12.1f} us/item "
+                f"{result['peak_bytes_per_item'] / 1024:>10.1f} KiB peak/item",
+                flush=True,
+            )
+            results.append(result)
+    return results
+
+
+def compare(results: list[dict], baseline: dict) -> list[str]:
+    """Return the ratio of the times per item to those of a baseline run."""
+    previous = {
+        (result["benchmark"], result["size"]): result for result in baseline["results"]
+    }
+    lines = []
+    for result in results:
+        before = previous.get((result["benchmark"], result["size"]))
+        if before is None:
+            continue
+        ratio = result["best_seconds_per_item"] / before["best_seconds_per_item"]
+        lines.append(
+            f"{result['benchmark']:<28} {result['size']:<7} {ratio:>6.2f}x the time"
+        )
+    return lines
+
+
+def main(argv: list[str] | None = None) -> dict:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=sorted(BENCHMARKS),
+        help="only run this benchmark, may be given several times",
+    )
+    parser.add_argument(
+        "--size",
+        action="append",
+        choices=sorted(COMPANY_SIZES),
+        help="only use companies of this size, may be given several times",
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="number of companies of every size instead of the defaults",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument("--dump-corpus", help="write the corpus to this directory")
+    args = parser.parse_args(argv)
+
+    counts = {
+        size: args.count or DEFAULT_COUNTS[size]
+        for size in (args.size or DEFAULT_COUNTS)
+    }
+    if args.dump_corpus:
+        dump_corpus(args.dump_corpus, counts, args.seed)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "json_codec": json_codec.encode.__name__.removeprefix("_encode_"),
+        "counts": counts,
+        "seed": args.seed,
+        "results": run_benchmarks(
+            args.benchmark or list(BENCHMARKS), counts, args.repeat, args.seed
+        ),
+    }
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            print("\n".join(compare(report["results"], json.load(baseline_file))))
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Local stand-in for the Apify API.
+
+It implements the parts of the ApifyClientAsync used by the crawler, keeps every run
+in memory and lets each run report a configurable sequence of statuses. While a run
+has not finished, every status poll makes one more of its dataset items visible.
+"""
+import asyncio
+import json
+from collections.abc import Callable
+from types import SimpleNamespace
+
+
+class FakeRun:
+    """Actor run kept by the stand-in."""
+
+    def __init__(self, run_id: str, items: list[dict], statuses: list[str]):
+        self.id = run_id
+        self.items = items
+        self.statuses = list(statuses)
+        self.aborted = False
+        self.polls = 0
+        # dataset pages being read and the most read at once
+        self.reading = 0
+        self.max_reading = 0
+
+    def status(self) -> str:
+        """Return the current status of the run."""
+        if self.aborted:
+            return "ABORTED"
+        return self.statuses[0]
+
+    def poll(self) -> dict:
+        """Advance the run to its next status and return it."""
+        self.polls += 1
+        if len(self.statuses) > 1:
+            self.statuses.pop(0)
+        return self.as_dict()
+
+    def visible_items(self) -> list[dict]:
+        """Return the dataset items the Actor has pushed so far."""
+        if self.status() in {"SUCCEEDED", "FAILED", "ABORTED"}:
+            return self.items
+        return self.items[: self.polls]
+
+    def as_dict(self) -> dict:
+        """Return the run as returned by the Apify API."""
+        return {
+            "id": self.id,
+            "status": self.status(),
+            "defaultDatasetId": f"dataset-{self.id}",
+        }
+
+
+class FakeApifyClient:
+    """In-memory stand-in of the ApifyClientAsync."""
+
+    def __init__(
+        self,
+        items: list[dict] | Callable[[dict], list[dict]],
+        statuses: list[str] | None = None,
+    ):
+        self.items = items
+        self.statuses = statuses or ["RUNNING", "SUCCEEDED"]
+        self.runs: dict[str, FakeRun] = {}
+        self.run_inputs: list[dict] = []
+
+    def actor(self, actor_id: str) -> "FakeActorClient":
+        """Return the client of an Actor."""
+        return FakeActorClient(self)
+
+    def run(self, run_id: str) -> "FakeRunClient":
+        """Return the client of a run."""
+        return FakeRunClient(self.runs[run_id])
+
+    def dataset(self, dataset_id: str) -> "FakeDatasetClient":
+        """Return the client of the default dataset of a run."""
+        run_id = dataset_id.removeprefix("dataset-")
+        return FakeDatasetClient(self.runs[run_id])
+
+    def in_flight(self) -> int:
+        """Return how many runs have not finished yet."""
+        return sum(
+            run.status() not in {"SUCCEEDED", "FAILED", "ABORTED"}
+            for run in self.runs.values()
+        )
+
+
+class FakeActorClient:
+    """Actor resource client of the stand-in."""
+
+    def __init__(self, apify: FakeApifyClient):
+        self.apify = apify
+
+    async def start(self, run_input: dict) -> dict:
+        """Start a run without waiting for it."""
+        await asyncio.sleep(0)
+        items = self.apify.items
+        run = FakeRun(
+            f"run{len(self.apify.runs)}",
+            items(run_input) if callable(items) else items,
+            self.apify.statuses,
+        )
+        self.apify.runs[run.id] = run
+        self.apify.run_inputs.append(run_input)
+        return run.as_dict()
+
+
+class FakeRunClient:
+    """Run resource client of the stand-in."""
+
+    def __init__(self, run: FakeRun):
+        self.fake_run = run
+
+    async def get(self) -> dict:
+        """Poll the run."""
+        await asyncio.sleep(0)
+        return self.fake_run.poll()
+
+    async def abort(self) -> dict:
+        """Abort the run."""
+        self.fake_run.aborted = True
+        return self.fake_run.as_dict()
+
+
+class FakeDatasetClient:
+    """Dataset resource client of the stand-in."""
+
+    def __init__(self, run: FakeRun):
+        self.fake_run = run
+
+    async def list_items(
+        self,
+        offset: int = 0,
+        limit: int | None = None,
+        fields: list[str] | None = None,
+    ):
+        """Return a page of the items pushed so far, keeping only the fields."""
+        run = self.fake_run
+        run.reading += 1
+        run.max_reading = max(run.max_reading, run.reading)
+        try:
+            await asyncio.sleep(0)
+        finally:
+            run.reading -= 1
+        items = run.visible_items()
+        end = None if limit is None else offset + limit
+        items = items[offset:end]
+        if fields is not None:
+            items = [
+                {key: item[key] for key in fields if key in item} for item in items
+            ]
+        return SimpleNamespace(items=items, offset=offset, limit=limit)
+
+    async def get_items_as_bytes(
+        self,
+        item_format: str = "json",
+        offset: int = 0,
+        limit: int | None = None,
+        fields: list[str] | None = None,
+    ) -> bytes:
+        """Return a page of the items pushed so far as JSON lines."""
+        assert item_format == "jsonl"
+        page = await self.list_items(offset=offset, limit=limit, fields=fields)
+        return b"".join(
+            json.dumps(item, separators=(",", ":")).encode() + b"\n"
+            for item in page.items
+        )
@@ -0,0 +1,194 @@
+"""Synthetic Crunchbase dataset items shaped like the Apify Actor output.
+
+The corpus covers the range of companies the crawler sees: small companies with
+little more than a name, median companies with a few funding rounds and investors,
+and very large companies with thousands of timeline activities. The items are
+generated from a fixed seed, so every run benchmarks the same data.
+"""
+import json
+import random
+from pathlib import Path
+from typing import NamedTuple
+
+
+class CompanySize(NamedTuple):
+    """Number of entries of the list sections of a company."""
+
+    funding_rounds: int
+    investors: int
+    acquisitions: int
+    similar_companies: int
+    employees: int
+    events: int
+    activities: int
+    locations: int
+
+
+COMPANY_SIZES = {
+    "small": CompanySize(0, 0, 0, 2, 1, 0, 3, 1),
+    "median": CompanySize(4, 12, 1, 10, 8, 3, 60, 5),
+    "large": CompanySize(60, 400, 80, 40, 60, 150, 5000, 40),
+}
+
+
+def _identifier(rng: random.Random, kind: str) -> dict:
+    number = rng.randrange(10**6)
+    return {
+        "value": f"{kind.title()} {number}",
+        "permalink": f"{kind}-{number}",
+        "entity_def_id": kind,
+        "uuid": f"{rng.getrandbits(128):032x}",
+    }
+
+
+def _date(rng: random.Random) -> str:
+    return (
+        f"{rng.randint(2000, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    )
+
+
+def _usd(rng: random.Random) -> dict:
+    value = rng.randrange(10**4, 10**9)
+    return {"value": value, "currency": "USD", "value_usd": value}
+
+
+def company_item(index: int, size: str = "median", seed: int = 0) -> dict:
+    """Generate the dataset item of a company of the given size."""
+    rng = random.Random(f"{seed}-{size}-{index}")
+    counts = COMPANY_SIZES[size]
+    small = size == "small"
+    item = {
+        "identifier": {
+            "value": f"Company {index}",
+            "permalink": f"company-{size}-{index}",
+            "entity_def_id": "organization",
+            "uuid": f"{rng.getrandbits(128):032x}",
+        },
+        "short_description": "Builds software for " + " ".join(["data"] * 20),
+        "website": {"value": f"https://company-{index}.example.com"},
+        "ipo_status": "private",
+        "overview_company_fields": {"company_type": "for_profit"},
+        "overview_fields_extended": {
+            "founded_on": {"value": _date(rng), "precision": "day"},
+            "legal_name": f"Company {index} GmbH",
+            "categories": [
+                _identifier(rng, "category") for _ in range(1 if small else 5)
+            ],
+        },
+        "num_employees_enum": "c_00011_00050",
+        "rank_org_company": rng.randrange(10**6),
+        "funding_rounds_list": [
+            {
+                "identifier": _identifier(rng, "funding_round"),
+                "announced_on": _date(rng),
+                "money_raised": _usd(rng),
+                "num_investors": rng.randint(1, 10),
+                "lead_investor_identifiers": [
+                    _identifier(rng, "investor") for _ in range(rng.randint(0, 3))
+                ],
+            }
+            for _ in range(counts.funding_rounds)
+        ],
+        "investors_list": [
+            {
+                "investor_identifier": _identifier(rng, "investor"),
+                "funding_round_identifier": _identifier(rng, "funding_round"),
+                "partner_identifiers": [
+                    _identifier(rng, "person") for _ in range(rng.randint(0, 2))
+                ],
+                "is_lead_investor": rng.randrange(5) == 0,
+            }
+            for _ in range(counts.investors)
+        ],
+        "acquisitions_list": [
+            {
+                "acquiree_identifier": _identifier(rng, "organization"),
+                "identifier": _identifier(rng, "acquisition"),
+                "announced_on": {"value": _date(rng), "precision": "day"},
+            }
+            for _ in range(counts.acquisitions)
+        ],
+        "contact_fields": {"contact_email": f"info@company-{index}.example.com"},
+        "org_similarity_list": [
+            {
+                "source": _identifier(rng, "organization"),
+                "source_short_description": "A similar company",
+            }
+            for _ in range(counts.similar_companies)
+        ],
+        "company_overview_highlights": {
+            "num_org_similarities": counts.similar_companies
+        },
+        "current_employees_featured_order_field": [
+            {
+                "person_identifier": _identifier(rng, "person"),
+                "title": "Engineer",
+                "started_on": {"value": _date(rng), "precision": "day"},
+            }
+            for _ in range(counts.employees)
+        ],
+        "event_appearances_list": [
+            {"identifier": _identifier(rng, "event")} for _ in range(counts.events)
+        ],
+        "event_appearances_summary": {"num_event_appearances": counts.events},
+        "overview_timeline": {
+            "count": counts.activities,
+            "entities": [
+                {
+                    "properties": {
+                        "identifier": _identifier(rng, "press_reference"),
+                        "activity_date": _date(rng),
+                        "activity_properties": {
+                            "author": f"Author {rng.randrange(1000)}",
+                            "publisher": "News",
+                            "url": {"value": f"https://news.example.com/{number}"},
+                            "title": "Company raises money " * 3,
+                        },
+                    }
+                }
+                for number in range(counts.activities)
+            ],
+        },
+        "semrush_location_list": [
+            {
+                "rank": rank,
+                "visits_pct": rng.random(),
+                "location_identifiers": [_identifier(rng, "location")],
+            }
+            for rank in range(counts.locations)
+        ],
+    }
+    if not small:
+        item |= {
+            "funding_total": _usd(rng),
+            "last_funding_type": "series_a",
+            "funding_rounds_summary": {
+                "last_funding_at": _date(rng),
+                "num_funding_rounds": counts.funding_rounds,
+            },
+            "investors_summary": {"num_investors": counts.investors},
+            "technology_highlights": {"builtwith_num_technologies_used": 25},
+            "apptopia_summary": {"apptopia_total_apps": 2},
+            "people_highlights": {"num_current_positions": counts.employees},
+            "ipqwery_summary": {"ipqwery_num_patent_granted": 3},
+            "semrush_summary": {"semrush_global_rank": rng.randrange(10**6)},
+            "semrush_rank_headline": {"semrush_visits_mom_pct": rng.random()},
+            "growth_insight_description": {"growth_insight_description": "Growing"},
+            "siftery_summary": {"siftery_num_products": 4},
+        }
+    return item
+
+
+def corpus(count: int, size: str, seed: int = 0) -> list[dict]:
+    """Generate the dataset items of count companies of the given size."""
+    return [company_item(index, size, seed) for index in range(count)]
+
+
+def dump_corpus(directory: str, counts: dict[str, int], seed: int = 0):
+    """Write the corpus of every size as a JSONL file, e.g. to inspect it."""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for size, count in counts.items():
+        with open(path / f"{size}.jsonl", "w", encoding="utf-8") as corpus_file:
+            for item in corpus(count, size, seed):
+                corpus_file.write(json.dumps(item) + "\n")
@@ -2,15 +2,22 @@
 
 AnalyticsClient class is used to send data to the analytics service.
 """
+import asyncio
+import copy
+import importlib.util
 import json
 import logging
 import os
 import urllib.parse
+from typing import Any
 
 import httpx
 from dotenv import load_dotenv
 
-from parma_mining.crunchbase.model import ResponseModel
+from parma_mining.crunchbase.extraction import CRAWL_PROFILES
+from parma_mining.crunchbase.measurement_registry import MeasurementRegistry
+from parma_mining.crunchbase.model import RawResponseModel, ResponseModel
+from parma_mining.mining_common import json_codec
 from parma_mining.mining_common.const import HTTP_200, HTTP_201
 from parma_mining.mining_common.exceptions import AnalyticsError
 
@@ -24,17 +31,119 @@ class AnalyticsClient:
     analytics_base = str(os.getenv("ANALYTICS_BASE_URL") or "")
 
     measurement_url = urllib.parse.urljoin(analytics_base, "/source-measurement")
+    measurement_bulk_url = urllib.parse.urljoin(
+        analytics_base, "/source-measurement/bulk"
+    )
     feed_raw_url = urllib.parse.urljoin(analytics_base, "/feed-raw-data")
     crawling_finished_url = urllib.parse.urljoin(analytics_base, "/crawling-finished")
 
-    def send_post_request(self, token: str, api_endpoint, data):
+    # connection pool of the long-lived http client
+    max_connections = int(os.getenv("ANALYTICS_MAX_CONNECTIONS") or 20)
+    max_keepalive_connections = int(
+        os.getenv("ANALYTICS_MAX_KEEPALIVE_CONNECTIONS") or 10
+    )
+    keepalive_expiry = float(os.getenv("ANALYTICS_KEEPALIVE_EXPIRY") or 60)
+    http2 = str(os.getenv("ANALYTICS_HTTP2") or "false").lower() == "true"
+    connect_timeout = float(os.getenv("ANALYTICS_CONNECT_TIMEOUT") or 10)
+    read_timeout = float(os.getenv("ANALYTICS_READ_TIMEOUT") or 120)
+    # measurements registered at once, and whether a whole level of the map is
+    # registered in a single request to a backend supporting it
+    registration_concurrency = int(os.getenv("ANALYTICS_REGISTRATION_CONCURRENCY") or 8)
+    bulk_registration = (
+        str(os.getenv("ANALYTICS_BULK_REGISTRATION") or "false").lower() == "true"
+    )
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        self._transport = transport
+        self._http_client: httpx.AsyncClient | None = None
+        self._stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "tcp_connects": 0,
+            "tls_handshakes": 0,
+        }
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Return the pooled http client, opening it on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self.open()
+        return self._http_client  # type: ignore[return-value]
+
+    def open(self):
+        """Open the pooled keep-alive http client used for all requests.
+
+        Does nothing while the client is open already.
+        """
+        if self._http_client is not None and not self._http_client.is_closed:
+            return
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("ANALYTICS_HTTP2 requires the h2 package, using HTTP/1.1")
+            http2 = False
+        self._http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            transport=self._transport,
+        )
+
+    async def aclose(self):
+        """Close the pooled http client and all of its connections."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def _trace(self, event_name: str, info: dict):
+        """Count the handshakes done by the transport for the pool statistics."""
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["tcp_connects"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self._stats["tls_handshakes"] += 1
+
+    def pool_stats(self) -> dict:
+        """Return the configured limits and usage statistics of the connection pool.
+
+        The requests in flight are the ones currently holding or waiting for one of
+        the ``max_connections`` connections.
+        """
+        return {
+            **self._stats,
+            "open": self._http_client is not None,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+        }
+
+    async def send_post_request(self, token: str, api_endpoint, data):
         """Send a POST request to the given API endpoint with the given data."""
+        return await self.send_post_content(
+            token, api_endpoint, json_codec.encode(data)
+        )
+
+    async def send_post_content(self, token: str, api_endpoint, content: bytes):
+        """Send a POST request with an already JSON encoded body."""
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
         }
 
-        response = httpx.post(api_endpoint, json=data, headers=headers, timeout=120)
+        self._stats["requests"] += 1
+        self._stats["in_flight"] += 1
+        try:
+            response = await self.http_client.post(
+                api_endpoint,
+                content=content,
+                headers=headers,
+                extensions={"trace": self._trace},
+            )
+        finally:
+            self._stats["in_flight"] -= 1
 
         if response.status_code in [HTTP_200, HTTP_201]:
             return response.json()
@@ -48,60 +157,260 @@ class AnalyticsClient:
                 f"response: {response.text}"
             )
 
-    def register_measurements(
-        self, token: str, mapping, parent_id=None, source_module_id=None
+    async def register_measurements(
+        self,
+        token: str,
+        mapping,
+        parent_id=None,
+        source_module_id=None,
+        registry: MeasurementRegistry | None = None,
     ):
-        """Register the given mapping as a measurement."""
-        result = []
+        """Register the given mapping as a measurement.
+
+        The given mapping is left untouched, the ids of the measurements are added to
+        a copy of it. With a registry, measurements registered before for the source
+        module with the same type, name and parent are not sent again, and a map that
+        was registered unchanged is served without any request.
+
+        Sibling measurements are registered concurrently, bounded by
+        ``ANALYTICS_REGISTRATION_CONCURRENCY``, and the children of a measurement as
+        soon as its id is known, so the latency grows with the depth of the map
+        rather than its size. With ``ANALYTICS_BULK_REGISTRATION`` every level of the
+        map is registered in a single request instead. The result is the same as
+        registering the measurements one after another.
 
-        for field_mapping in mapping["Mappings"]:
+        Returns:
+            The registered measurements and the copy of the mapping with their ids.
+        """
+        mapping = copy.deepcopy(mapping)
+        digest = None
+        if registry is not None and parent_id is None:
+            digest = registry.fingerprint(mapping)
+            registered = registry.get_map(source_module_id, digest)
+            if registered is not None:
+                return registered
+        slots = asyncio.Semaphore(max(self.registration_concurrency, 1))
+
+        def measurement(field_mapping: dict, parent_id) -> dict:
             measurement_data = {
                 "source_module_id": source_module_id,
                 "type": field_mapping["DataType"],
                 "measurement_name": field_mapping["MeasurementName"],
             }
-
             if parent_id is not None:
                 measurement_data["parent_measurement_id"] = parent_id
-            else:
-                logger.debug(
-                    f"No parent id provided for "
-                    f"measurement {measurement_data['measurement_name']}"
+            return measurement_data
+
+        async def register_one(measurement_data: dict, path: tuple[str, ...]):
+            async with slots:
+                return await self._register_measurement(
+                    token, measurement_data, registry, path
+                )
+
+        async def register(field_mapping: dict, parent_id, path: tuple[str, ...]):
+            # measurements are identified by the names of their ancestors
+            path = (*path, field_mapping["MeasurementName"])
+            measurement_id = await register_one(
+                measurement(field_mapping, parent_id), path
+            )
+            field_mapping["source_measurement_id"] = measurement_id
+            await asyncio.gather(
+                *(
+                    register(nested, measurement_id, path)
+                    for nested in field_mapping.get("NestedMappings", [])
                 )
+            )
+
+        async def register_levels(level: list[tuple[dict, Any, tuple[str, ...]]]):
+            while level:
+                paths = [
+                    (*path, field_mapping["MeasurementName"])
+                    for field_mapping, _, path in level
+                ]
+                measurements = [
+                    measurement(field_mapping, parent_id)
+                    for field_mapping, parent_id, _ in level
+                ]
+                try:
+                    ids = await self._register_bulk(
+                        token, measurements, registry, paths
+                    )
+                except AnalyticsError as e:
+                    logger.warning(f"Bulk registration failed, sending one by one: {e}")
+                    ids = await asyncio.gather(
+                        *(
+                            register_one(measurement_data, path)
+                            for measurement_data, path in zip(measurements, paths)
+                        )
+                    )
+                next_level: list[tuple[dict, Any, tuple[str, ...]]] = []
+                for (field_mapping, _, _), measurement_id, path in zip(
+                    level, ids, paths
+                ):
+                    field_mapping["source_measurement_id"] = measurement_id
+                    next_level.extend(
+                        (nested, measurement_id, path)
+                        for nested in field_mapping.get("NestedMappings", [])
+                    )
+                level = next_level
 
-            response = self.send_post_request(
-                token, self.measurement_url, measurement_data
+        if self.bulk_registration:
+            await register_levels(
+                [
+                    (field_mapping, parent_id, ())
+                    for field_mapping in mapping["Mappings"]
+                ]
+            )
+        else:
+            await asyncio.gather(
+                *(
+                    register(field_mapping, parent_id, ())
+                    for field_mapping in mapping["Mappings"]
+                )
             )
-            measurement_data["source_measurement_id"] = response.get("id")
-
-            # add the source measurement id to mapping
-            field_mapping["source_measurement_id"] = measurement_data[
-                "source_measurement_id"
-            ]
-
-            if "NestedMappings" in field_mapping:
-                nested_measurements = self.register_measurements(
-                    token,
-                    {"Mappings": field_mapping["NestedMappings"]},
-                    parent_id=measurement_data["source_measurement_id"],
-                    source_module_id=source_module_id,
-                )[0]
-                result.extend(nested_measurements)
-            result.append(measurement_data)
+
+        def collect(mappings: list[dict], parent_id) -> list[dict]:
+            # the measurements in the order of a depth-first registration
+            result = []
+            for field_mapping in mappings:
+                measurement_data = measurement(field_mapping, parent_id)
+                if parent_id is None:
+                    logger.debug(
+                        f"No parent id provided for "
+                        f"measurement {measurement_data['measurement_name']}"
+                    )
+                measurement_id = field_mapping["source_measurement_id"]
+                measurement_data["source_measurement_id"] = measurement_id
+                if "NestedMappings" in field_mapping:
+                    result.extend(
+                        collect(field_mapping["NestedMappings"], measurement_id)
+                    )
+                result.append(measurement_data)
+            return result
+
+        result = collect(mapping["Mappings"], parent_id)
+        if registry is not None and digest is not None:
+            registry.put_map(source_module_id, digest, result, mapping)
         return result, mapping
 
-    def feed_raw_data(self, token: str, input_data: ResponseModel):
-        """Feed the raw data to the analytics service."""
-        organization_json = json.loads(input_data.raw_data.updated_model_dump())
+    async def _register_measurement(
+        self,
+        token: str,
+        measurement_data: dict,
+        registry: MeasurementRegistry | None,
+        path: tuple[str, ...],
+    ):
+        """Return the id of a measurement, registering it unless it is registered."""
+        source_module_id = measurement_data["source_module_id"]
+        key = json.dumps(path)
+        if registry is not None:
+            fingerprint = registry.fingerprint(measurement_data)
+            measurement_id = registry.get(source_module_id, key, fingerprint)
+            if measurement_id is not None:
+                return measurement_id
+        response = await self.send_post_request(
+            token, self.measurement_url, measurement_data
+        )
+        measurement_id = response.get("id")
+        if registry is not None and measurement_id is not None:
+            registry.put(source_module_id, key, fingerprint, measurement_id)
+        return measurement_id
+
+    async def _register_bulk(
+        self,
+        token: str,
+        measurements: list[dict],
+        registry: MeasurementRegistry | None,
+        paths: list[tuple[str, ...]],
+    ) -> list:
+        """Return the ids of measurements, registering the missing ones at once.
 
+        Raises:
+            AnalyticsError: If the bulk request failed or did not return every id.
+        """
+        ids: list = [None] * len(measurements)
+        fingerprints = {}
+        if registry is not None:
+            for index, (measurement_data, path) in enumerate(zip(measurements, paths)):
+                fingerprints[index] = registry.fingerprint(measurement_data)
+                ids[index] = registry.get(
+                    measurement_data["source_module_id"],
+                    json.dumps(path),
+                    fingerprints[index],
+                )
+        missing = [
+            index for index, measurement_id in enumerate(ids) if measurement_id is None
+        ]
+        if not missing:
+            return ids
+        response = await self.send_post_request(
+            token,
+            self.measurement_bulk_url,
+            [measurements[index] for index in missing],
+        )
+        if not isinstance(response, list) or len(response) != len(missing):
+            raise AnalyticsError(
+                f"Bulk registration of {len(missing)} measurements returned "
+                f"{response!r}"
+            )
+        for index, entry in zip(missing, response):
+            ids[index] = entry.get("id")
+            if registry is not None and ids[index] is not None:
+                registry.put(
+                    measurements[index]["source_module_id"],
+                    json.dumps(paths[index]),
+                    fingerprints[index],
+                    ids[index],
+                )
+        return ids
+
+    @staticmethod
+    def raw_data(input_data: ResponseModel) -> dict:
+        """Return the dump of the company fed for the fields of its crawl profile."""
+        if input_data.profile == "full":
+            return input_data.raw_data.model_dump()
+        return input_data.raw_data.model_dump(
+            include={field.name for field in CRAWL_PROFILES[input_data.profile]}
+        )
+
+    async def feed_raw_data(
+        self,
+        token: str,
+        input_data: ResponseModel | RawResponseModel,
+        raw_data: dict | None = None,
+    ):
+        """Feed the raw data to the analytics service.
+
+        Args:
+            token: The bearer token of the analytics.
+            input_data: The company to feed.
+            raw_data: The already dumped fields of the company to feed instead.
+        """
+        if isinstance(input_data, RawResponseModel):
+            # the dataset item is spliced into the body without decoding it
+            content = b"".join(
+                (
+                    b'{"source_name":',
+                    json_codec.encode(input_data.source_name),
+                    b',"company_id":',
+                    json_codec.encode(input_data.company_id),
+                    b',"raw_data":',
+                    input_data.raw_data,
+                    b"}",
+                )
+            )
+            return await self.send_post_content(token, self.feed_raw_url, content)
+        # the company is serialized only once, when the request body is encoded
+        if raw_data is None:
+            raw_data = self.raw_data(input_data)
         data = {
             "source_name": input_data.source_name,
             "company_id": input_data.company_id,
-            "raw_data": organization_json,
+            "raw_data": raw_data,
         }
 
-        return self.send_post_request(token, self.feed_raw_url, data)
+        return await self.send_post_request(token, self.feed_raw_url, data)
 
-    def crawling_finished(self, token, data):
+    async def crawling_finished(self, token, data):
         """Notify crawling is finished to the analytics."""
-        return self.send_post_request(token, self.crawling_finished_url, data)
+        return await self.send_post_request(token, self.crawling_finished_url, data)
@@ -1,29 +1,46 @@
 """Main entrypoint for the API routes in of parma-analytics."""
+import asyncio
 import json
 import logging
 import os
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Any
 
 from fastapi import Depends, FastAPI, status
 
 from parma_mining.crunchbase.analytics_client import AnalyticsClient
 from parma_mining.crunchbase.api.dependencies.auth import authenticate
-from parma_mining.crunchbase.client import CrunchbaseClient
+from parma_mining.crunchbase.client import (
+    CrunchbaseClient,
+    extract_permalink,
+    normalize_url,
+)
+from parma_mining.crunchbase.discovery import DiscoveryEngine
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+from parma_mining.crunchbase.feed_queue import FeedQueue
+from parma_mining.crunchbase.measurement_registry import MeasurementRegistry
 from parma_mining.crunchbase.model import (
     CompaniesRequest,
+    CrawlProfileName,
     CrawlingFinishedInputModel,
     DiscoveryRequest,
     ErrorInfoModel,
     FinalDiscoveryResponse,
+    RawResponseModel,
     ResponseModel,
 )
 from parma_mining.crunchbase.normalization_map import CrunchbaseNormalizationMap
+from parma_mining.crunchbase.snapshot_store import SnapshotStore
+from parma_mining.mining_common.const import DISCOVERY_VALIDITY_DAYS
 from parma_mining.mining_common.exceptions import (
-    AnalyticsError,
     ClientInvalidBodyError,
     CrawlingError,
 )
-from parma_mining.mining_common.helper import collect_errors
+from parma_mining.mining_common.helper import chunks, collect_errors
+from parma_mining.mining_common.jwt_handler import JWTHandler
 
 env = os.getenv("DEPLOYMENT_ENV", "local")
 
@@ -37,10 +54,43 @@ else:
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
 crunchbase_client = CrunchbaseClient()
+discovery_engine = DiscoveryEngine(crunchbase_client)
 analytics_client = AnalyticsClient()
 normalization = CrunchbaseNormalizationMap()
+# the snapshots are only persisted if SNAPSHOT_MODE enables the change detection
+snapshot_store = SnapshotStore(":memory:" if SnapshotStore.mode == "off" else None)
+measurement_registry = MeasurementRegistry()
+
+
+def open_stores():
+    """Open the local stores, which are otherwise opened on first use.
+
+    The SQLite stores fall back to memory if CACHE_DIR is not writable, the item
+    archive is disabled instead.
+    """
+    crunchbase_client.discovery_cache.open()
+    snapshot_store.open()
+    measurement_registry.open()
+    if crunchbase_client.item_archive is not None:
+        try:
+            crunchbase_client.item_archive.open()
+        except OSError as e:
+            logger.error(f"Cannot open the item archive, disabling it: {e}")
+            crunchbase_client.item_archive = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keep the stores and the pooled analytics http client open for the app."""
+    open_stores()
+    analytics_client.open()
+    yield
+    await analytics_client.aclose()
+    crunchbase_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/", status_code=status.HTTP_200_OK)
@@ -50,15 +100,45 @@ def root():
     return {"welcome": "at parma-mining-crunchbase"}
 
 
+@app.get("/stats", status_code=status.HTTP_200_OK)
+def stats():
+    """Statistics endpoint for monitoring the outgoing connections and caches."""
+    return {
+        "analytics_http_pool": analytics_client.pool_stats(),
+        "discovery_cache": crunchbase_client.discovery_cache.stats(),
+        "company_cache": crunchbase_client.company_cache.stats(),
+        "apify_runs": crunchbase_client.run_manager.stats(),
+        "snapshot_store": snapshot_store.stats(),
+        "measurement_registry": measurement_registry.stats(),
+        "jwt_cache": JWTHandler.stats(),
+        "item_archive": (
+            crunchbase_client.item_archive.stats()
+            if crunchbase_client.item_archive is not None
+            else None
+        ),
+    }
+
+
 @app.get("/initialize", status_code=status.HTTP_200_OK)
-def initialize(source_id: int, token: str = Depends(authenticate)) -> str:
-    """Initialization endpoint for the API."""
+async def initialize(
+    source_id: int, refresh: bool = False, token: str = Depends(authenticate)
+) -> str:
+    """Initialization endpoint for the API.
+
+    Measurements registered before for the source module are taken from the
+    measurement registry, only new or changed ones are registered at the analytics.
+    With refresh set all measurements are registered again.
+    """
     # init frequency
     time = "monthly"
-    normalization_map = CrunchbaseNormalizationMap().get_normalization_map()
-    # register the measurements to analytics
-    analytics_client.register_measurements(
-        token=token, mapping=normalization_map, source_module_id=source_id
+    if refresh:
+        measurement_registry.clear(source_id)
+    # register the measurements to analytics, the static map is not modified
+    _, normalization_map = await analytics_client.register_measurements(
+        token=token,
+        mapping=CrunchbaseNormalizationMap().get_normalization_map(),
+        source_module_id=source_id,
+        registry=measurement_registry,
     )
 
     # set and return results
@@ -94,69 +174,151 @@ def discover_companies(
         logger.error(msg)
         raise ClientInvalidBodyError(msg)
 
+    # duplicate names are resolved only once, the others concurrently
+    resolved = discovery_engine.discover([company.name for company in request])
     response_data = {}
     for company in request:
         logger.debug(
-            f"Discovering with name: {company.name} for company_id {company.company_id}"
+            f"Discovered name: {company.name} for company_id {company.company_id}"
         )
-        response = crunchbase_client.discover_company(company.name)
-        response_data[company.company_id] = response
+        response_data[company.company_id] = resolved[
+            DiscoveryCache.normalize(company.name)
+        ]
 
+    # cached results are only valid for the remainder of their validity window
     current_date = datetime.now()
-    valid_until = current_date + timedelta(days=180)
+    valid_until = current_date + timedelta(days=DISCOVERY_VALIDITY_DAYS)
+    for query in resolved:
+        expires_at = crunchbase_client.discovery_cache.expires_at(query)
+        if expires_at is not None:
+            valid_until = min(valid_until, expires_at)
 
     return FinalDiscoveryResponse(identifiers=response_data, validity=valid_until)
 
 
+def stream_companies(
+    urls: list[str], profile: CrawlProfileName, bypass_cache: bool
+) -> tuple[
+    AsyncIterator[tuple[str, Any]],
+    Callable[..., ResponseModel | RawResponseModel],
+]:
+    """Return the stream of scraped companies and the model they are fed as.
+
+    With ``PASSTHROUGH_MODE`` set the dataset items are fed as they are, the
+    analytics normalizes them.
+    """
+    if crunchbase_client.passthrough_mode == "off":
+        return (
+            crunchbase_client.stream_companies_details(
+                urls, bypass_cache=bypass_cache, profile=profile
+            ),
+            partial(ResponseModel, profile=profile),
+        )
+    return crunchbase_client.stream_companies_raw(urls, profile), RawResponseModel
+
+
 @app.post(
     "/companies",
     status_code=status.HTTP_200_OK,
 )
-def get_company_info(body: CompaniesRequest, token: str = Depends(authenticate)):
-    """Endpoint to get detailed information about a dict of organizations."""
+async def get_company_info(body: CompaniesRequest, token: str = Depends(authenticate)):
+    """Endpoint to get detailed information about a dict of organizations.
+
+    All valid Crunchbase urls of the task are scraped together in as few Actor runs
+    as possible and the results are mapped back to the companies by permalink. The
+    Actor runs are processed concurrently, bounded by ``APIFY_MAX_CONCURRENT_RUNS``.
+    The datasets are streamed while the runs are going and every scraped company is
+    fed to the analytics through a write-behind queue as soon as it arrives. With
+    ``PASSTHROUGH_MODE`` set the dataset items are fed without extracting them.
+
+    Each company is crawled with the crawl profile given for it in ``profiles``,
+    or else the one of the task, and companies of different profiles are scraped
+    in separate Actor runs.
+    """
     errors: dict[str, ErrorInfoModel] = {}
+    # companies keyed by crawl profile and permalink
+    permalink_companies: dict[tuple[CrawlProfileName, str], list[str]] = {}
+    # url of every permalink, grouped by crawl profile
+    profile_urls: dict[CrawlProfileName, dict[str, str]] = {}
     for company_id, company_data in body.companies.items():
+        profile = body.profiles.get(company_id, body.profile)
         for data_type, handles in company_data.items():
             for handle in handles:
                 if data_type == "urls":
-                    try:
-                        if "crunchbase.com/" in handle:
-                            org_details = crunchbase_client.get_company_details(
-                                [handle]
-                            )
-                        else:
-                            logger.error(f"Not a valid Crunchbase url: {handle}")
-                    except CrawlingError as e:
-                        logger.error(
-                            f"Can't fetch company details from Crunchbase Error: {e}"
-                        )
-                        collect_errors(company_id, errors, e)
+                    permalink = (
+                        extract_permalink(handle)
+                        if "crunchbase.com/" in handle
+                        else None
+                    )
+                    if permalink is None:
+                        msg = f"Not a valid Crunchbase url: {handle}"
+                        logger.error(msg)
+                        collect_errors(company_id, errors, ClientInvalidBodyError(msg))
                         continue
-
-                    data = ResponseModel(
-                        source_name="crunchbase",
-                        company_id=company_id,
-                        raw_data=org_details,
+                    company_ids = permalink_companies.setdefault(
+                        (profile, permalink), []
+                    )
+                    if company_id not in company_ids:
+                        company_ids.append(company_id)
+                    profile_urls.setdefault(profile, {}).setdefault(
+                        permalink, normalize_url(handle)
                     )
-                    # Write data to db via endpoint in analytics backend
-                    try:
-                        analytics_client.feed_raw_data(token, data)
-                    except AnalyticsError as e:
-                        logger.error(
-                            f"Can't send crawling data to the Analytics. Error: {e}"
-                        )
-                        collect_errors(company_id, errors, e)
-
                 else:
                     msg = f"Unsupported type error for {data_type} in {handle}"
                     logger.error(msg)
                     collect_errors(company_id, errors, ClientInvalidBodyError(msg))
 
-    return analytics_client.crawling_finished(
+    run_slots = asyncio.Semaphore(crunchbase_client.max_concurrent_runs)
+
+    async def crawl_batch(
+        profile: CrawlProfileName, batch: list[str], feed_queue: FeedQueue
+    ):
+        scraped: set[str] = set()
+        async with run_slots:
+            urls = [profile_urls[profile][permalink] for permalink in batch]
+            companies, response_model = stream_companies(
+                urls, profile, body.bypass_cache
+            )
+            try:
+                # companies are fed while the Actor run is still going
+                async for permalink, org_details in companies:
+                    scraped.add(permalink)
+                    for company_id in permalink_companies[(profile, permalink)]:
+                        # Write data to db via endpoint in analytics backend
+                        await feed_queue.put(
+                            response_model(
+                                source_name="crunchbase",
+                                company_id=company_id,
+                                raw_data=org_details,
+                            )
+                        )
+            except CrawlingError as e:
+                logger.error(f"Can't fetch company details from Crunchbase Error: {e}")
+                for permalink in batch:
+                    if permalink not in scraped:
+                        for company_id in permalink_companies[(profile, permalink)]:
+                            collect_errors(company_id, errors, e)
+                return
+
+        for permalink in batch:
+            if permalink not in scraped:
+                error = CrawlingError(f"No company details scraped for {permalink}")
+                for company_id in permalink_companies[(profile, permalink)]:
+                    collect_errors(company_id, errors, error)
+
+    # the feed queue is drained completely before crawling_finished is sent
+    async with FeedQueue(analytics_client, token, errors, snapshot_store) as feed_queue:
+        await asyncio.gather(
+            *(
+                crawl_batch(profile, batch, feed_queue)
+                for profile, urls in profile_urls.items()
+                for batch in chunks(list(urls), crunchbase_client.batch_size)
+            )
+        )
+
+    return await analytics_client.crawling_finished(
         token,
-        json.loads(
-            CrawlingFinishedInputModel(
-                task_id=body.task_id, errors=errors
-            ).model_dump_json()
+        CrawlingFinishedInputModel(task_id=body.task_id, errors=errors).model_dump(
+            mode="json"
         ),
     )
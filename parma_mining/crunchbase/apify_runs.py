@@ -0,0 +1,243 @@
+"""Asynchronous management of Apify Actor runs.
+
+Actor runs are started without waiting for them and their status is polled with an
+exponential backoff, so a single worker can keep many runs in flight at once. The
+dataset of a run is either read once the run has succeeded or streamed page by page
+while the run is still going. Datasets that are not growing anymore are downloaded
+several pages at a time.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from dotenv import load_dotenv
+
+from parma_mining.mining_common.exceptions import CrawlingExternalError
+
+logger = logging.getLogger(__name__)
+
+RUN_SUCCEEDED = "SUCCEEDED"
+RUN_TERMINAL_STATUSES = {RUN_SUCCEEDED, "FAILED", "TIMED-OUT", "ABORTED"}
+
+
+class ApifyRunManager:
+    """Start Actor runs and wait for them without blocking the event loop.
+
+    Works with an ``ApifyClientAsync`` or any stand-in offering the same ``actor``,
+    ``run`` and ``dataset`` resource clients.
+    """
+
+    load_dotenv()
+    # first and maximum delay between two status polls of a run in seconds
+    poll_interval = float(os.getenv("APIFY_POLL_INTERVAL") or 2)
+    max_poll_interval = float(os.getenv("APIFY_MAX_POLL_INTERVAL") or 30)
+    # runs not finished after this many seconds are aborted
+    run_timeout = float(os.getenv("APIFY_RUN_TIMEOUT") or 3600)
+    # number of dataset items read at once while streaming a run
+    page_size = int(os.getenv("APIFY_DATASET_PAGE_SIZE") or 10)
+    # dataset_items downloads the dataset of a finished run in pages of this many
+    # items
+    download_page_size = int(os.getenv("APIFY_DATASET_DOWNLOAD_PAGE_SIZE") or 1000)
+    # number of pages fetched at once from datasets that are not growing anymore,
+    # both when downloading and when streaming the rest of a run after it ended
+    parallel_pages = int(os.getenv("APIFY_DATASET_PARALLEL_PAGES") or 4)
+
+    def __init__(self, client):
+        self.client = client
+        self._stats = {"started": 0, "succeeded": 0, "failed": 0, "in_flight": 0}
+
+    async def start(self, actor_id: str, run_input: dict) -> dict:
+        """Start an Actor run and return it without waiting for it to finish."""
+        run = await self.client.actor(actor_id).start(run_input=run_input)
+        self._stats["started"] += 1
+        logger.debug(f"Started Actor run {run['id']}")
+        return run
+
+    async def _refresh(self, run: dict, deadline: float, interval: float) -> dict:
+        """Wait for the poll interval and return the current state of the run.
+
+        Raises:
+            CrawlingExternalError: If the run is aborted for exceeding the timeout.
+        """
+        run_client = self.client.run(run["id"])
+        if time.monotonic() >= deadline:
+            await run_client.abort()
+            raise CrawlingExternalError(
+                f"Actor run {run['id']} did not finish in {self.run_timeout}s"
+            )
+        await asyncio.sleep(interval)
+        return await run_client.get() or run
+
+    def _finished(self, run: dict) -> dict:
+        """Count the finished run and raise if it did not succeed."""
+        if run["status"] != RUN_SUCCEEDED:
+            self._stats["failed"] += 1
+            raise CrawlingExternalError(
+                f"Actor run {run['id']} finished with status {run['status']}"
+            )
+        self._stats["succeeded"] += 1
+        return run
+
+    async def wait_for_finish(self, run: dict) -> dict:
+        """Poll the status of a run with exponential backoff until it finished.
+
+        Raises:
+            CrawlingExternalError: If the run did not succeed or timed out.
+        """
+        deadline = time.monotonic() + self.run_timeout
+        interval = self.poll_interval
+        self._stats["in_flight"] += 1
+        try:
+            while run["status"] not in RUN_TERMINAL_STATUSES:
+                run = await self._refresh(run, deadline, interval)
+                interval = min(interval * 2, self.max_poll_interval)
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._stats["in_flight"] -= 1
+        return self._finished(run)
+
+    async def _download(
+        self,
+        read_page: Callable[[int, int], Awaitable[list]],
+        offset: int,
+        limit: int,
+    ) -> AsyncIterator[list]:
+        """Yield the pages of a dataset that is not growing anymore, in order.
+
+        Up to ``parallel_pages`` consecutive pages of ``limit`` items are requested at
+        once, until a page comes back short.
+        """
+        while True:
+            pages = await asyncio.gather(
+                *(
+                    read_page(offset + index * limit, limit)
+                    for index in range(max(self.parallel_pages, 1))
+                )
+            )
+            for page in pages:
+                if page:
+                    yield page
+                if len(page) < limit:
+                    return
+            offset += len(pages) * limit
+
+    async def _stream(
+        self, run: dict, read_page: Callable[[int, int], Awaitable[list]]
+    ) -> AsyncIterator[list]:
+        """Yield the pages read from the dataset of a run while it is going.
+
+        Only one page of ``page_size`` items is read at a time while the run is going.
+        Once it ended the dataset does not grow anymore and the rest is read with up
+        to ``parallel_pages`` pages of ``page_size`` items in flight.
+        """
+        deadline = time.monotonic() + self.run_timeout
+        interval = self.poll_interval
+        offset = 0
+        self._stats["in_flight"] += 1
+        try:
+            while run["status"] not in RUN_TERMINAL_STATUSES:
+                received = offset
+                while True:
+                    page = await read_page(offset, self.page_size)
+                    offset += len(page)
+                    if page:
+                        yield page
+                    if len(page) < self.page_size:
+                        break
+                if offset > received:
+                    interval = self.poll_interval
+                run = await self._refresh(run, deadline, interval)
+                interval = min(interval * 2, self.max_poll_interval)
+            async for page in self._download(read_page, offset, self.page_size):
+                yield page
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._stats["in_flight"] -= 1
+        self._finished(run)
+
+    def _read_items(
+        self, run: dict, fields: list[str] | None
+    ) -> Callable[[int, int], Awaitable[list[dict]]]:
+        """Return the function reading a page of the dataset items of a run."""
+        dataset = self.client.dataset(run["defaultDatasetId"])
+
+        async def read_page(offset: int, limit: int) -> list[dict]:
+            page = await dataset.list_items(offset=offset, limit=limit, fields=fields)
+            return page.items
+
+        return read_page
+
+    async def stream_pages(
+        self, run: dict, fields: list[str] | None = None
+    ) -> AsyncIterator[list[dict]]:
+        """Yield pages of the dataset items of a run as soon as the Actor pushed them.
+
+        The dataset is read page by page between the status polls, so at most
+        ``page_size`` items are held at once while the run is going, and up to
+        ``parallel_pages`` pages once it ended. The poll
+        interval is reset whenever new items arrived. Items pushed before a run
+        failed are yielded as well.
+
+        Args:
+            run: The Actor run to stream.
+            fields: Only keep these top-level keys of the items.
+
+        Raises:
+            CrawlingExternalError: If the run did not succeed or timed out.
+        """
+        read_page = self._read_items(run, fields)
+
+        async for page in self._stream(run, read_page):
+            yield page
+
+    async def stream_raw_pages(
+        self, run: dict, fields: list[str] | None = None
+    ) -> AsyncIterator[list[bytes]]:
+        """Yield pages of the undecoded dataset items of a run, see ``stream_pages``.
+
+        Every item is the JSON encoded line of the ``jsonl`` dataset export.
+
+        Args:
+            run: The Actor run to stream.
+            fields: Only keep these top-level keys of the items, in this order.
+        """
+        dataset = self.client.dataset(run["defaultDatasetId"])
+
+        async def read_page(offset: int, limit: int) -> list[bytes]:
+            content = await dataset.get_items_as_bytes(
+                item_format="jsonl", offset=offset, limit=limit, fields=fields
+            )
+            return content.splitlines()
+
+        async for page in self._stream(run, read_page):
+            yield page
+
+    async def call(self, actor_id: str, run_input: dict) -> dict:
+        """Start an Actor run and wait until it succeeded."""
+        return await self.wait_for_finish(await self.start(actor_id, run_input))
+
+    async def dataset_items(
+        self, run: dict, fields: list[str] | None = None
+    ) -> list[dict]:
+        """Download all items of the default dataset of a succeeded run.
+
+        Args:
+            run: The succeeded Actor run.
+            fields: Only keep these top-level keys of the items.
+        """
+        items = []
+        async for page in self._download(
+            self._read_items(run, fields), 0, self.download_page_size
+        ):
+            items.extend(page)
+        return items
+
+    def stats(self) -> dict:
+        """Return how many runs were started, succeeded, failed or are in flight."""
+        return dict(self._stats)
@@ -2,32 +2,350 @@
 
 This module communicates with the Apify and Google to discover and scrape
 """
+import asyncio
+import json
 import logging
+import multiprocessing
 import os
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, NamedTuple
+from urllib.parse import urlparse
 
-from apify_client import ApifyClient
+from apify_client import ApifyClientAsync
 from dotenv import load_dotenv
 from googlesearch import search
+from pydantic import BaseModel, PrivateAttr
 
-from parma_mining.crunchbase.model import (
-    AcquireeModel,
-    AcquirerModel,
-    AcquisitionModel,
-    ActivityModel,
-    CompanyModel,
-    DiscoveryResponse,
-    EventModel,
-    FundingRoundModel,
-    InvestorModel,
-    PersonModel,
-    SimilarCompanyModel,
-    WebsiteDataModel,
-)
+from parma_mining.crunchbase.apify_runs import ApifyRunManager
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+from parma_mining.crunchbase.extraction import COMPANY_FIELDS, CRAWL_PROFILES
+from parma_mining.crunchbase.model import CompanyModel, DiscoveryResponse
+from parma_mining.crunchbase.normalization_map import CrunchbaseNormalizationMap
+from parma_mining.mining_common.cache import TTLCache
+from parma_mining.mining_common.columnar import extract_frame
 from parma_mining.mining_common.exceptions import ClientError, CrawlingError
+from parma_mining.mining_common.extraction import (
+    FieldSpec,
+    compile_extractor,
+    compile_field_extractors,
+    source_keys,
+)
+from parma_mining.mining_common.helper import chunks
+from parma_mining.mining_common.item_archive import ItemArchive
+from parma_mining.mining_common.rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+load_dotenv()
+
+ORGANIZATION_PATH = "organization"
+ISO_DATE_FORMAT = "%Y-%m-%d"
+ISO_DATE_LENGTH = len("YYYY-MM-DD")
+# start of the raw dataset items exported with the identifier as their first key
+IDENTIFIER_PREFIX = b'{"identifier":'
+_decoder = json.JSONDecoder()
+# number of distinct date strings kept parsed
+DATE_CACHE_SIZE = int(os.getenv("DATE_CACHE_SIZE") or 4096)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(value: str, date_format: str = ISO_DATE_FORMAT) -> datetime:
+    """Parse a date of the dataset items.
+
+    Dates in the strict ``YYYY-MM-DD`` form take the fast ``fromisoformat`` path,
+    everything else falls back to ``strptime``, so the results are identical to
+    ``datetime.strptime(value, date_format)``. Repeated dates are served from an
+    LRU memo; datetimes are immutable and safe to share.
+    """
+    if (
+        date_format == ISO_DATE_FORMAT
+        and len(value) == ISO_DATE_LENGTH
+        and value.isascii()
+        and value[4] == value[7] == "-"
+        and value[:4].isdigit()
+        and value[5:7].isdigit()
+        and value[8:].isdigit()
+    ):
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, date_format)
+
+
+def parse_dates(
+    values: Iterable[str | None], date_format: str = ISO_DATE_FORMAT
+) -> list[datetime | None]:
+    """Parse a list of dates in one call, keeping missing dates as None.
+
+    Every distinct date is parsed only once.
+    """
+    values = list(values)
+    parsed = {
+        value: parse_date(value, date_format)
+        for value in set(values)
+        if value is not None
+    }
+    return [None if value is None else parsed[value] for value in values]
+
+
+class CompiledProfile(NamedTuple):
+    """Extraction of the company fields scraped by a crawl profile."""
+
+    fields: tuple[FieldSpec, ...]
+    field_names: frozenset[str]
+    # top-level keys of the dataset items the fields are extracted from
+    dataset_fields: list[str]
+    extract_fields: Callable[[dict], dict]
+    # builds the CompanyModel tree directly, our extractor already produces field types
+    construct: Callable[[dict], CompanyModel]
+
+
+def _compile_profile(fields: tuple[FieldSpec, ...]) -> CompiledProfile:
+    """Compile the extraction of the fields of a crawl profile."""
+    converters: dict[str, Callable[..., Any]] = {"parse_date": parse_date}
+    return CompiledProfile(
+        fields=fields,
+        field_names=frozenset(field.name for field in fields),
+        dataset_fields=source_keys(fields),
+        extract_fields=compile_extractor(fields, converters=converters),
+        construct=compile_extractor(fields, converters=converters, model=CompanyModel),
+    )
+
+
+crawl_profiles = {
+    name: _compile_profile(fields) for name, fields in CRAWL_PROFILES.items()
+}
+extract_company_fields = crawl_profiles["full"].extract_fields
+construct_company = crawl_profiles["full"].construct
+# extract a single field of a CompanyModel, or its dump, from a dataset item
+company_field_extractors = compile_field_extractors(
+    COMPANY_FIELDS, converters={"parse_date": parse_date}, model=CompanyModel
+)
+company_field_dumpers = compile_field_extractors(
+    COMPANY_FIELDS, converters={"parse_date": parse_date}, model=CompanyModel, dump=True
+)
+
+
+def _dump_value(value):
+    """Dump a field value like ``model_dump()`` does."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, list):
+        return [_dump_value(element) for element in value]
+    return value
+
+
+# mutable like the CompanyModel, so not hashable either
+class LazyCompanyModel(CompanyModel):  # noqa: PLW1641
+    """CompanyModel view over a raw dataset item.
+
+    Every field is extracted from the item on first access and cached, so consumers
+    only pay for the sections they use. ``model_dump()``, also with ``include``,
+    builds the dump of fields not accessed yet directly from the item without
+    creating their models; all other serialization, comparison and copying
+    materializes the remaining fields first and returns exactly what the
+    CompanyModel would. A materialized view no longer references the item.
+    ResponseModel dumps the company it embeds with its ``model_dump()``, as pydantic
+    serializes nested models from their set fields.
+    """
+
+    _item: dict | None = PrivateAttr()
+
+    @classmethod
+    def from_item(
+        cls, item: dict, fields: frozenset[str] | None = None
+    ) -> "LazyCompanyModel":
+        """Create a view over a dataset item without extracting anything yet.
+
+        Args:
+            item: The dataset item.
+            fields: The fields extracted from the item, all others keep their
+                defaults. All fields of the spec by default.
+        """
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, "__dict__", {})
+        object.__setattr__(
+            instance,
+            "__pydantic_fields_set__",
+            set(company_field_extractors if fields is None else fields),
+        )
+        object.__setattr__(instance, "__pydantic_extra__", None)
+        object.__setattr__(instance, "__pydantic_private__", {"_item": item})
+        return instance
+
+    def __getattr__(self, name: str):
+        """Extract a field on first access."""
+        if name not in CompanyModel.model_fields:
+            private = self.__pydantic_private__ or {}
+            if name in private:
+                return private[name]
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            )
+        extractor = (
+            company_field_extractors.get(name)
+            if name in self.__pydantic_fields_set__
+            else None
+        )
+        value = (
+            extractor(self._item)
+            if extractor is not None and self._item is not None
+            else CompanyModel.model_fields[name].default
+        )
+        self.__dict__[name] = value
+        return value
+
+    def materialize(self) -> "LazyCompanyModel":
+        """Extract all fields not accessed yet."""
+        values = self.__dict__
+        if len(values) < len(CompanyModel.model_fields):
+            object.__setattr__(
+                self,
+                "__dict__",
+                {
+                    name: values[name] if name in values else getattr(self, name)
+                    for name in CompanyModel.model_fields
+                },
+            )
+        self._item = None
+        return self
+
+    def model_dump(self, **kwargs) -> dict:
+        """Dump the company, see ``BaseModel.model_dump``."""
+        include = kwargs.pop("include", None)
+        if kwargs or not isinstance(include, set | frozenset | None):
+            return super(LazyCompanyModel, self.materialize()).model_dump(
+                include=include, **kwargs
+            )
+        item, values = self._item, self.__dict__
+        fields_set = self.__pydantic_fields_set__
+        return {
+            name: _dump_value(values[name])
+            if name in values
+            else company_field_dumpers[name](item)
+            if item is not None and name in company_field_dumpers and name in fields_set
+            else field.default
+            for name, field in CompanyModel.model_fields.items()
+            if include is None or name in include
+        }
+
+    def model_dump_json(self, **kwargs) -> str:
+        """Dump the company to JSON, see ``BaseModel.model_dump_json``."""
+        return super(LazyCompanyModel, self.materialize()).model_dump_json(**kwargs)
+
+    def __eq__(self, other) -> bool:
+        """Compare the fields with those of another company."""
+        if not isinstance(other, CompanyModel):
+            return NotImplemented
+        if isinstance(other, LazyCompanyModel):
+            other.materialize()
+        return self.materialize().__dict__ == other.__dict__
+
+    def __iter__(self):
+        """Iterate over the materialized fields."""
+        return super(LazyCompanyModel, self.materialize()).__iter__()
+
+    def __repr_args__(self):
+        """Represent the materialized fields."""
+        return super(LazyCompanyModel, self.materialize()).__repr_args__()
+
+    def __copy__(self):
+        """Copy the materialized company."""
+        return super(LazyCompanyModel, self.materialize()).__copy__()
+
+    def __deepcopy__(self, memo=None):
+        """Deep copy the materialized company."""
+        return super(LazyCompanyModel, self.materialize()).__deepcopy__(memo)
+
+    def __getstate__(self):
+        """Pickle the materialized company."""
+        return super(LazyCompanyModel, self.materialize()).__getstate__()
+
+
+def passthrough_keys(
+    mappings: list[dict] | None = None,
+    fields: tuple[FieldSpec, ...] = COMPANY_FIELDS,
+) -> list[str]:
+    """Return the top-level keys of the dataset items the normalization map needs.
+
+    The source fields of the map are the CompanyModel fields, which are traced back
+    to the keys of the dataset items through the field spec. The identifier comes
+    first, as it holds the permalink of the item.
+    """
+    if mappings is None:
+        mappings = CrunchbaseNormalizationMap.map_json["Mappings"]
+    source_fields = {mapping["SourceField"] for mapping in mappings}
+    return list(
+        dict.fromkeys(
+            ["identifier"]
+            + source_keys(
+                tuple(field for field in fields if field.name in source_fields)
+            )
+        )
+    )
+
+
+def raw_permalink(line: bytes) -> str:
+    """Return the lowercase permalink of an undecoded dataset item.
+
+    If the identifier is the first key of the item only the identifier is decoded,
+    otherwise the whole item.
+
+    Raises:
+        Exception: If the item has no permalink.
+    """
+    if line.startswith(IDENTIFIER_PREFIX):
+        identifier, _ = _decoder.raw_decode(line.decode(), len(IDENTIFIER_PREFIX))
+    else:
+        identifier = json.loads(line)["identifier"]
+    return str(identifier["permalink"]).lower()
+
+
+def extract_items(
+    items: list[dict], profile: str = "full", validate: bool = False
+) -> list[CompanyModel | None]:
+    """Extract the companies of dataset items row by row.
+
+    Module level so that it can run in the worker processes of the extraction pool,
+    which return the constructed models in the order of the items.
+
+    Returns:
+        The company of every item, or None if it could not be extracted.
+    """
+    compiled = crawl_profiles[profile]
+    companies: list[CompanyModel | None] = []
+    for item in items:
+        try:
+            companies.append(
+                CompanyModel.model_validate(compiled.extract_fields(item))
+                if validate
+                else compiled.construct(item)
+            )
+        except Exception as e:
+            logger.error(f"Error extracting company details: {e}")
+            companies.append(None)
+    return companies
+
+
+def normalize_url(url: str) -> str:
+    """Prefix a url without a scheme with https, e.g. ``crunchbase.com/...``."""
+    return url if "://" in url else f"https://{url}"
+
+
+def extract_permalink(url: str) -> str | None:
+    """Extract the lowercase organization permalink from a Crunchbase url.
+
+    Urls without a scheme are accepted as well. Returns None if the url does not
+    point to a Crunchbase organization.
+    """
+    path = urlparse(normalize_url(url)).path
+    segments = [segment for segment in path.split("/") if segment]
+    if segments[:1] != [ORGANIZATION_PATH] or len(segments) == 1:
+        return None
+    return segments[1].lower()
+
 
 class CrunchbaseClient:
     """Class for fetching data from Crunchbase using Apify and Google search."""
@@ -37,47 +355,120 @@ class CrunchbaseClient:
         load_dotenv()
         self.key = str(os.getenv("APIFY_API_KEY") or "")
         self.actor_id = str(os.getenv("APIFY_ACTOR_ID") or "")
+        # a single Apify client is reused for all runs, APIFY_API_URL allows to
+        # point it to a local stand-in of the Apify API
+        self.run_manager = ApifyRunManager(
+            ApifyClientAsync(
+                self.key,
+                api_url=str(os.getenv("APIFY_API_URL") or "https://api.apify.com"),
+            )
+        )
+        # number of company urls scraped together in a single Actor run
+        self.batch_size = int(os.getenv("APIFY_BATCH_SIZE") or 100)
+        # number of Actor runs a single task may have in flight at once
+        self.max_concurrent_runs = int(os.getenv("APIFY_MAX_CONCURRENT_RUNS") or 4)
+        self.discovery_cache = DiscoveryCache()
+        # google search parameters of the discovery
+        self.search_tld = str(os.getenv("DISCOVERY_SEARCH_TLD") or "co.in")
+        self.search_num = int(os.getenv("DISCOVERY_SEARCH_NUM") or 10)
+        self.search_stop = int(os.getenv("DISCOVERY_SEARCH_STOP") or 5)
+        self.search_pause = float(os.getenv("DISCOVERY_SEARCH_PAUSE") or 5)
+        # searches per minute shared by all concurrent discoveries
+        self.search_rate_limiter = TokenBucket(
+            rate=float(os.getenv("DISCOVERY_SEARCHES_PER_MINUTE") or 30) / 60,
+            capacity=int(os.getenv("DISCOVERY_SEARCH_BURST") or 2),
+        )
+        # "row" extracts item by item, "columnar" extracts large batches with Polars
+        # and "lazy" extracts the fields of a company only when they are used;
+        # streamed dataset pages are gathered into batches of the minimum sizes
+        self.extraction_mode = str(os.getenv("EXTRACTION_MODE") or "row")
+        self.columnar_min_items = int(os.getenv("COLUMNAR_MIN_ITEMS") or 100)
+        self.validate_extraction = (
+            str(os.getenv("EXTRACTION_VALIDATE") or "false").lower() == "true"
+        )
+        # batches of at least EXTRACTION_PROCESS_MIN_ITEMS items are extracted in
+        # chunks by a pool of this many worker processes, 0 extracts in process
+        self.extraction_processes = int(os.getenv("EXTRACTION_PROCESSES") or 0)
+        self.process_min_items = int(os.getenv("EXTRACTION_PROCESS_MIN_ITEMS") or 500)
+        self.process_chunk_size = int(os.getenv("EXTRACTION_PROCESS_CHUNK_SIZE") or 100)
+        self._extraction_pool: ProcessPoolExecutor | None = None
+        # only the keys of the dataset items the extraction reads are downloaded
+        self.project_dataset = (
+            str(os.getenv("APIFY_DATASET_PROJECTION") or "true").lower() == "true"
+        )
+        # "off" feeds extracted companies, "raw" feeds the dataset items as they are
+        # and "pruned" feeds only the parts of the items the normalization map uses
+        self.passthrough_mode = str(os.getenv("PASSTHROUGH_MODE") or "off")
+        # every scraped dataset item is archived for reprocessing it later
+        self.item_archive = (
+            ItemArchive()
+            if str(os.getenv("ITEM_ARCHIVE") or "false").lower() == "true"
+            else None
+        )
+        # extracted companies keyed by their lowercase permalink
+        self.company_cache = TTLCache(
+            max_size=int(os.getenv("COMPANY_CACHE_MAX_SIZE") or 1000),
+            ttl=float(os.getenv("COMPANY_CACHE_TTL_HOURS") or 24) * 3600,
+        )
 
     def discover_company(self, query: str) -> DiscoveryResponse:
         """Discover a company.
 
-        Take name as an input and find its crunchbase url.
+        Take name as an input and find its crunchbase url. Results, including the
+        absence of a Crunchbase profile, are served from the discovery cache.
+        """
+        urls = self.discovery_cache.get(query)
+        if urls is None:
+            try:
+                urls = self._search_urls(query)
+            except Exception as e:
+                msg = f"Error searching organizations for {query}: {e}"
+                logger.error(msg)
+                raise ClientError()
+            self.discovery_cache.put(query, urls)
+        if len(urls) == 0:
+            msg = (
+                f"Error searching organizations for {query}: "
+                "No Crunchbase profile url found with given query"
+            )
+            logger.error(msg)
+            raise ClientError()
+        return DiscoveryResponse.model_validate({"urls": urls})
+
+    def _search_urls(self, query: str) -> list[str]:
+        """Search Google for the Crunchbase organization url of a company.
+
+        The search stops paging as soon as the first organization url is found. All
+        searches share a token bucket so that concurrent discoveries stay below the
+        throttling limits of the search provider.
         """
         search_query = query + " crunchbase"
         preferred_slash_count = 4
         urls = []
-        try:
-            user_agent = (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36"
-            )
-            for search_item in search(
-                search_query,
-                tld="co.in",
-                num=10,
-                stop=5,
-                pause=5,
-                user_agent=user_agent,
+        user_agent = (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36"
+        )
+        self.search_rate_limiter.acquire()
+        for search_item in search(
+            search_query,
+            tld=self.search_tld,
+            num=self.search_num,
+            stop=self.search_stop,
+            pause=self.search_pause,
+            user_agent=user_agent,
+        ):
+            if (
+                search_item.count("/") == preferred_slash_count
+                and "https://www.crunchbase.com/organization/" in search_item
             ):
-                if (
-                    search_item.count("/") == preferred_slash_count
-                    and "https://www.crunchbase.com/organization/" in search_item
-                ):
-                    urls.append(search_item)
-            if len(urls) == 0:
-                raise Exception("No Crunchbase profile url found with given query")
-            return DiscoveryResponse.model_validate({"urls": urls})
-        except Exception as e:
-            msg = f"Error searching organizations for {query}: {e}"
-            logger.error(msg)
-            raise ClientError()
+                urls.append(search_item)
+                break
+        return urls
 
-    def get_company_details(self, urls: list[str]) -> CompanyModel:
-        """Scrape a company for details."""
-        # Initialize the ApifyClient with your API token
-        client = ApifyClient(self.key)
-        # Prepare the Actor input
-        run_input = {
+    def _build_run_input(self, urls: list[str]) -> dict:
+        """Prepare the Actor input for scraping the given company urls."""
+        return {
             "action": "scrapeCompanyUrls",
             "cursor": "",
             "minDelay": 1,
@@ -89,393 +480,393 @@ class CrunchbaseClient:
             },
         }
 
-        # Run the Actor and wait for it to finish
-        try:
-            run = client.actor(self.actor_id).call(run_input=run_input)
-
-            # Get output of the Actor run
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                company = {
-                    "name": item["identifier"]["value"],
-                    "description": item["short_description"]
-                    if "short_description" in item
-                    else None,
-                    "permalink": item["identifier"]["permalink"],
-                    "website": item["website"]["value"] if "website" in item else None,
-                    "ipo_status": item["ipo_status"],
-                    "company_type": item["overview_company_fields"]["company_type"]
-                    if "company_type" in item["overview_company_fields"]
-                    else None,
-                    "founded_on": datetime.strptime(
-                        item["overview_fields_extended"]["founded_on"]["value"],
-                        "%Y-%m-%d",
-                    ),
-                    "legal_name": item["overview_fields_extended"]["legal_name"]
-                    if "legal_name" in item["overview_fields_extended"]
-                    else None,
-                    "num_employees_enum": item["num_employees_enum"],
-                    "rank_org_company": item["rank_org_company"],
-                    "total_funding_usd": item["funding_total"]["value_usd"]
-                    if "value_usd" in item["funding_total"]
-                    else None,
-                    "last_funding_type": item["last_funding_type"],
-                    "last_funding_at": datetime.strptime(
-                        item["funding_rounds_summary"]["last_funding_at"], "%Y-%m-%d"
-                    )
-                    if "last_funding_at" in item["funding_rounds_summary"]
-                    else None,
-                    "num_funding_rounds": item["funding_rounds_summary"][
-                        "num_funding_rounds"
-                    ]
-                    if "num_funding_rounds" in item["funding_rounds_summary"]
-                    else None,
-                    "num_investors": item["investors_summary"]["num_investors"],
-                    "num_technologies": item["technology_highlights"][
-                        "builtwith_num_technologies_used"
-                    ]
-                    if "builtwith_num_technologies_used"
-                    in item["technology_highlights"]
-                    else None,
-                    "apptopia_total_apps": item["apptopia_summary"][
-                        "apptopia_total_apps"
-                    ]
-                    if "apptopia_total_apps" in item["apptopia_summary"]
-                    else None,
-                    "apptopia_total_downloads": item["apptopia_summary"][
-                        "apptopia_total_downloads"
-                    ]
-                    if "apptopia_total_downloads" in item["apptopia_summary"]
-                    else None,
-                    "email": item["contact_fields"]["contact_email"]
-                    if "contact_email" in item["contact_fields"]
-                    else None,
-                    "phone": item["contact_fields"]["phone_number"]
-                    if "phone_number" in item["contact_fields"]
-                    else None,
-                    "num_similar_companies": item["company_overview_highlights"][
-                        "num_org_similarities"
-                    ]
-                    if "num_org_similarities" in item["company_overview_highlights"]
-                    else None,
-                    "num_current_positions": item["people_highlights"][
-                        "num_current_positions"
-                    ]
-                    if "num_current_positions" in item["people_highlights"]
-                    else None,
-                    "num_event_appearances": item["event_appearances_summary"][
-                        "num_event_appearances"
-                    ]
-                    if "num_event_appearances" in item["event_appearances_summary"]
-                    else None,
-                    "num_patents": item["ipqwery_summary"]["ipqwery_num_patent_granted"]
-                    if "ipqwery_num_patent_granted" in item["ipqwery_summary"]
-                    else None,
-                    "num_trademarks": item["ipqwery_summary"][
-                        "ipqwery_num_trademark_registered"
-                    ]
-                    if "ipqwery_num_trademark_registered" in item["ipqwery_summary"]
-                    else None,
-                    "popular_trademark_class": item["ipqwery_summary"][
-                        "ipqwery_popular_trademark_class"
-                    ]
-                    if "ipqwery_popular_trademark_class" in item["ipqwery_summary"]
-                    else None,
-                    "num_activity": item["overview_timeline"]["count"]
-                    if "count" in item["overview_timeline"]
-                    else None,
-                    "semrush_rank": item["semrush_summary"]["semrush_global_rank"]
-                    if "semrush_global_rank" in item["semrush_summary"]
-                    else None,
-                    "semrush_visits_last_month": item["semrush_summary"][
-                        "semrush_visits_latest_month"
-                    ]
-                    if "semrush_visits_latest_month" in item["semrush_summary"]
-                    else None,
-                    "semrush_visits_mom_pct": item["semrush_rank_headline"][
-                        "semrush_visits_mom_pct"
-                    ]
-                    if "semrush_visits_mom_pct" in item["semrush_rank_headline"]
-                    else None,
-                    "siftery_num_products": item["siftery_summary"][
-                        "siftery_num_products"
-                    ]
-                    if "siftery_num_products" in item["siftery_summary"]
-                    else None,
-                }
-
-            # categories
-            company["categories"] = self.extract_categories(item)
-            # funding_rounds
-            company["funding_rounds"] = self.extract_funding_rounds(item)
-            # investors
-            company["investors"] = self.extract_investors(item)
-            # acquirees
-            company["acquirees"] = self.extract_acquirees(item)
-            # acquirers
-            company["acquirer"] = self.extract_acquirers(item)
-            # similar_companies
-            company["similar_companies"] = self.extract_similar_companies(item)
-            # employees
-            company["featured_employees"] = self.extract_featured_employees(item)
-            # events
-            company["events"] = self.extract_events(item)
-            # activities
-            company["activities"] = self.extract_activities(item)
-            # country_data
-            company["country_data"] = self.extract_country_data(item)
-            # growth_insight
-            company["growth_insight"] = self.extract_growth_insight(item)
-
-            return CompanyModel.model_validate(company)
+    async def get_company_details(
+        self, urls: list[str], bypass_cache: bool = False
+    ) -> CompanyModel:
+        """Scrape a company for details.
+
+        A thin wrapper over ``get_companies_details`` for a single company.
+
+        Returns:
+            The company of the first given url that was scraped.
 
+        Raises:
+            CrawlingError: If none of the urls could be scraped.
+        """
+        companies = await self.get_companies_details(urls, bypass_cache=bypass_cache)
+        for url in urls:
+            permalink = extract_permalink(url)
+            if permalink in companies:
+                return companies[permalink]
+        msg = f"Error scraping company details: no company found for {urls}"
+        logger.error(msg)
+        raise CrawlingError(msg)
+
+    def _dataset_fields(self, profile: str) -> list[str] | None:
+        """Return the keys of the dataset items to download for a crawl profile.
+
+        Archived items are downloaded completely, so that fields extracted in the
+        future can be reprocessed from them.
+        """
+        if not self.project_dataset or self.item_archive is not None:
+            return None
+        return crawl_profiles[profile].dataset_fields
+
+    async def get_companies_details(
+        self, urls: list[str], bypass_cache: bool = False, profile: str = "full"
+    ) -> dict[str, CompanyModel]:
+        """Scrape many companies in a single Actor run.
+
+        Companies scraped within the last ``COMPANY_CACHE_TTL_HOURS`` are served from
+        the company cache unless bypass_cache is set; only the remaining urls are
+        scraped. The dataset items are mapped back to the requested urls through
+        their ``identifier.permalink``. Items that cannot be matched or extracted
+        are logged and skipped, so callers should treat missing permalinks as failed.
+        Only the fields of the crawl profile are downloaded and extracted.
+
+        Returns:
+            The scraped companies keyed by their lowercase permalink.
+        """
+        return {
+            permalink: company
+            async for permalink, company in self.stream_companies_details(
+                urls, bypass_cache=bypass_cache, profile=profile
+            )
+        }
+
+    async def stream_companies_details(
+        self, urls: list[str], bypass_cache: bool = False, profile: str = "full"
+    ) -> AsyncIterator[tuple[str, CompanyModel]]:
+        """Scrape many companies in a single Actor run and yield them as they arrive.
+
+        Cached companies are yielded first. The dataset of the run is then read while
+        the Actor is still running and every page is extracted right away, so the
+        first company is available long before the run has finished and only a few
+        items are held in memory at once. Columnar and pool extraction only pay off
+        for large batches, so in these modes the pages are gathered into batches of
+        ``COLUMNAR_MIN_ITEMS`` or ``EXTRACTION_PROCESS_MIN_ITEMS`` items first.
+        Matching and caching work as in ``get_companies_details``.
+
+        Yields:
+            The lowercase permalink and the extracted company.
+
+        Raises:
+            CrawlingError: If the Actor run failed; companies yielded before the
+                failure remain valid.
+        """
+        missing_urls = []
+        for url in urls:
+            permalink = extract_permalink(url)
+            cached = (
+                None
+                if bypass_cache or permalink is None
+                else self.company_cache.get((profile, permalink))
+            )
+            if permalink is None or cached is None:
+                missing_urls.append(url)
+            else:
+                yield permalink, cached
+        if not missing_urls:
+            return
+
+        requested = {extract_permalink(url) for url in missing_urls}
+        batch_size = self._extraction_batch_size()
+        # matched items of the pages read so far that were not extracted yet
+        pending: list[tuple[str, dict]] = []
+        try:
+            run = await self.run_manager.start(
+                self.actor_id, self._build_run_input(missing_urls)
+            )
+            async for page in self.run_manager.stream_pages(
+                run, self._dataset_fields(profile)
+            ):
+                items = self._match_items(page, requested)
+                if self.item_archive is not None:
+                    await asyncio.to_thread(self.item_archive.append, items)
+                pending.extend(items)
+                if len(pending) >= batch_size:
+                    for permalink, company in await self._extract_batch(
+                        pending, profile
+                    ):
+                        yield permalink, company
+                    pending = []
+            for permalink, company in await self._extract_batch(pending, profile):
+                yield permalink, company
         except Exception as e:
             msg = f"Error scraping company details: {e}"
             logger.error(msg)
             raise CrawlingError(msg)
 
-    def extract_categories(self, item: dict) -> list[str]:
-        """Extract categories from the item."""
-        categories = []
-        category_list = item["overview_fields_extended"]["categories"]
-        for category in category_list:
-            categories.append(category["value"])
-        return categories
-
-    def extract_location(self, item: dict) -> dict:
-        """Extract location from the item."""
-        location_identifiers = item["location_identifiers"]
-        locations = {}
-        for location in location_identifiers:
-            locations[location["location_type"]] = location["value"]
-        return locations
-
-    def extract_funding_rounds(self, item: dict) -> list[FundingRoundModel]:
-        """Extract funding rounds from the item."""
-        funding_rounds = []
-        funding_rounds_list = item["funding_rounds_list"]
-        for funding_round in funding_rounds_list:
-            result_funding_round = {
-                "name": funding_round["identifier"]["value"],
-                "permalink": funding_round["identifier"]["permalink"],
-                "announced_on": datetime.strptime(
-                    funding_round["announced_on"], "%Y-%m-%d"
-                ),
-                "money_raised_usd": funding_round["money_raised"]["value_usd"]
-                if "money_raised" in funding_round
-                else None,
-                "num_investors": funding_round["num_investors"],
-                "lead_investors": list[InvestorModel],
-            }
-            lead_investors = []
-            if "lead_investor_identifiers" not in funding_round:
+    def _match_items(
+        self, page: list[dict], requested: set[str | None]
+    ) -> list[tuple[str, dict]]:
+        """Map the dataset items of a page to the requested lowercase permalinks.
+
+        Items without a permalink or of companies that were not requested are
+        logged and skipped.
+        """
+        items = []
+        for item in page:
+            try:
+                permalink = str(item["identifier"]["permalink"]).lower()
+            except Exception as e:
+                logger.error(f"Error extracting company details: {e}")
                 continue
-            for lead_investor in funding_round["lead_investor_identifiers"]:
-                result_lead_investor = {
-                    "name": lead_investor["value"],
-                    "permalink": lead_investor["permalink"],
-                }
-                lead_investors.append(
-                    InvestorModel.model_validate(result_lead_investor)
-                )
-            result_funding_round["lead_investors"] = lead_investors
-            funding_rounds.append(
-                FundingRoundModel.model_validate(result_funding_round)
+            if permalink not in requested:
+                logger.warning(f"Skipping unrequested dataset item {permalink}")
+                continue
+            items.append((permalink, item))
+        return items
+
+    async def _extract_batch(
+        self, items: list[tuple[str, dict]], profile: str
+    ) -> list[tuple[str, CompanyModel]]:
+        """Extract and cache the companies of matched dataset items.
+
+        Returns:
+            The permalink and company of every item that could be extracted.
+        """
+        companies = await self.extract_companies_async(
+            [item for _, item in items], profile
+        )
+        extracted = []
+        for (permalink, _), company in zip(items, companies):
+            if company is None:
+                continue
+            self.company_cache.set((profile, permalink), company)
+            extracted.append((permalink, company))
+        return extracted
+
+    async def stream_companies_raw(
+        self, urls: list[str], profile: str = "full"
+    ) -> AsyncIterator[tuple[str, bytes]]:
+        """Scrape many companies and yield their undecoded dataset items.
+
+        Works like ``stream_companies_details`` without building any models, for
+        analytics backends normalizing the data themselves. The items are neither
+        served from nor stored in the company cache. With ``PASSTHROUGH_MODE=pruned``
+        the Apify API only returns the keys listed by ``passthrough_keys`` for the
+        fields of the crawl profile, unless the items are archived: archived items
+        are downloaded and fed completely.
+
+        Yields:
+            The lowercase permalink and the JSON encoded dataset item.
+
+        Raises:
+            CrawlingError: If the Actor run failed; items yielded before the failure
+                remain valid.
+        """
+        requested = {extract_permalink(url) for url in urls}
+        fields = (
+            passthrough_keys(fields=crawl_profiles[profile].fields)
+            if self.passthrough_mode == "pruned" and self.item_archive is None
+            else None
+        )
+        try:
+            run = await self.run_manager.start(
+                self.actor_id, self._build_run_input(urls)
             )
-        return funding_rounds
-
-    def extract_investors(self, item: dict) -> list[InvestorModel]:
-        """Extract investors from the item."""
-        investors = []
-        investors_list = item["investors_list"]
-        for investor in investors_list:
-            result_investor = {
-                "name": investor["investor_identifier"]["value"],
-                "investment_title": investor["funding_round_identifier"]["value"],
-                "permalink": investor["investor_identifier"]["permalink"],
-                "partners": list[PersonModel],
-            }
-            partners = []
-            if "partner_identifiers" not in investor:
+            async for page in self.run_manager.stream_raw_pages(run, fields):
+                lines = []
+                for line in page:
+                    try:
+                        permalink = raw_permalink(line)
+                    except Exception as e:
+                        logger.error(f"Error extracting company details: {e}")
+                        continue
+                    if permalink not in requested:
+                        logger.warning(f"Skipping unrequested dataset item {permalink}")
+                        continue
+                    lines.append((permalink, line))
+                if self.item_archive is not None:
+                    await asyncio.to_thread(self.item_archive.append, lines)
+                for permalink, line in lines:
+                    yield permalink, line
+        except Exception as e:
+            msg = f"Error scraping company details: {e}"
+            logger.error(msg)
+            raise CrawlingError(msg)
+
+    def replay_companies(
+        self, since: datetime | None = None, profile: str = "full"
+    ) -> Iterator[tuple[str, datetime, CompanyModel]]:
+        """Extract the companies of the archived dataset items again.
+
+        The archive is streamed segment by segment, so e.g. a fixed extractor or a
+        new CompanyModel field can be applied to all past crawls at disk speed.
+        Items that cannot be extracted are logged and skipped.
+
+        Yields:
+            The lowercase permalink, the crawl time and the extracted company.
+
+        Raises:
+            ClientError: If the item archive is not enabled.
+        """
+        if self.item_archive is None:
+            raise ClientError("The item archive is not enabled, set ITEM_ARCHIVE")
+        # the items are extracted in batches, so that the extraction pool is used
+        batch_size = max(self.process_min_items, 1)
+        batch: list[tuple[str, datetime, dict]] = []
+        for entry in self.item_archive.iter_items(since):
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield from self._replay_batch(batch, profile)
+                batch = []
+        yield from self._replay_batch(batch, profile)
+
+    def _replay_batch(
+        self, batch: list[tuple[str, datetime, dict]], profile: str
+    ) -> Iterator[tuple[str, datetime, CompanyModel]]:
+        """Extract a batch of archived items, skipping those that failed."""
+        companies = self.extract_companies([item for _, _, item in batch], profile)
+        for (permalink, crawled_at, _), company in zip(batch, companies):
+            if company is None:
+                logger.error(f"Error extracting archived company {permalink}")
                 continue
-            for partner in investor["partner_identifiers"]:
-                result_partner = {
-                    "name": partner["value"],
-                    "permalink": partner["permalink"],
-                }
-                partners.append(PersonModel.model_validate(result_partner))
-            result_investor["partners"] = partners
-            investors.append(InvestorModel.model_validate(result_investor))
-        return investors
-
-    def extract_acquirers(self, item: dict) -> AcquirerModel | None:
-        """Extract acquirers from the item."""
-        if "acquirer_identifier" not in item["acquired_by_fields"]:
-            return None
-        else:
-            acquirer = {
-                "name": item["acquired_by_fields"]["acquirer_identifier"]["value"],
-                "permalink": item["acquired_by_fields"]["acquirer_identifier"][
-                    "permalink"
-                ],
-            }
-            acquisition = {
-                "title": item["acquired_by_fields"]["acquisition_identifier"]["value"],
-                "permalink": item["acquired_by_fields"]["acquisition_identifier"][
-                    "permalink"
-                ],
-                "date": datetime.strptime(
-                    item["acquired_by_fields"]["acquisition_announced_on"]["value"],
-                    "%Y-%m-%d",
-                )
-                if "acquisition_announced_on" in item["acquired_by_fields"]
-                else None,
-                "price_usd": item["acquired_by_fields"]["acquisition_price"][
-                    "value_usd"
+            yield permalink, crawled_at, company
+
+    def extract_company(self, item: dict, profile: str = "full") -> CompanyModel:
+        """Extract a company from a single dataset item.
+
+        The fields of the crawl profile are read in a single pass by the extractor
+        compiled from the ``COMPANY_FIELDS`` spec; fields missing in the item, or not
+        part of the profile, are left empty. The models are constructed without
+        pydantic validation unless ``EXTRACTION_VALIDATE`` is set; request bodies at
+        the API boundary are always validated. With ``EXTRACTION_MODE=lazy`` a
+        LazyCompanyModel view over the item is returned.
+        """
+        compiled = crawl_profiles[profile]
+        if self.validate_extraction:
+            return CompanyModel.model_validate(compiled.extract_fields(item))
+        if self.extraction_mode == "lazy":
+            return LazyCompanyModel.from_item(item, compiled.field_names)
+        return compiled.construct(item)
+
+    def extract_companies(
+        self, items: list[dict], profile: str = "full"
+    ) -> list[CompanyModel | None]:
+        """Extract the companies of many dataset items.
+
+        With ``EXTRACTION_MODE=columnar`` batches of at least ``COLUMNAR_MIN_ITEMS``
+        items are extracted in vectorized Polars column operations; items the frame
+        cannot represent, or whole batches Polars fails to load, are extracted row
+        by row. Both modes produce the same companies. The frame may widen types,
+        e.g. integers to floats, so its rows are always validated.
+
+        With ``EXTRACTION_PROCESSES`` set, batches of at least
+        ``EXTRACTION_PROCESS_MIN_ITEMS`` items are instead split into chunks of
+        ``EXTRACTION_PROCESS_CHUNK_SIZE`` items that are extracted row by row in the
+        extraction pool; smaller batches and the lazy mode stay in process.
+
+        Returns:
+            The company of every item, or None if it could not be extracted.
+        """
+        if self._use_extraction_pool(items):
+            try:
+                return [
+                    company
+                    for companies in self.extraction_pool.map(
+                        extract_items,
+                        chunks(items, self.process_chunk_size),
+                        repeat(profile),
+                        repeat(self.validate_extraction),
+                    )
+                    for company in companies
                 ]
-                if "acquisition_price" in item["acquired_by_fields"]
-                else None,
-            }
-            acquirer["acquisition"] = AcquisitionModel.model_validate(acquisition)
-            return AcquirerModel.model_validate(acquirer)
-
-    def extract_acquirees(self, item: dict) -> list[AcquireeModel]:
-        """Extract acquirees from the item."""
-        acquirees = []
-        acquirees_list = item["acquisitions_list"]
-        for acquiree in acquirees_list:
-            result_acquiree = {
-                "name": acquiree["acquiree_identifier"]["value"],
-                "permalink": acquiree["acquiree_identifier"]["permalink"],
-                "acquisition": AcquisitionModel,
-            }
-            acquisition = {
-                "title": acquiree["identifier"]["value"],
-                "permalink": acquiree["identifier"]["permalink"],
-                "date": datetime.strptime(
-                    acquiree["announced_on"]["value"], "%Y-%m-%d"
-                ),
-                "price_usd": acquiree["price"]["value_usd"]
-                if "price" in acquiree
-                else None,
-            }
-            result_acquiree["acquisition"] = AcquisitionModel.model_validate(
-                acquisition
-            )
-            acquirees.append(AcquireeModel.model_validate(result_acquiree))
-        return acquirees
-
-    def extract_similar_companies(self, item: dict) -> list[SimilarCompanyModel]:
-        """Extract similar companies from the item."""
-        similar_companies = []
-        similar_companies_list = item["org_similarity_list"]
-        for similar_company in similar_companies_list:
-            result_similar_company = {
-                "name": similar_company["source"]["value"],
-                "permalink": similar_company["source"]["permalink"],
-                "description": similar_company["source_short_description"],
-            }
-            similar_companies.append(
-                SimilarCompanyModel.model_validate(result_similar_company)
-            )
-        return similar_companies
-
-    def extract_featured_employees(self, item: dict) -> list[PersonModel]:
-        """Extract featured employees from the item."""
-        featured_employees = []
-        featured_employees_list = item["current_employees_featured_order_field"]
-        for featured_employee in featured_employees_list:
-            result_featured_employee = {
-                "name": featured_employee["person_identifier"]["value"],
-                "title": featured_employee["title"],
-                "permalink": featured_employee["person_identifier"]["permalink"],
-                "email": featured_employee["email_address"]
-                if "email_address" in featured_employee
-                else None,
-                "start_date": datetime.strptime(
-                    featured_employee["started_on"]["value"], "%Y-%m-%d"
+            except Exception as e:
+                logger.warning(f"Falling back to in-process extraction: {e}")
+        rows: list[dict | None] = [None] * len(items)
+        fallback = [True] * len(items)
+        if self.extraction_mode == "columnar" and len(items) >= self.columnar_min_items:
+            try:
+                extracted, fallback = extract_frame(
+                    crawl_profiles[profile].fields, items
                 )
-                if "started_on" in featured_employee
-                else None,
-            }
-            featured_employees.append(
-                PersonModel.model_validate(result_featured_employee)
-            )
-        return featured_employees
-
-    def extract_events(self, item: dict) -> list[EventModel]:
-        """Extract events from the item."""
-        events = []
-        events_list = item["event_appearances_list"]
-        for event in events_list:
-            result_event = {
-                "name": event["identifier"]["value"],
-                "permalink": event["identifier"]["permalink"],
-                "interaction_type": event["appearance_type"]
-                if "appearance_type" in event
-                else None,
-            }
-            events.append(EventModel.model_validate(result_event))
-        return events
-
-    def extract_activities(self, item: dict) -> list[ActivityModel]:
-        """Extract activities from the item."""
-        activities = []
-        activities_list = item["overview_timeline"]["entities"]
-        for activity in activities_list:
-            result_activity = {
-                "title": activity["properties"]["identifier"]["value"],
-                "activity_type": activity["properties"]["identifier"]["entity_def_id"],
-                "author": activity["properties"]["activity_properties"]["author"]
-                if "activity_properties" in activity["properties"]
-                and "author" in activity["properties"]["activity_properties"]
-                else None,
-                "publisher": activity["properties"]["activity_properties"]["publisher"]
-                if "activity_properties" in activity["properties"]
-                and "publisher" in activity["properties"]["activity_properties"]
-                else None,
-                "date": datetime.strptime(
-                    activity["properties"]["activity_date"], "%Y-%m-%d"
+                rows = list(extracted)
+            except Exception as e:
+                logger.warning(f"Falling back to row extraction of the batch: {e}")
+
+        companies: list[CompanyModel | None] = []
+        for item, row, by_row in zip(items, rows, fallback):
+            try:
+                companies.append(
+                    self.extract_company(item, profile)
+                    if by_row
+                    else CompanyModel.model_validate(row)
                 )
-                if "activity_date" in activity["properties"]
-                else None,
-                "url": activity["properties"]["activity_properties"]["url"]["value"]
-                if "activity_properties" in activity["properties"]
-                and "url" in activity["properties"]["activity_properties"]
-                else None,
-            }
-            activities.append(ActivityModel.model_validate(result_activity))
-        return activities
-
-    def extract_country_data(self, item: dict) -> list[WebsiteDataModel]:
-        """Extract country data from the item."""
-        country_data = []
-        country_data_list = item["semrush_location_list"]
-        for location_stats in country_data_list:
-            result_country_data = {
-                "visits_pct": location_stats["visits_pct"]
-                if "visits_pct" in location_stats
-                else None,
-                "rank_mom_pct": location_stats["rank_mom_pct"]
-                if "rank_mom_pct" in location_stats
-                else None,
-                "rank": location_stats["rank"],
-                "location": location_stats["location_identifiers"][0]["value"]
-                if len(location_stats["location_identifiers"]) > 0
-                else None,
-            }
-            country_data.append(WebsiteDataModel.model_validate(result_country_data))
-        return country_data
-
-    def extract_social_media(self, item: dict) -> dict:
-        """Extract social media from the item."""
-        social_media = {}
-        social_fields = item["social_fields"]
-        for social_field in social_fields:
-            social_media[str(social_field)] = str(social_fields[social_field]["value"])
-        return social_media
-
-    def extract_growth_insight(self, item: dict) -> str | None:
-        """Extract growth insight from the item."""
-        if "growth_insight_description" in item["growth_insight_description"]:
-            return item["growth_insight_description"]["growth_insight_description"]
-        return None
+            except Exception as e:
+                logger.error(f"Error extracting company details: {e}")
+                companies.append(None)
+        return companies
+
+    async def extract_companies_async(
+        self, items: list[dict], profile: str = "full"
+    ) -> list[CompanyModel | None]:
+        """Extract the companies of many dataset items, see ``extract_companies``.
+
+        Batches extracted by the extraction pool do not block the event loop while
+        the worker processes are busy.
+        """
+        if not self._use_extraction_pool(items):
+            return self.extract_companies(items, profile)
+        loop = asyncio.get_running_loop()
+        try:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self.extraction_pool,
+                        extract_items,
+                        chunk,
+                        profile,
+                        self.validate_extraction,
+                    )
+                    for chunk in chunks(items, self.process_chunk_size)
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Falling back to in-process extraction: {e}")
+            return extract_items(items, profile, self.validate_extraction)
+        return [company for companies in results for company in companies]
+
+    def _extraction_batch_size(self) -> int:
+        """Return the number of streamed items to gather before extracting them.
+
+        Row and lazy extraction gain nothing from larger batches, so their pages are
+        extracted one by one.
+        """
+        batch_size = 1
+        if self.extraction_mode == "columnar":
+            batch_size = max(batch_size, self.columnar_min_items)
+        if self.extraction_processes > 0 and self.extraction_mode != "lazy":
+            batch_size = max(batch_size, self.process_min_items)
+        return batch_size
+
+    def _use_extraction_pool(self, items: list[dict]) -> bool:
+        """Whether a batch is large enough to be extracted by the extraction pool."""
+        return (
+            self.extraction_processes > 0
+            and self.extraction_mode != "lazy"
+            and len(items) >= self.process_min_items
+        )
+
+    @property
+    def extraction_pool(self) -> ProcessPoolExecutor:
+        """Return the pool of extraction worker processes, started on first use.
+
+        The workers are spawned rather than forked, so they do not inherit the
+        threads and sockets of the app.
+        """
+        if self._extraction_pool is None:
+            self._extraction_pool = ProcessPoolExecutor(
+                max_workers=self.extraction_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._extraction_pool
+
+    def close(self):
+        """Shut down the extraction pool and close the item archive."""
+        if self._extraction_pool is not None:
+            self._extraction_pool.shutdown(cancel_futures=True)
+            self._extraction_pool = None
+        if self.item_archive is not None:
+            self.item_archive.close()
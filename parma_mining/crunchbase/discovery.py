@@ -0,0 +1,46 @@
+"""Concurrent discovery of Crunchbase profiles for many company names."""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from parma_mining.crunchbase.client import CrunchbaseClient
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+from parma_mining.crunchbase.model import DiscoveryResponse
+
+logger = logging.getLogger(__name__)
+
+
+class DiscoveryEngine:
+    """Resolve company names concurrently under the shared search rate limit."""
+
+    load_dotenv()
+    # number of searches running at once
+    concurrency = int(os.getenv("DISCOVERY_CONCURRENCY") or 4)
+
+    def __init__(self, crunchbase_client: CrunchbaseClient):
+        self.crunchbase_client = crunchbase_client
+
+    def discover(self, names: list[str]) -> dict[str, DiscoveryResponse]:
+        """Discover the given company names.
+
+        Names are normalized and duplicates are resolved only once. Errors of a
+        single discovery are raised after all running searches have finished.
+
+        Returns:
+            The discovery responses keyed by the normalized company name.
+        """
+        queries: dict[str, str] = {}
+        for name in names:
+            queries.setdefault(DiscoveryCache.normalize(name), name)
+        if not queries:
+            return {}
+
+        workers = max(min(self.concurrency, len(queries)), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                query: executor.submit(self.crunchbase_client.discover_company, name)
+                for query, name in queries.items()
+            }
+        return {query: future.result() for query, future in futures.items()}
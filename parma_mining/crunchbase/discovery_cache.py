@@ -0,0 +1,97 @@
+"""Persistent cache for the results of the company discovery.
+
+Resolving a company name to its Crunchbase urls requires a slow Google search. The
+results are kept in a local SQLite database for as long as the discovery response
+declares them valid. Names without a Crunchbase profile are cached for a shorter time.
+"""
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from parma_mining.mining_common.const import DISCOVERY_VALIDITY_DAYS
+from parma_mining.mining_common.storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class DiscoveryCache(SQLiteStore):
+    """SQLite backed cache mapping normalized discovery queries to urls."""
+
+    load_dotenv()
+    path_variable = "DISCOVERY_CACHE_PATH"
+    file_name = "discovery.sqlite3"
+    ttl = timedelta(days=DISCOVERY_VALIDITY_DAYS)
+    negative_ttl = timedelta(days=int(os.getenv("DISCOVERY_NEGATIVE_TTL_DAYS") or 7))
+
+    def __init__(self, path: str | None = None):
+        super().__init__(path)
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0}
+
+    def _prepare(self, connection: sqlite3.Connection):
+        """Create the table and drop the expired entries."""
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS discovery ("
+            "query TEXT PRIMARY KEY, urls TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "DELETE FROM discovery WHERE expires_at <= ?",
+            (datetime.now().timestamp(),),
+        )
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query so that spelling variants share one cache entry."""
+        return " ".join(query.casefold().split())
+
+    def _lookup(self, query: str) -> tuple[list[str], datetime] | None:
+        """Return the unexpired urls and expiry date cached for the query."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT urls, expires_at FROM discovery WHERE query = ?",
+                (self.normalize(query),),
+            ).fetchone()
+        if row is None or row[1] <= datetime.now().timestamp():
+            return None
+        return json.loads(row[0]), datetime.fromtimestamp(row[1])
+
+    def get(self, query: str) -> list[str] | None:
+        """Return the cached urls, an empty list if no profile exists, else None."""
+        entry = self._lookup(query)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        urls = entry[0]
+        self._stats["hits" if urls else "negative_hits"] += 1
+        return urls
+
+    def expires_at(self, query: str) -> datetime | None:
+        """Return until when the cached result of the query is valid."""
+        entry = self._lookup(query)
+        return None if entry is None else entry[1]
+
+    def put(self, query: str, urls: list[str]):
+        """Cache the urls found for the query, or that none were found."""
+        expires_at = datetime.now() + (self.ttl if urls else self.negative_ttl)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO discovery (query, urls, expires_at) "
+                "VALUES (?, ?, ?)",
+                (self.normalize(query), json.dumps(urls), expires_at.timestamp()),
+            )
+
+    def stats(self) -> dict:
+        """Return the hit and miss statistics of the cache."""
+        lookups = sum(self._stats.values())
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM discovery"
+            ).fetchone()
+        return {
+            **self._stats,
+            "hit_rate": (lookups - self._stats["misses"]) / lookups if lookups else 0,
+            "entries": entries,
+        }
@@ -0,0 +1,226 @@
+"""Field spec of the CompanyModel extracted from the Crunchbase dataset items.
+
+The spec is compiled once on import of the client. Each entry maps a field of the
+CompanyModel, or of one of its nested models, to its source path in the dataset item of
+the Actor. The crawl profiles select the parts of the spec scraped by a task.
+"""
+from parma_mining.mining_common.extraction import FieldSpec
+
+IDENTIFIER_FIELDS = (
+    FieldSpec("name", ("value",)),
+    FieldSpec("permalink", ("permalink",)),
+)
+
+FUNDING_ROUND_FIELDS = (
+    FieldSpec("name", ("identifier", "value")),
+    FieldSpec("permalink", ("identifier", "permalink")),
+    FieldSpec("announced_on", ("announced_on",), "date"),
+    FieldSpec("money_raised_usd", ("money_raised", "value_usd")),
+    FieldSpec("num_investors", ("num_investors",)),
+    FieldSpec(
+        "lead_investors", ("lead_investor_identifiers",), "list", IDENTIFIER_FIELDS
+    ),
+)
+
+INVESTOR_FIELDS = (
+    FieldSpec("name", ("investor_identifier", "value")),
+    FieldSpec("investment_title", ("funding_round_identifier", "value")),
+    FieldSpec("permalink", ("investor_identifier", "permalink")),
+    FieldSpec("partners", ("partner_identifiers",), "list", IDENTIFIER_FIELDS),
+)
+
+ACQUIRER_FIELDS = (
+    FieldSpec("name", ("acquirer_identifier", "value")),
+    FieldSpec("permalink", ("acquirer_identifier", "permalink")),
+    FieldSpec(
+        "acquisition",
+        (),
+        "object",
+        (
+            FieldSpec("title", ("acquisition_identifier", "value")),
+            FieldSpec("permalink", ("acquisition_identifier", "permalink")),
+            FieldSpec("date", ("acquisition_announced_on", "value"), "date"),
+            FieldSpec("price_usd", ("acquisition_price", "value_usd")),
+        ),
+    ),
+)
+
+ACQUIREE_FIELDS = (
+    FieldSpec("name", ("acquiree_identifier", "value")),
+    FieldSpec("permalink", ("acquiree_identifier", "permalink")),
+    FieldSpec(
+        "acquisition",
+        (),
+        "object",
+        (
+            FieldSpec("title", ("identifier", "value")),
+            FieldSpec("permalink", ("identifier", "permalink")),
+            FieldSpec("date", ("announced_on", "value"), "date"),
+            FieldSpec("price_usd", ("price", "value_usd")),
+        ),
+    ),
+)
+
+SIMILAR_COMPANY_FIELDS = (
+    FieldSpec("name", ("source", "value")),
+    FieldSpec("permalink", ("source", "permalink")),
+    FieldSpec("description", ("source_short_description",)),
+)
+
+FEATURED_EMPLOYEE_FIELDS = (
+    FieldSpec("name", ("person_identifier", "value")),
+    FieldSpec("title", ("title",)),
+    FieldSpec("permalink", ("person_identifier", "permalink")),
+    FieldSpec("email", ("email_address",)),
+    FieldSpec("start_date", ("started_on", "value"), "date"),
+)
+
+EVENT_FIELDS = (
+    FieldSpec("name", ("identifier", "value")),
+    FieldSpec("permalink", ("identifier", "permalink")),
+    FieldSpec("interaction_type", ("appearance_type",)),
+)
+
+ACTIVITY_FIELDS = (
+    FieldSpec("title", ("properties", "identifier", "value")),
+    FieldSpec("activity_type", ("properties", "identifier", "entity_def_id")),
+    FieldSpec("author", ("properties", "activity_properties", "author")),
+    FieldSpec("publisher", ("properties", "activity_properties", "publisher")),
+    FieldSpec("date", ("properties", "activity_date"), "date"),
+    FieldSpec("url", ("properties", "activity_properties", "url", "value")),
+)
+
+COUNTRY_DATA_FIELDS = (
+    FieldSpec("visits_pct", ("visits_pct",)),
+    FieldSpec("rank_mom_pct", ("rank_mom_pct",)),
+    FieldSpec("rank", ("rank",)),
+    FieldSpec("location", ("location_identifiers", 0, "value")),
+)
+
+COMPANY_FIELDS = (
+    FieldSpec("name", ("identifier", "value")),
+    FieldSpec("description", ("short_description",)),
+    FieldSpec("permalink", ("identifier", "permalink")),
+    FieldSpec("website", ("website", "value")),
+    FieldSpec("ipo_status", ("ipo_status",)),
+    FieldSpec("company_type", ("overview_company_fields", "company_type")),
+    FieldSpec(
+        "founded_on", ("overview_fields_extended", "founded_on", "value"), "date"
+    ),
+    FieldSpec(
+        "categories",
+        ("overview_fields_extended", "categories"),
+        "list",
+        item_path=("value",),
+    ),
+    FieldSpec("legal_name", ("overview_fields_extended", "legal_name")),
+    FieldSpec("num_employees_enum", ("num_employees_enum",)),
+    FieldSpec("rank_org_company", ("rank_org_company",)),
+    # rounds without lead investors are skipped
+    FieldSpec(
+        "funding_rounds",
+        ("funding_rounds_list",),
+        "list",
+        FUNDING_ROUND_FIELDS,
+        required=("lead_investor_identifiers",),
+    ),
+    FieldSpec("total_funding_usd", ("funding_total", "value_usd")),
+    FieldSpec("last_funding_type", ("last_funding_type",)),
+    FieldSpec("last_funding_at", ("funding_rounds_summary", "last_funding_at"), "date"),
+    FieldSpec("num_funding_rounds", ("funding_rounds_summary", "num_funding_rounds")),
+    # investors without partners are skipped
+    FieldSpec(
+        "investors",
+        ("investors_list",),
+        "list",
+        INVESTOR_FIELDS,
+        required=("partner_identifiers",),
+    ),
+    FieldSpec("num_investors", ("investors_summary", "num_investors")),
+    FieldSpec(
+        "acquirer",
+        ("acquired_by_fields",),
+        "object",
+        ACQUIRER_FIELDS,
+        required=("acquirer_identifier",),
+    ),
+    FieldSpec("acquirees", ("acquisitions_list",), "list", ACQUIREE_FIELDS),
+    FieldSpec(
+        "num_technologies",
+        ("technology_highlights", "builtwith_num_technologies_used"),
+    ),
+    FieldSpec("apptopia_total_apps", ("apptopia_summary", "apptopia_total_apps")),
+    FieldSpec(
+        "apptopia_total_downloads", ("apptopia_summary", "apptopia_total_downloads")
+    ),
+    FieldSpec("email", ("contact_fields", "contact_email")),
+    FieldSpec("phone", ("contact_fields", "phone_number")),
+    FieldSpec(
+        "similar_companies",
+        ("org_similarity_list",),
+        "list",
+        SIMILAR_COMPANY_FIELDS,
+    ),
+    FieldSpec(
+        "num_similar_companies",
+        ("company_overview_highlights", "num_org_similarities"),
+    ),
+    FieldSpec(
+        "featured_employees",
+        ("current_employees_featured_order_field",),
+        "list",
+        FEATURED_EMPLOYEE_FIELDS,
+    ),
+    FieldSpec("num_current_positions", ("people_highlights", "num_current_positions")),
+    FieldSpec(
+        "num_event_appearances",
+        ("event_appearances_summary", "num_event_appearances"),
+    ),
+    FieldSpec("events", ("event_appearances_list",), "list", EVENT_FIELDS),
+    FieldSpec("num_patents", ("ipqwery_summary", "ipqwery_num_patent_granted")),
+    FieldSpec(
+        "num_trademarks", ("ipqwery_summary", "ipqwery_num_trademark_registered")
+    ),
+    FieldSpec(
+        "popular_trademark_class",
+        ("ipqwery_summary", "ipqwery_popular_trademark_class"),
+    ),
+    FieldSpec("activities", ("overview_timeline", "entities"), "list", ACTIVITY_FIELDS),
+    FieldSpec("num_activity", ("overview_timeline", "count")),
+    FieldSpec("semrush_rank", ("semrush_summary", "semrush_global_rank")),
+    FieldSpec(
+        "semrush_visits_last_month",
+        ("semrush_summary", "semrush_visits_latest_month"),
+    ),
+    FieldSpec(
+        "semrush_visits_mom_pct", ("semrush_rank_headline", "semrush_visits_mom_pct")
+    ),
+    FieldSpec("country_data", ("semrush_location_list",), "list", COUNTRY_DATA_FIELDS),
+    FieldSpec(
+        "growth_insight",
+        ("growth_insight_description", "growth_insight_description"),
+    ),
+    FieldSpec("siftery_num_products", ("siftery_summary", "siftery_num_products")),
+)
+
+# sections of a company left out of the standard crawl profile
+HEAVY_SECTIONS = {
+    "similar_companies",
+    "featured_employees",
+    "events",
+    "activities",
+    "country_data",
+}
+
+# top-level fields scraped, extracted and fed by each crawl profile: "lite" only
+# covers the plain values like the funding and headcount summaries, "standard" all
+# but the heavy sections and "full" everything
+CRAWL_PROFILES: dict[str, tuple[FieldSpec, ...]] = {
+    "lite": tuple(
+        field for field in COMPANY_FIELDS if field.type not in ("object", "list")
+    ),
+    "standard": tuple(
+        field for field in COMPANY_FIELDS if field.name not in HEAVY_SECTIONS
+    ),
+    "full": COMPANY_FIELDS,
+}
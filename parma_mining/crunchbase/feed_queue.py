@@ -0,0 +1,141 @@
+"""Write-behind queue between the company extraction and the analytics feed.
+
+Scraped companies are put into a bounded in-process queue and sent to the analytics
+backend by background workers, so that scraping the next companies overlaps with
+feeding the previous ones. With a snapshot store, companies that did not change since
+they were last fed are skipped.
+"""
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from parma_mining.crunchbase.analytics_client import AnalyticsClient
+from parma_mining.crunchbase.model import (
+    ErrorInfoModel,
+    RawResponseModel,
+    ResponseModel,
+)
+from parma_mining.crunchbase.snapshot_store import SnapshotStore
+from parma_mining.mining_common.exceptions import AnalyticsError, CrawlingError
+from parma_mining.mining_common.helper import collect_errors
+
+logger = logging.getLogger(__name__)
+
+
+class FeedQueue:
+    """Bounded write-behind queue feeding companies to the analytics backend.
+
+    Use it as an async context manager: the workers are started on enter and the
+    queue is drained completely on exit, so every company has been fed (or its
+    error collected) before the crawling is reported as finished.
+    """
+
+    load_dotenv()
+    # number of companies waiting to be fed before producers are blocked
+    max_size = int(os.getenv("FEED_QUEUE_SIZE") or 100)
+    # number of background workers sending to the analytics backend
+    workers = int(os.getenv("FEED_WORKERS") or 4)
+    # number of companies a worker sends per flush
+    batch_size = int(os.getenv("FEED_BATCH_SIZE") or 8)
+
+    def __init__(
+        self,
+        analytics_client: AnalyticsClient,
+        token: str,
+        errors: dict[str, ErrorInfoModel],
+        snapshots: SnapshotStore | None = None,
+    ):
+        self.analytics_client = analytics_client
+        self.token = token
+        self.errors = errors
+        # companies unchanged since they were last fed are skipped
+        self.snapshots = snapshots
+        self._queue: asyncio.Queue[ResponseModel | RawResponseModel] = asyncio.Queue(
+            self.max_size
+        )
+        self._workers: list[asyncio.Task] = []
+
+    async def __aenter__(self) -> "FeedQueue":
+        """Start the background workers."""
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(max(self.workers, 1))
+        ]
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        """Drain the queue and stop the background workers."""
+        try:
+            if exc_type is None:
+                await self._queue.join()
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def put(self, data: ResponseModel | RawResponseModel):
+        """Queue a company for feeding, waiting while the queue is full."""
+        await self._queue.put(data)
+
+    async def _work(self):
+        """Take up to batch_size queued companies at a time and flush them."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _feed(self, data: ResponseModel | RawResponseModel):
+        """Feed a company, skipping or reducing it if its snapshot says so.
+
+        The company is dumped before it is sent, so fields of a lazily extracted
+        company that cannot be extracted are reported as a crawling error.
+        """
+        if isinstance(data, RawResponseModel):
+            return await self.analytics_client.feed_raw_data(self.token, data)
+        try:
+            raw_data = self.analytics_client.raw_data(data)
+        except Exception as e:
+            msg = f"Error extracting company details: {e}"
+            logger.error(msg)
+            raise CrawlingError(msg)
+        if self.snapshots is None or not self.snapshots.enabled:
+            return await self.analytics_client.feed_raw_data(self.token, data, raw_data)
+        # the snapshot store is backed by SQLite, which must not block the event loop
+        changed, snapshot = await asyncio.to_thread(
+            self.snapshots.check,
+            data.company_id,
+            str(data.raw_data.permalink or ""),
+            raw_data,
+        )
+        if changed is None:
+            logger.debug(f"Skipping unchanged company {data.company_id}")
+            return None
+        result = await self.analytics_client.feed_raw_data(self.token, data, changed)
+        await asyncio.to_thread(self.snapshots.save, snapshot)
+        return result
+
+    async def _flush(self, batch: list[ResponseModel | RawResponseModel]):
+        """Send a batch of companies over the pooled analytics connections."""
+        results = await asyncio.gather(
+            *(self._feed(data) for data in batch),
+            return_exceptions=True,
+        )
+        for data, result in zip(batch, results):
+            if isinstance(result, AnalyticsError):
+                logger.error(
+                    f"Can't send crawling data to the Analytics. Error: {result}"
+                )
+                collect_errors(data.company_id, self.errors, result)
+            elif isinstance(result, CrawlingError):
+                collect_errors(data.company_id, self.errors, result)
+            elif isinstance(result, Exception):
+                logger.error(f"Unexpected error while feeding the Analytics: {result}")
+                collect_errors(
+                    data.company_id, self.errors, AnalyticsError(str(result))
+                )
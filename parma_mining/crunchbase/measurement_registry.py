@@ -0,0 +1,140 @@
+"""Persistent registry of the measurements registered at the analytics.
+
+Every ``/initialize`` call registers the measurements of the normalization map for a
+source module. The ids the analytics returned are kept in a local SQLite database,
+keyed by source module and measurement path, along with a fingerprint of what was
+registered. Later calls only register measurements that are new or changed, and a
+map registered unchanged before is served without any request.
+
+The registry only avoids registering again while its file survives. The local disk of
+a Cloud Run instance is ephemeral, so by default every deploy or restart starts with
+an empty registry and registers the whole map once. To keep the registrations across
+deploys, point ``MEASUREMENT_REGISTRY_PATH`` to a persistent volume, e.g. a Cloud
+Storage volume mount.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+from parma_mining.mining_common.storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class MeasurementRegistry(SQLiteStore):
+    """SQLite backed registry of measurement ids per source module."""
+
+    path_variable = "MEASUREMENT_REGISTRY_PATH"
+    file_name = "measurements.sqlite3"
+
+    def __init__(self, path: str | None = None):
+        super().__init__(path)
+        self._stats = {"map_hits": 0, "hits": 0, "misses": 0}
+
+    def _prepare(self, connection: sqlite3.Connection):
+        """Create the tables of the measurements and registered maps."""
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS measurements ("
+            "source_module_id TEXT NOT NULL, path TEXT NOT NULL, "
+            "fingerprint TEXT NOT NULL, measurement_id TEXT NOT NULL, "
+            "PRIMARY KEY (source_module_id, path))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS registered_maps ("
+            "source_module_id TEXT PRIMARY KEY, digest TEXT NOT NULL, "
+            "result TEXT NOT NULL, mapping TEXT NOT NULL, "
+            "registered_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def fingerprint(value: Any) -> str:
+        """Return the content hash of a mapping or measurement."""
+        canonical = json.dumps(value, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def get(self, source_module_id: Any, path: str, fingerprint: str) -> Any | None:
+        """Return the id of a measurement registered with the same fingerprint."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint, measurement_id FROM measurements "
+                "WHERE source_module_id = ? AND path = ?",
+                (str(source_module_id), path),
+            ).fetchone()
+        if row is None or row[0] != fingerprint:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return json.loads(row[1])
+
+    def put(self, source_module_id: Any, path: str, fingerprint: str, measurement_id):
+        """Save the id the analytics returned for a measurement."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO measurements "
+                "(source_module_id, path, fingerprint, measurement_id) "
+                "VALUES (?, ?, ?, ?)",
+                (str(source_module_id), path, fingerprint, json.dumps(measurement_id)),
+            )
+
+    def get_map(
+        self, source_module_id: Any, digest: str
+    ) -> tuple[list[dict], dict] | None:
+        """Return the registration of an unchanged map, see ``put_map``."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest, result, mapping FROM registered_maps "
+                "WHERE source_module_id = ?",
+                (str(source_module_id),),
+            ).fetchone()
+        if row is None or row[0] != digest:
+            return None
+        self._stats["map_hits"] += 1
+        return json.loads(row[1]), json.loads(row[2])
+
+    def put_map(
+        self, source_module_id: Any, digest: str, result: list[dict], mapping: dict
+    ):
+        """Save the registered measurements and map of a source module.
+
+        Args:
+            source_module_id: The source module the map was registered for.
+            digest: The fingerprint of the static map that was registered.
+            result: The registered measurements.
+            mapping: The map with the ids of the registered measurements.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO registered_maps "
+                "(source_module_id, digest, result, mapping, registered_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    str(source_module_id),
+                    digest,
+                    json.dumps(result),
+                    json.dumps(mapping),
+                    datetime.now().timestamp(),
+                ),
+            )
+
+    def clear(self, source_module_id: Any):
+        """Forget all registrations of a source module."""
+        with self._lock, self._connection:
+            for table in ("measurements", "registered_maps"):
+                self._connection.execute(
+                    f"DELETE FROM {table} WHERE source_module_id = ?",
+                    (str(source_module_id),),
+                )
+
+    def stats(self) -> dict:
+        """Return the hit and miss statistics and the number of registrations."""
+        with self._lock:
+            (measurements,) = self._connection.execute(
+                "SELECT COUNT(*) FROM measurements"
+            ).fetchone()
+            (maps,) = self._connection.execute(
+                "SELECT COUNT(*) FROM registered_maps"
+            ).fetchone()
+        return {**self._stats, "measurements": measurements, "source_modules": maps}
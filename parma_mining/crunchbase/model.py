@@ -1,8 +1,12 @@
 """Model for the Crunchbase data."""
 import json
 from datetime import datetime
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, field_serializer
+
+# names of the crawl profiles, see parma_mining.crunchbase.extraction.CRAWL_PROFILES
+CrawlProfileName = Literal["lite", "standard", "full"]
 
 
 class AcquisitionModel(BaseModel):  # done
@@ -216,6 +220,11 @@ class CompaniesRequest(BaseModel):
 
     task_id: int
     companies: dict[str, dict[str, list[str]]]
+    # scrape all companies again instead of serving recently scraped ones
+    bypass_cache: bool = False
+    # crawl profile of the task and of single companies overriding it
+    profile: CrawlProfileName = "full"
+    profiles: dict[str, CrawlProfileName] = {}
 
 
 class ResponseModel(BaseModel):
@@ -224,6 +233,22 @@ class ResponseModel(BaseModel):
     source_name: str
     company_id: str
     raw_data: CompanyModel
+    # only the fields of the crawl profile are fed
+    profile: CrawlProfileName = "full"
+
+    @field_serializer("raw_data")
+    def serialize_raw_data(self, raw_data: CompanyModel) -> dict:
+        """Dump the company with its own model_dump, see LazyCompanyModel."""
+        return raw_data.model_dump()
+
+
+class RawResponseModel(BaseModel):
+    """Response model feeding an undecoded Apify dataset item."""
+
+    source_name: str
+    company_id: str
+    # the JSON encoded dataset item
+    raw_data: bytes
 
 
 class ErrorInfoModel(BaseModel):
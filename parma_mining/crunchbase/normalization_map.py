@@ -1,10 +1,11 @@
 """Normalization map for Crunchbase data."""
+from typing import Any
 
 
 class CrunchbaseNormalizationMap:
     """Normalization map for Crunchbase data."""
 
-    map_json = {
+    map_json: dict[str, Any] = {
         "Source": "crunchbase",
         "Mappings": [
             {
@@ -0,0 +1,167 @@
+"""Persistent snapshots of the companies fed to the analytics.
+
+Most companies barely change between two crawls. The store keeps the content hash and
+the last fed payload of every company and permalink in a local SQLite database, so
+that unchanged companies are not fed again and, optionally, changed companies only
+with the fields that changed.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from dotenv import load_dotenv
+
+from parma_mining.mining_common.storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# fields always fed along with a diff, so the analytics can identify the company
+IDENTITY_FIELDS = ("permalink",)
+
+
+def _canonical(value: Any) -> str:
+    """Encode a value as canonical JSON, rendering datetimes like the feed does."""
+    return json.dumps(
+        value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+
+
+def _digest(canonical: str) -> str:
+    """Return the content hash of a canonical JSON payload."""
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+class Snapshot(NamedTuple):
+    """Fed state of a company, saved once the feed succeeded."""
+
+    company_id: str
+    permalink: str
+    digest: str
+    # canonical JSON of all fields fed for the company so far
+    payload: str
+
+
+class SnapshotStore(SQLiteStore):
+    """SQLite backed store of the payloads last fed per company and permalink.
+
+    ``SNAPSHOT_MODE=skip`` skips companies whose payload did not change since it was
+    last fed, ``SNAPSHOT_MODE=diff`` additionally feeds companies with at most
+    ``SNAPSHOT_DIFF_MAX_FIELDS`` changed fields with only those fields.
+    """
+
+    load_dotenv()
+    path_variable = "SNAPSHOT_STORE_PATH"
+    file_name = "snapshots.sqlite3"
+    mode = str(os.getenv("SNAPSHOT_MODE") or "off")
+    diff_max_fields = int(os.getenv("SNAPSHOT_DIFF_MAX_FIELDS") or 10)
+
+    def __init__(self, path: str | None = None):
+        super().__init__(path)
+        self._stats = {
+            "new": 0,
+            "unchanged": 0,
+            "changed": 0,
+            "diffs": 0,
+            "payload_bytes": 0,
+            "fed_bytes": 0,
+        }
+
+    def _prepare(self, connection: sqlite3.Connection):
+        """Create the table of the snapshots."""
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "company_id TEXT NOT NULL, permalink TEXT NOT NULL, "
+            "digest TEXT NOT NULL, payload TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (company_id, permalink))"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether payloads are checked against the snapshots before feeding."""
+        return self.mode in ("skip", "diff")
+
+    def _load(self, company_id: str, permalink: str) -> tuple[str, str] | None:
+        """Return the digest and payload of the snapshot of a company."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT digest, payload FROM snapshots "
+                "WHERE company_id = ? AND permalink = ?",
+                (company_id, permalink),
+            ).fetchone()
+
+    def _count(self, **counts: int):
+        """Add to the statistics, which are updated from several threads."""
+        with self._lock:
+            for name, count in counts.items():
+                self._stats[name] += count
+
+    def check(
+        self, company_id: str, permalink: str, payload: dict
+    ) -> tuple[dict | None, Snapshot]:
+        """Compare the payload of a company with its snapshot.
+
+        Returns:
+            The payload to feed, None if nothing changed, and the snapshot to save
+            once it has been fed.
+        """
+        canonical = _canonical(payload)
+        digest = _digest(canonical)
+        self._count(payload_bytes=len(canonical))
+        stored = self._load(company_id, permalink)
+        if stored is None:
+            self._count(new=1, fed_bytes=len(canonical))
+            return payload, Snapshot(company_id, permalink, digest, canonical)
+        if stored[0] == digest:
+            self._count(unchanged=1)
+            return None, Snapshot(company_id, permalink, digest, canonical)
+
+        previous = json.loads(stored[1])
+        changed = [
+            name
+            for name, value in payload.items()
+            if name not in previous or _canonical(value) != _canonical(previous[name])
+        ]
+        merged = _canonical({**previous, **payload})
+        snapshot = Snapshot(company_id, permalink, _digest(merged), merged)
+        if not changed:
+            self._count(unchanged=1)
+            return None, snapshot
+        if self.mode == "diff" and len(changed) <= self.diff_max_fields:
+            payload = {
+                name: payload[name]
+                for name in payload
+                if name in changed or name in IDENTITY_FIELDS
+            }
+            self._count(changed=1, diffs=1, fed_bytes=len(_canonical(payload)))
+            return payload, snapshot
+        self._count(changed=1, fed_bytes=len(canonical))
+        return payload, snapshot
+
+    def save(self, snapshot: Snapshot):
+        """Save the snapshot of a company that has been fed."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO snapshots "
+                "(company_id, permalink, digest, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*snapshot, datetime.now().timestamp()),
+            )
+
+    def stats(self) -> dict:
+        """Return how many companies changed and how many payload bytes were saved."""
+        checked = self._stats["new"] + self._stats["unchanged"] + self._stats["changed"]
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM snapshots"
+            ).fetchone()
+        return {
+            **self._stats,
+            "mode": self.mode,
+            "unchanged_rate": self._stats["unchanged"] / checked if checked else 0,
+            "saved_bytes": self._stats["payload_bytes"] - self._stats["fed_bytes"],
+            "entries": entries,
+        }
@@ -0,0 +1,217 @@
+"""Columnar extraction of a FieldSpec from many JSON items at once using Polars.
+
+The items are loaded into a Polars frame and every field of the spec is turned into a
+column expression, so paths, nested lists and dates are processed for the whole batch
+in vectorized operations instead of item by item. The expressions follow the frame
+schema: fields missing in every item are None, as in the row-by-row extractor.
+
+Values the frame cannot represent like the row-by-row extractor would, such as dates
+Polars fails to parse, are flagged, and the affected items should be extracted row by
+row instead. A struct does not tell a missing key from a null one, so items with an
+object whose required key is null are flagged as well: the frame would drop those
+objects, while the row-by-row extractor only checks that the keys exist.
+"""
+from typing import Any
+
+import polars as pl
+from polars.datatypes import DataTypeClass
+
+from parma_mining.mining_common.extraction import FieldSpec
+
+# name of the column flagging items that have to be extracted row by row
+FALLBACK_COLUMN = "__fallback__"
+
+# column type, either an instance or a class without parameters like pl.String
+DataType = pl.DataType | DataTypeClass
+
+
+def _resolve(
+    expr: pl.Expr, dtype: DataType, path: tuple[str | int, ...]
+) -> tuple[pl.Expr, DataType]:
+    """Return the expression and type of the value at the path.
+
+    A path that does not exist in the schema resolves to a null literal.
+    """
+    for key in path:
+        if isinstance(key, int) and isinstance(dtype, pl.List):
+            expr, dtype = expr.list.get(key, null_on_oob=True), dtype.inner
+        elif isinstance(key, str) and isinstance(dtype, pl.Struct):
+            fields = dtype.to_schema()
+            if key not in fields:
+                return pl.lit(None), pl.Null()
+            expr, dtype = expr.struct.field(key), fields[key]
+        else:
+            return pl.lit(None), pl.Null()
+    return expr, dtype
+
+
+def _present(
+    node: pl.Expr, dtype: DataType, required: tuple[str, ...]
+) -> pl.Expr | None:
+    """Return the condition that the node is an object with all required keys."""
+    if not isinstance(dtype, pl.Struct):
+        return None
+    condition = node.is_not_null()
+    for key in required:
+        condition &= _resolve(node, dtype, (key,))[0].is_not_null()
+    return condition
+
+
+def _any(flags: list[pl.Expr]) -> pl.Expr | None:
+    """Combine the flags of nested values, treating nulls as unset."""
+    if not flags:
+        return None
+    flag = flags[0].fill_null(False)
+    for other in flags[1:]:
+        flag |= other.fill_null(False)
+    return flag
+
+
+def _date(
+    field: FieldSpec, expr: pl.Expr, dtype: DataType
+) -> tuple[pl.Expr, pl.Expr | None]:
+    """Parse a date column, flagging dates Polars failed to parse."""
+    if isinstance(dtype, pl.String):
+        parsed = expr.str.strptime(pl.Datetime("us"), field.date_format, strict=False)
+        return parsed, expr.is_not_null() & parsed.is_null()
+    empty = pl.lit(None, pl.Datetime("us"))
+    return empty, None if isinstance(dtype, pl.Null) else expr.is_not_null()
+
+
+def _object(
+    field: FieldSpec, expr: pl.Expr, dtype: DataType
+) -> tuple[pl.Expr, pl.Expr | None]:
+    """Extract the nested fields of an object column."""
+    condition = _present(expr, dtype, field.required)
+    if condition is None:
+        return pl.lit(None), None
+    values, flag = _fields(field.fields, expr, dtype)
+    return (
+        pl.when(condition).then(pl.struct(values)),
+        None if flag is None else condition & flag,
+    )
+
+
+def _list(
+    field: FieldSpec, expr: pl.Expr, dtype: DataType
+) -> tuple[pl.Expr, pl.Expr | None]:
+    """Extract the nested fields or values of every element of a list column."""
+    if not isinstance(dtype, pl.List):
+        return pl.lit(None), None
+    element, element_dtype = pl.element(), dtype.inner
+    condition = _present(element, element_dtype, field.required)
+    if condition is None:
+        return expr.list.eval(element.filter(pl.lit(False))), None
+    flag = None
+    if field.fields:
+        values, flag = _fields(field.fields, element, element_dtype)
+        value = pl.struct(values)
+    else:
+        value, _ = _resolve(element, element_dtype, field.item_path)
+    extracted = expr.list.eval(value.filter(condition))
+    if flag is None:
+        return extracted, None
+    return extracted, expr.list.eval(flag.filter(condition)).list.any()
+
+
+_CONVERSIONS = {"date": _date, "object": _object, "list": _list}
+
+
+def _field(
+    field: FieldSpec, node: pl.Expr, dtype: DataType
+) -> tuple[pl.Expr, pl.Expr | None]:
+    """Return the expression of a field and the flag of values to extract by row."""
+    expr, value_dtype = _resolve(node, dtype, field.path)
+    flag = None
+    if field.type is not None:
+        if field.type not in _CONVERSIONS:
+            raise ValueError(f"Unknown type {field.type} of field {field.name}")
+        expr, flag = _CONVERSIONS[field.type](field, expr, value_dtype)
+    return expr.alias(field.name), flag
+
+
+def _fields(
+    fields: tuple[FieldSpec, ...], node: pl.Expr, dtype: DataType
+) -> tuple[list[pl.Expr], pl.Expr | None]:
+    """Return the expressions of the fields and the flag of values to extract by row."""
+    values, flags = [], []
+    for field in fields:
+        value, flag = _field(field, node, dtype)
+        values.append(value)
+        if flag is not None:
+            flags.append(flag)
+    return values, _any(flags)
+
+
+def _required_fields(fields: tuple[FieldSpec, ...]) -> tuple[FieldSpec, ...]:
+    """Return the fields of objects with required keys and of their ancestors."""
+    return tuple(
+        field._replace(fields=_required_fields(field.fields))
+        for field in fields
+        if field.required or _required_fields(field.fields)
+    )
+
+
+def _value(node: Any, path: tuple[str | int, ...]) -> Any:
+    """Return the value at the path, None if it does not exist."""
+    for key in path:
+        if isinstance(key, int):
+            node = node[key] if isinstance(node, list) and key < len(node) else None
+        else:
+            node = node.get(key) if isinstance(node, dict) else None
+    return node
+
+
+def _null_required(fields: tuple[FieldSpec, ...], node: Any) -> bool:
+    """Return whether an object of the fields has a required key that is null."""
+    for field in fields:
+        value = _value(node, field.path)
+        elements = (
+            value if field.type == "list" and isinstance(value, list) else [value]
+        )
+        for element in elements:
+            if not isinstance(element, dict):
+                continue
+            if any(
+                key in element and element[key] is None for key in field.required
+            ) or _null_required(field.fields, element):
+                return True
+    return False
+
+
+def extract_frame(
+    fields: tuple[FieldSpec, ...], items: list[dict]
+) -> tuple[list[dict], list[bool]]:
+    """Extract the fields from all items in vectorized column operations.
+
+    Returns:
+        The extracted fields of every item and, per item, whether it contains values
+        that have to be extracted row by row instead.
+
+    Raises:
+        Exception: If Polars cannot load the items into a frame, e.g. because a key
+            holds objects in some items and plain values in others.
+    """
+    keys = list(
+        dict.fromkeys(
+            field.path[0]
+            for field in fields
+            if field.path and isinstance(field.path[0], str)
+        )
+    )
+    frame = pl.from_dicts(
+        [{key: item.get(key) for key in keys} for item in items],
+        schema={key: None for key in keys},
+        infer_schema_length=None,
+    )
+    root = pl.struct(pl.all())
+    values, flag = _fields(fields, root, pl.Struct(frame.schema))
+    extracted = frame.select(
+        *values, (pl.lit(False) if flag is None else flag).alias(FALLBACK_COLUMN)
+    )
+    required = _required_fields(fields)
+    fallback = [
+        flag or _null_required(required, item)
+        for flag, item in zip(extracted.get_column(FALLBACK_COLUMN).to_list(), items)
+    ]
+    return extracted.drop(FALLBACK_COLUMN).to_dicts(), fallback
@@ -8,3 +8,6 @@ HTTP_404 = 404
 HTTP_405 = 405
 HTTP_422 = 422
 HTTP_500 = 500
+
+# number of days discovered company identifiers are valid
+DISCOVERY_VALIDITY_DAYS = 180
@@ -0,0 +1,414 @@
+"""Declarative extraction of fields from nested JSON items.
+
+The fields to extract are described by a tree of FieldSpec entries. The spec is compiled
+once into plain Python functions which walk every shared path prefix only once per
+item and use a single dict lookup per key. Missing keys and unexpected types anywhere
+along a path yield None instead of raising.
+"""
+import types
+import typing
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from pydantic import BaseModel
+
+# scalar field types a trusted construction checks the extracted values against
+_SCALAR_TYPES = (bool, int, float, str)
+
+
+class TypeMismatchError(TypeError):
+    """A value does not have the type of its field in a trusted construction."""
+
+
+class FieldSpec(NamedTuple):
+    """Description of a field to extract.
+
+    Attributes:
+        name: Key of the field in the extracted dict.
+        path: Keys and list indices leading from the current node to the value.
+        type: How the value is converted: None keeps it as is, "date" parses it with
+            date_format, "object" extracts the nested fields from it and "list"
+            extracts the nested fields, or the value at item_path, from every element.
+        fields: Nested fields of an "object" or of the elements of a "list".
+        required: Keys the node must contain, otherwise an "object" is None and an
+            element of a "list" is skipped.
+        item_path: Path to the value of every element of a "list" without fields.
+        date_format: Format of a "date" value.
+    """
+
+    name: str
+    path: tuple[str | int, ...]
+    type: str | None = None
+    fields: tuple["FieldSpec", ...] = ()
+    required: tuple[str, ...] = ()
+    item_path: tuple[str | int, ...] = ()
+    date_format: str = "%Y-%m-%d"
+
+
+def parse_date(value: str, date_format: str) -> datetime:
+    """Parse a date value of an item."""
+    return datetime.strptime(value, date_format)
+
+
+class _FunctionBuilder:
+    """Source code of one generated extraction function."""
+
+    def __init__(self, name: str):
+        self.lines = [f"def {name}(node):"]
+        self._nodes: dict[tuple[str | int, ...], str] = {(): "node"}
+
+    def access(self, path: tuple[str | int, ...]) -> str:
+        """Emit the lookups of all unvisited prefixes of the path.
+
+        Returns:
+            The name of the local variable holding the value at the path.
+        """
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            if prefix in self._nodes:
+                continue
+            parent = self._nodes[path[: depth - 1]]
+            key = prefix[-1]
+            if isinstance(key, int):
+                lookup = (
+                    f"{parent}[{key}] "
+                    f"if isinstance({parent}, list) and len({parent}) > {key} "
+                    "else None"
+                )
+            else:
+                lookup = (
+                    f"{parent}.get({key!r}) if isinstance({parent}, dict) else None"
+                )
+            variable = f"v{len(self._nodes)}"
+            self.lines.append(f"    {variable} = {lookup}")
+            self._nodes[prefix] = variable
+        return self._nodes[path]
+
+    def emit(self, line: str):
+        """Emit a line of the function body."""
+        self.lines.append(f"    {line}")
+
+
+def _condition(variable: str, required: tuple[str, ...]) -> str:
+    """Return the condition that the variable is a dict with all required keys."""
+    return " and ".join(
+        [f"isinstance({variable}, dict)"]
+        + [f"{key!r} in {variable}" for key in required]
+    )
+
+
+def _compile_getter(path: tuple[str | int, ...], namespace: dict) -> str:
+    """Generate a function returning the value at the path."""
+    name = f"_get{len(namespace)}"
+    namespace[name] = None
+    builder = _FunctionBuilder(name)
+    builder.emit(f"return {builder.access(path)}")
+    exec("\n".join(builder.lines), namespace)
+    return name
+
+
+def _nested_model(annotation: Any) -> type[BaseModel] | None:
+    """Return the model type within an annotation like ``list[Model] | None``."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType, list):
+        for argument in typing.get_args(annotation):
+            model = _nested_model(argument)
+            if model is not None:
+                return model
+    return None
+
+
+def _scalar_type(annotation: Any) -> type | None:
+    """Return the scalar type of an annotation like ``int | None``."""
+    if annotation in _SCALAR_TYPES:
+        return annotation
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        arguments = [
+            argument
+            for argument in typing.get_args(annotation)
+            if argument is not type(None)
+        ]
+        if len(arguments) == 1:
+            return _scalar_type(arguments[0])
+    return None
+
+
+def _emit_type_check(
+    builder: _FunctionBuilder, variable: str, annotation: Any, namespace: dict
+):
+    """Emit raising TypeMismatchError unless the value is None or has the scalar type.
+
+    Pydantic would coerce the value, e.g. the string "12" of an int field, or reject
+    it, so such items have to be validated instead.
+    """
+    scalar = _scalar_type(annotation)
+    if scalar is None:
+        return
+    type_name = f"_type{len(namespace)}"
+    namespace[type_name] = scalar
+    builder.emit(
+        f"if {variable} is not None and type({variable}) is not {type_name}: "
+        "raise _TypeMismatchError"
+    )
+
+
+def _emit_model(
+    builder: _FunctionBuilder,
+    model: type[BaseModel],
+    values: dict[str, str],
+    namespace: dict,
+    dump: bool,
+):
+    """Emit the construction of a model instance, or its dump, from the values.
+
+    The values are ordered like the model fields, fields not covered by the spec keep
+    their defaults.
+    """
+    fields_set = f"_fields_set{len(namespace)}"
+    namespace[fields_set] = frozenset(values)
+    for field_name, model_field in model.model_fields.items():
+        if field_name not in values:
+            values[field_name] = f"_default{len(namespace)}"
+            namespace[values[field_name]] = model_field.default
+    values = {field_name: values[field_name] for field_name in model.model_fields}
+    if dump:
+        builder.emit("return {")
+        for field_name, value in values.items():
+            builder.emit(f"    {field_name!r}: {value},")
+        builder.emit("}")
+        return
+    model_name = f"_model{len(namespace)}"
+    namespace[model_name] = model
+    builder.emit(f"instance = _new_instance({model_name})")
+    builder.emit("_set(instance, '__dict__', {")
+    for field_name, value in values.items():
+        builder.emit(f"    {field_name!r}: {value},")
+    builder.emit("})")
+    builder.emit(f"_set(instance, '__pydantic_fields_set__', set({fields_set}))")
+    builder.emit("_set(instance, '__pydantic_extra__', None)")
+    builder.emit("_set(instance, '__pydantic_private__', None)")
+    builder.emit("return instance")
+
+
+def _value(
+    builder: _FunctionBuilder,
+    field: FieldSpec,
+    namespace: dict,
+    model: type[BaseModel] | None,
+    dump: bool,
+) -> str:
+    """Emit the lookups of a field and return the expression of its value.
+
+    Nested objects and lists are built as the given model if there is one.
+    """
+    variable = builder.access(field.path)
+    if field.type is None:
+        return variable
+    if field.type == "date":
+        return (
+            f"parse_date({variable}, {field.date_format!r}) "
+            f"if {variable} is not None else None"
+        )
+    if field.type == "object":
+        extract = _compile_fields(field.fields, namespace, model, dump)
+        condition = _condition(variable, field.required)
+        return f"{extract}({variable}) if {condition} else None"
+    if field.type == "list":
+        extract = (
+            _compile_fields(field.fields, namespace, model, dump)
+            if field.fields
+            else _compile_getter(field.item_path, namespace)
+        )
+        return (
+            f"[{extract}(element) for element in {variable} "
+            f"if {_condition('element', field.required)}] "
+            f"if isinstance({variable}, list) else None"
+        )
+    raise ValueError(f"Unknown type {field.type} of field {field.name}")
+
+
+def _field_model(
+    model: type[BaseModel] | None, field: FieldSpec
+) -> type[BaseModel] | None:
+    """Return the model nested in a field of the model."""
+    if model is None:
+        return None
+    return _nested_model(model.model_fields[field.name].annotation)
+
+
+def _compile_fields(
+    fields: tuple[FieldSpec, ...],
+    namespace: dict,
+    model: type[BaseModel] | None = None,
+    dump: bool = False,
+) -> str:
+    """Generate a function extracting the fields into a dict or model instance."""
+    name = f"_extract{len(namespace)}"
+    namespace[name] = None
+    builder = _FunctionBuilder(name)
+    if model is not None:
+        fields = tuple(field for field in fields if field.name in model.model_fields)
+    values = {
+        field.name: _value(builder, field, namespace, _field_model(model, field), dump)
+        for field in fields
+    }
+    if model is not None:
+        for field in fields:
+            if field.type is None:
+                annotation = model.model_fields[field.name].annotation
+                _emit_type_check(builder, values[field.name], annotation, namespace)
+    if model is None:
+        builder.emit("return {")
+        for field_name, value in values.items():
+            builder.emit(f"    {field_name!r}: {value},")
+        builder.emit("}")
+    else:
+        _emit_model(builder, model, values, namespace, dump)
+    exec("\n".join(builder.lines), namespace)
+    return name
+
+
+def _namespace(
+    converters: dict[str, Callable[..., Any]] | None, model: type[BaseModel] | None
+) -> dict[str, Any]:
+    """Return the namespace of the generated functions."""
+    if model is not None and any(
+        nested.__private_attributes__
+        or any(field.default_factory for field in nested.model_fields.values())
+        for nested in _models(model)
+    ):
+        raise ValueError(
+            f"Can't construct {model.__name__} with private attributes or factories"
+        )
+    return {
+        "parse_date": parse_date,
+        "_new_instance": object.__new__,
+        "_set": object.__setattr__,
+        "_TypeMismatchError": TypeMismatchError,
+        **(converters or {}),
+    }
+
+
+def compile_extractor(
+    fields: tuple[FieldSpec, ...],
+    converters: dict[str, Callable[..., Any]] | None = None,
+    model: type[BaseModel] | None = None,
+    dump: bool = False,
+) -> Callable[[dict], Any]:
+    """Compile a field spec into a function extracting the fields from an item.
+
+    With a model, the function builds the model and its nested models directly from
+    the extracted values, skipping pydantic validation. Only use it for specs whose
+    values already have the types of the model fields; fields that are not part of
+    the model are dropped and fields missing in the spec keep their defaults. Items
+    with a plain value that does not have the scalar type of its field, e.g. a
+    numeric string, are validated by pydantic instead.
+
+    Args:
+        fields: The fields to extract from the item.
+        converters: Replacements of the default converters, e.g. "parse_date".
+        model: The trusted model to construct instead of a dict.
+        dump: Return what ``model_dump()`` of the model would return instead of the
+            model, without building any model instance.
+
+    Returns:
+        A function taking an item and returning the extracted fields as a dict, or as
+        an instance of the model.
+    """
+    namespace = _namespace(converters, model)
+    extract = namespace[_compile_fields(fields, namespace, model, dump)]
+    if model is None:
+        return extract
+    extract_fields = namespace[_compile_fields(fields, namespace)]
+
+    def construct(item: dict) -> Any:
+        try:
+            return extract(item)
+        except TypeMismatchError:
+            instance = model.model_validate(extract_fields(item))
+            return instance.model_dump() if dump else instance
+
+    return construct
+
+
+def compile_field_extractors(
+    fields: tuple[FieldSpec, ...],
+    converters: dict[str, Callable[..., Any]] | None = None,
+    model: type[BaseModel] | None = None,
+    dump: bool = False,
+) -> dict[str, Callable[[dict], Any]]:
+    """Compile a separate function for every field of a spec.
+
+    See ``compile_extractor`` for the arguments.
+
+    Returns:
+        The function extracting the value of each field from an item by field name.
+    """
+    namespace = _namespace(converters, model)
+    extractors = {}
+    for field in fields:
+        if model is not None and field.name not in model.model_fields:
+            continue
+        name = f"_field{len(namespace)}"
+        namespace[name] = None
+        builder = _FunctionBuilder(name)
+        value = _value(builder, field, namespace, _field_model(model, field), dump)
+        if model is not None and field.type is None:
+            annotation = model.model_fields[field.name].annotation
+            _emit_type_check(builder, value, annotation, namespace)
+        builder.emit(f"return {value}")
+        exec("\n".join(builder.lines), namespace)
+        extractors[field.name] = (
+            namespace[name]
+            if model is None
+            else _validate_on_mismatch(
+                namespace[name], compile_extractor((field,), converters), model, dump
+            )
+        )
+    return extractors
+
+
+def _validate_on_mismatch(
+    extract: Callable[[dict], Any],
+    extract_fields: Callable[[dict], dict],
+    model: type[BaseModel],
+    dump: bool,
+) -> Callable[[dict], Any]:
+    """Return the extractor of a field, validating the field on a TypeMismatchError."""
+
+    def extract_field(item: dict) -> Any:
+        try:
+            return extract(item)
+        except TypeMismatchError:
+            ((name, value),) = extract_fields(item).items()
+            instance = model.model_validate({name: value})
+            return instance.model_dump()[name] if dump else getattr(instance, name)
+
+    return extract_field
+
+
+def source_keys(fields: tuple[FieldSpec, ...]) -> list[str]:
+    """Return the top-level keys of the items the fields are extracted from.
+
+    Only these keys have to be fetched for an extraction, e.g. as the ``fields``
+    projection of a dataset download.
+    """
+    keys: list[str] = []
+    for field in fields:
+        if field.path:
+            keys.append(str(field.path[0]))
+        else:
+            keys.extend(source_keys(field.fields))
+    return list(dict.fromkeys(keys))
+
+
+def _models(model: type[BaseModel]) -> set[type[BaseModel]]:
+    """Return the model and all models nested in it."""
+    models = {model}
+    for field in model.model_fields.values():
+        nested = _nested_model(field.annotation)
+        if nested is not None and nested not in models:
+            models |= _models(nested)
+    return models
@@ -1,4 +1,5 @@
 """Helper functions."""
+from collections.abc import Iterator
 
 from parma_mining.crunchbase.model import ErrorInfoModel
 from parma_mining.mining_common.exceptions import BaseError
@@ -9,3 +10,10 @@ def collect_errors(company_id: str, errors: dict, e: BaseError):
     errors[company_id] = ErrorInfoModel(
         error_type=e.__class__.__name__, error_description=e.message
     )
+
+
+def chunks(items: list, size: int) -> Iterator[list]:
+    """Split the given list into consecutive chunks of at most size items."""
+    size = max(size, 1)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
@@ -0,0 +1,264 @@
+"""Compressed archive of raw dataset items for reprocessing without scraping again.
+
+Items are appended to segmented JSONL files in which every item is compressed on its
+own, as a gzip member or a zstd frame. The segments are still valid compressed JSONL
+streams that can be read in one go, while the sidecar index of every segment records
+the key, crawl time, offset and length of each item, so a single item can be read
+through a memory map without decompressing the rest of the segment.
+
+``ITEM_ARCHIVE_COMPRESSION=zstd`` requires the optional zstandard package and falls
+back to gzip without it.
+"""
+import gzip
+import json
+import logging
+import mmap
+import os
+import threading
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+from parma_mining.mining_common import json_codec
+from parma_mining.mining_common.storage import store_path
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+INDEX_SUFFIX = ".idx"
+
+
+class ArchivedItem(NamedTuple):
+    """Location of an item in the archive."""
+
+    key: str
+    crawled_at: datetime
+    segment: str
+    offset: int
+    length: int
+
+
+def _compression(compression: str) -> str:
+    """Return the usable compression, falling back to gzip."""
+    if compression == "zstd" and zstandard is None:
+        logger.warning("zstd compression requires the zstandard package, using gzip")
+        return "gzip"
+    if compression not in SEGMENT_SUFFIXES:
+        logger.warning(f"Unknown archive compression '{compression}', using gzip")
+        return "gzip"
+    return compression
+
+
+class ItemArchive:
+    """Append-only archive of raw items, indexed by key and crawl time."""
+
+    load_dotenv()
+    compression = str(os.getenv("ITEM_ARCHIVE_COMPRESSION") or "gzip")
+    # a new segment is started once the current one holds this many bytes
+    segment_size = int(os.getenv("ITEM_ARCHIVE_SEGMENT_MB") or 64) * 1024 * 1024
+
+    def __init__(self, path: str | None = None):
+        self.path = Path(path or store_path("ITEM_ARCHIVE_PATH", "items"))
+        self._compression = _compression(self.compression)
+        self._lock = threading.Lock()
+        self._maps: dict[str, tuple[int, mmap.mmap]] = {}
+        # archived versions of every key, ordered by crawl time
+        self._index: dict[str, list[ArchivedItem]] = {}
+        self._segment = ""
+
+    def open(self):
+        """Create the archive directory and load the index, unless done already.
+
+        Raises:
+            OSError: If the archive directory cannot be created.
+        """
+        with self._lock:
+            if self._segment:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            for index_path in sorted(self.path.glob(f"*{INDEX_SUFFIX}")):
+                self._load_index(index_path)
+            self._segment = self._next_segment()
+
+    def _load_index(self, index_path: Path):
+        """Add the entries of the sidecar index of a segment."""
+        segment = index_path.name.removesuffix(INDEX_SUFFIX)
+        with open(index_path, encoding="utf-8") as index_file:
+            for line in index_file:
+                try:
+                    key, crawled_at, offset, length = json.loads(line)
+                except ValueError:
+                    # the last line may be incomplete after a crash
+                    logger.warning(f"Skipping corrupt index entry in {index_path}")
+                    continue
+                self._add(
+                    ArchivedItem(
+                        key, datetime.fromisoformat(crawled_at), segment, offset, length
+                    )
+                )
+
+    def _add(self, entry: ArchivedItem):
+        """Add an entry to the in-memory index."""
+        versions = self._index.setdefault(entry.key, [])
+        versions.append(entry)
+        if len(versions) > 1 and versions[-2].crawled_at > entry.crawled_at:
+            versions.sort(key=lambda version: version.crawled_at)
+
+    def _segments(self) -> list[Path]:
+        """Return the paths of all segments in the order they were written."""
+        return sorted(
+            path
+            for path in self.path.glob("segment-*")
+            if path.name.endswith(tuple(SEGMENT_SUFFIXES.values()))
+        )
+
+    def _next_segment(self) -> str:
+        """Return the name of the segment new items are appended to."""
+        suffix = SEGMENT_SUFFIXES[self._compression]
+        segments = self._segments()
+        if segments:
+            last = segments[-1]
+            if last.name.endswith(suffix) and last.stat().st_size < self.segment_size:
+                return last.name
+            number = int(last.name.split(".")[0].removeprefix("segment-")) + 1
+        else:
+            number = 0
+        return f"segment-{number:06d}{suffix}"
+
+    def _compress(self, data: bytes) -> bytes:
+        """Compress one item into an independent gzip member or zstd frame."""
+        if self._compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data, mtime=0)
+
+    @staticmethod
+    def _decompress(segment: str, data: bytes) -> bytes:
+        """Decompress one item of a segment."""
+        if segment.endswith(SEGMENT_SUFFIXES["zstd"]):
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def append(
+        self,
+        items: Iterable[tuple[str, dict | bytes]],
+        crawled_at: datetime | None = None,
+    ):
+        """Append items to the archive.
+
+        Args:
+            items: The key, e.g. the permalink, and the item or its JSON encoding.
+            crawled_at: When the items were scraped, now by default.
+        """
+        self.open()
+        crawled_at = crawled_at or datetime.now()
+        with self._lock:
+            segment_path = self.path / self._segment
+            with open(segment_path, "ab") as segment_file, open(
+                self.path / f"{self._segment}{INDEX_SUFFIX}", "a", encoding="utf-8"
+            ) as index_file:
+                for key, item in items:
+                    data = item if isinstance(item, bytes) else json_codec.encode(item)
+                    compressed = self._compress(data.rstrip(b"\n") + b"\n")
+                    offset = segment_file.tell()
+                    segment_file.write(compressed)
+                    entry = ArchivedItem(
+                        key, crawled_at, self._segment, offset, len(compressed)
+                    )
+                    index_file.write(
+                        json.dumps(
+                            [key, crawled_at.isoformat(), offset, len(compressed)]
+                        )
+                        + "\n"
+                    )
+                    self._add(entry)
+            if segment_path.stat().st_size >= self.segment_size:
+                self._segment = self._next_segment()
+
+    def _read(self, entry: ArchivedItem) -> bytes:
+        """Read the JSON encoding of an archived item through a memory map."""
+        end = entry.offset + entry.length
+        with self._lock:
+            size, mapped = self._maps.get(entry.segment, (0, None))
+            if mapped is None or size < end:
+                if mapped is not None:
+                    mapped.close()
+                with open(self.path / entry.segment, "rb") as segment_file:
+                    mapped = mmap.mmap(
+                        segment_file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                self._maps[entry.segment] = (len(mapped), mapped)
+            data = mapped[entry.offset : end]
+        return self._decompress(entry.segment, data)
+
+    def versions(self, key: str) -> list[ArchivedItem]:
+        """Return all archived versions of a key, oldest first."""
+        self.open()
+        return list(self._index.get(key, []))
+
+    def get(self, key: str, at: datetime | None = None) -> dict | None:
+        """Return the latest version of an item crawled at or before the given time."""
+        self.open()
+        versions = self._index.get(key, [])
+        if at is not None:
+            versions = versions[
+                : bisect_right([version.crawled_at for version in versions], at)
+            ]
+        if not versions:
+            return None
+        return json.loads(self._read(versions[-1]))
+
+    def iter_items(
+        self, since: datetime | None = None
+    ) -> Iterator[tuple[str, datetime, dict]]:
+        """Stream all archived items, segment by segment in the order of appending.
+
+        Every item is read at the offset its index entry records, so an index entry
+        lost in a crash only drops that item instead of shifting the later ones.
+
+        Yields:
+            The key, the crawl time and the item.
+        """
+        self.open()
+        with self._lock:
+            entries = sorted(
+                (
+                    entry
+                    for versions in self._index.values()
+                    for entry in versions
+                    if since is None or entry.crawled_at >= since
+                ),
+                key=lambda entry: (entry.segment, entry.offset),
+            )
+        for entry in entries:
+            yield entry.key, entry.crawled_at, json.loads(self._read(entry))
+
+    def close(self):
+        """Close the memory maps of the segments."""
+        with self._lock:
+            for _, mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    def stats(self) -> dict:
+        """Return the number of archived keys, items and segment bytes."""
+        self.open()
+        with self._lock:
+            items = sum(len(versions) for versions in self._index.values())
+            keys = len(self._index)
+        segments = self._segments()
+        return {
+            "keys": keys,
+            "items": items,
+            "segments": len(segments),
+            "bytes": sum(segment.stat().st_size for segment in segments),
+            "compression": self._compression,
+        }
@@ -0,0 +1,54 @@
+"""JSON encoding of request bodies.
+
+Payloads are encoded once, straight from python objects into the request body bytes.
+The default codec produces exactly the bytes httpx generates for ``json=`` request
+bodies, with datetimes rendered as ``str(datetime)`` like ``json.dumps(default=str)``.
+Setting ``JSON_CODEC=orjson`` switches to orjson if it is installed; it is faster but
+may format floats with exponents differently and does not reject NaN values.
+"""
+import json
+import logging
+import os
+from collections.abc import Callable
+from typing import Any
+
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_json(data: Any) -> bytes:
+    """Encode data with the standard library like httpx does."""
+    return json.dumps(
+        data,
+        default=str,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        allow_nan=False,
+    ).encode("utf-8")
+
+
+def _encode_orjson(data: Any) -> bytes:
+    """Encode data with orjson, rendering datetimes like the default codec."""
+    return orjson.dumps(data, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def _load_encoder() -> Callable[[Any], bytes]:
+    """Select the encoder configured by the JSON_CODEC environment variable."""
+    load_dotenv()
+    codec = str(os.getenv("JSON_CODEC") or "json").lower()
+    if codec == "orjson":
+        if orjson is not None:
+            return _encode_orjson
+        logger.warning("JSON_CODEC=orjson requires the orjson package, using json")
+    elif codec != "json":
+        logger.warning(f"Unknown JSON_CODEC '{codec}', using json")
+    return _encode_json
+
+
+encode: Callable[[Any], bytes] = _load_encoder()
@@ -2,13 +2,18 @@
 
 This module contains the JWTHandler class which is designed to verify JWTs. The
 verification process supports shared secret keys to enable authentication.
+Verified tokens are cached until they expire and rejected tokens for a short time,
+since the orchestrator reuses one token for all requests of a task.
 """
 import logging
 import os
+import time
 
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
 
+from parma_mining.mining_common.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,10 +25,24 @@ class JWTHandler:
     )
     ALGORITHM: str = "HS256"
 
+    # verified tokens are cached for at most JWT_CACHE_TTL seconds and never past
+    # their exp claim, rejected tokens for JWT_NEGATIVE_CACHE_TTL seconds
+    verified_cache = TTLCache(
+        max_size=int(os.getenv("JWT_CACHE_MAX_SIZE") or 1024),
+        ttl=float(os.getenv("JWT_CACHE_TTL") or 300),
+    )
+    rejected_cache = TTLCache(
+        max_size=int(os.getenv("JWT_NEGATIVE_CACHE_MAX_SIZE") or 1024),
+        ttl=float(os.getenv("JWT_NEGATIVE_CACHE_TTL") or 30),
+    )
+
     @staticmethod
     def verify_jwt(token: str) -> bool:
         """Verify a JWT using the shared secret key.
 
+        Tokens verified or rejected before are answered from the caches without
+        decoding them again.
+
         Args:
             token: The JWT token to verify.
 
@@ -31,14 +50,46 @@ class JWTHandler:
             True if the verification is successful.
             False otherwise.
         """
+        key = (JWTHandler.SHARED_SECRET_KEY, token)
+        if JWTHandler.verified_cache.get(key) is not None:
+            return True
+        if JWTHandler.rejected_cache.get(key) is not None:
+            logger.error("JWT was rejected before.")
+            return False
+
         try:
-            jwt.decode(
+            claims = jwt.decode(
                 token, JWTHandler.SHARED_SECRET_KEY, algorithms=[JWTHandler.ALGORITHM]
             )
+            expires_at = claims.get("exp") if isinstance(claims, dict) else None
+            JWTHandler.verified_cache.set(
+                key,
+                True,
+                ttl=(
+                    None
+                    if not isinstance(expires_at, int | float)
+                    else expires_at - time.time()
+                ),
+            )
             return True
         except ExpiredSignatureError:
             logger.error("JWT has expired.")
         except JWTError:
             logger.error("Invalid JWT, unable to decode.")
 
+        JWTHandler.rejected_cache.set(key, True)
         return False
+
+    @staticmethod
+    def stats() -> dict:
+        """Return the statistics of the verified and rejected token caches."""
+        return {
+            "verified": JWTHandler.verified_cache.stats(),
+            "rejected": JWTHandler.rejected_cache.stats(),
+        }
+
+    @staticmethod
+    def clear_cache():
+        """Forget all verified and rejected tokens."""
+        JWTHandler.verified_cache.clear()
+        JWTHandler.rejected_cache.clear()
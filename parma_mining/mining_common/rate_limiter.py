@@ -0,0 +1,37 @@
+"""Rate limiting helpers."""
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how often an action may be taken.
+
+    The bucket holds up to capacity tokens and is refilled with rate tokens per
+    second. Every action takes one token and waits until one is available, which
+    allows short bursts while keeping the average rate below the limit. A rate of
+    zero or less disables the limit.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, blocking until one is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,88 @@
+"""Local storage of the persistent caches and stores.
+
+The stores keep their files below ``CACHE_DIR``, a directory in the system temporary
+directory by default, since the working directory of the container image is not
+writable. Their databases are opened on first use or when the app starts, never at
+import time. Databases that cannot be opened are kept in memory instead.
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+MEMORY = ":memory:"
+
+
+def cache_dir() -> Path:
+    """Return the directory of the local stores."""
+    load_dotenv()
+    return Path(
+        os.getenv("CACHE_DIR")
+        or Path(tempfile.gettempdir()) / "parma-mining-crunchbase"
+    )
+
+
+def store_path(variable: str, name: str) -> str:
+    """Return the path set in the environment variable, else the one in CACHE_DIR."""
+    load_dotenv()
+    return str(os.getenv(variable) or cache_dir() / name)
+
+
+class SQLiteStore:
+    """SQLite database shared by threads and opened on first use.
+
+    Subclasses create their tables in ``_prepare``, which runs whenever the
+    database is opened. If the file cannot be created or written, the data is kept
+    in an in-memory database for the lifetime of the process.
+    """
+
+    # environment variable of the database path and file name in CACHE_DIR
+    path_variable = ""
+    file_name = ""
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._database: sqlite3.Connection | None = None
+
+    def _prepare(self, connection: sqlite3.Connection):
+        """Create the tables of the store."""
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        """Open the database at path and prepare it."""
+        if path != MEMORY:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(path, check_same_thread=False)
+        try:
+            with connection:
+                self._prepare(connection)
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection
+
+    def open(self):
+        """Open the database unless it is open already."""
+        with self._open_lock:
+            if self._database is not None:
+                return
+            path = self.path or store_path(self.path_variable, self.file_name)
+            try:
+                self._database = self._connect(path)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Cannot open {path}, keeping the data in memory: {e}")
+                self._database = self._connect(MEMORY)
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Return the database, opening it on first use."""
+        if self._database is None:
+            self.open()
+        return self._database  # type: ignore[return-value]
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from unittest.mock import MagicMock
 
@@ -5,8 +6,10 @@ import pytest
 from fastapi.testclient import TestClient
 
 from parma_mining.crunchbase.api.dependencies.auth import authenticate
-from parma_mining.crunchbase.api.main import app
-from parma_mining.mining_common.const import HTTP_200
+from parma_mining.crunchbase.api.main import app, crunchbase_client
+from parma_mining.crunchbase.model import CompanyModel, RawResponseModel
+from parma_mining.mining_common.const import HTTP_200, HTTP_422
+from parma_mining.mining_common.exceptions import AnalyticsError, CrawlingError
 from tests.dependencies.mock_auth import mock_authenticate
 
 
@@ -23,6 +26,8 @@ def client():
 
 logger = logging.getLogger(__name__)
 
+MAX_CONCURRENT_RUNS = 2
+
 
 @pytest.fixture
 def mock_crunchbase_client(mocker) -> MagicMock:
@@ -93,7 +98,8 @@ def mock_analytics_client(mocker) -> MagicMock:
     mock = mocker.patch(
         "parma_mining.crunchbase.api.main.AnalyticsClient.crawling_finished"
     )
-    # No return value needed, but you can add side effects or exceptions if necessary
+    # The awaited result is returned by the endpoint, so it has to be serializable
+    mock.return_value = {}
     return mock
 
 
@@ -120,3 +126,243 @@ def test_get_company_details(
     mock_analytics_client.assert_called()
 
     assert response.status_code == HTTP_200
+
+
+def test_get_company_details_batched(mocker, client: TestClient):
+    async def stream_companies_details(urls, bypass_cache, profile):
+        yield "finto-acba", CompanyModel(name="Finto", permalink="finto-acba")
+        yield "personio", CompanyModel(name="Personio", permalink="personio")
+
+    mock_details = mocker.patch(
+        "parma_mining.crunchbase.api.main.CrunchbaseClient.stream_companies_details",
+        side_effect=stream_companies_details,
+    )
+    mock_feed = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.feed_raw_data"
+    )
+    mock_finished = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.crawling_finished"
+    )
+    mock_finished.return_value = {}
+
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {
+                "urls": ["https://www.crunchbase.com/organization/finto-acba"]
+            },
+            "Example_id2": {"urls": ["www.crunchbase.com/organization/Personio"]},
+            "Example_id3": {
+                "urls": ["https://www.crunchbase.com/organization/missing"]
+            },
+            "Example_id4": {"urls": ["https://www.crunchbase.com/person/jane-doe"]},
+        },
+    }
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    mock_details.assert_called_once_with(
+        [
+            "https://www.crunchbase.com/organization/finto-acba",
+            "https://www.crunchbase.com/organization/Personio",
+            "https://www.crunchbase.com/organization/missing",
+        ],
+        bypass_cache=False,
+        profile="full",
+    )
+    fed = {call.args[1].company_id for call in mock_feed.call_args_list}
+    assert fed == {"Example_id1", "Example_id2"}
+    errors = mock_finished.call_args.args[1]["errors"]
+    assert sorted(errors) == ["Example_id3", "Example_id4"]
+    assert errors["Example_id3"]["error_type"] == "CrawlingError"
+    assert errors["Example_id4"]["error_type"] == "ClientInvalidBodyError"
+
+
+def test_get_company_details_concurrent_runs(mocker, client: TestClient):
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.crunchbase_client.batch_size",
+        1,
+    )
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.crunchbase_client.max_concurrent_runs",
+        MAX_CONCURRENT_RUNS,
+    )
+    in_flight = {"current": 0, "max": 0}
+
+    async def stream_companies_details(urls, bypass_cache, profile):
+        in_flight["current"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        await asyncio.sleep(0.01)
+        in_flight["current"] -= 1
+        if urls[0].endswith("broken"):
+            raise CrawlingError("Actor run failed")
+        permalink = urls[0].rsplit("/", 1)[-1]
+        yield permalink, CompanyModel(permalink=permalink)
+
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.CrunchbaseClient.stream_companies_details",
+        side_effect=stream_companies_details,
+    )
+    mock_feed = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.feed_raw_data"
+    )
+    mock_feed.side_effect = AnalyticsError("Feed failed")
+    mock_finished = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.crawling_finished"
+    )
+    mock_finished.return_value = {}
+
+    companies = {
+        f"id{index}": {"urls": [f"https://www.crunchbase.com/organization/c{index}"]}
+        for index in range(5)
+    }
+    companies["id_broken"] = {
+        "urls": ["https://www.crunchbase.com/organization/broken"]
+    }
+    response = client.post("/companies", json={"task_id": 1, "companies": companies})
+
+    assert response.status_code == HTTP_200
+    assert in_flight["max"] == MAX_CONCURRENT_RUNS
+    errors = mock_finished.call_args.args[1]["errors"]
+    assert set(errors) == set(companies)
+    assert errors["id_broken"]["error_type"] == "CrawlingError"
+    assert errors["id0"]["error_type"] == "AnalyticsError"
+
+
+def test_get_company_details_partial_stream(mocker, client: TestClient):
+    async def stream_companies_details(urls, bypass_cache, profile):
+        yield "finto-acba", CompanyModel(name="Finto", permalink="finto-acba")
+        raise CrawlingError("Actor run failed")
+
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.CrunchbaseClient.stream_companies_details",
+        side_effect=stream_companies_details,
+    )
+    mock_feed = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.feed_raw_data"
+    )
+    mock_finished = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.crawling_finished"
+    )
+    mock_finished.return_value = {}
+
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {
+                "urls": ["https://www.crunchbase.com/organization/finto-acba"]
+            },
+            "Example_id2": {
+                "urls": ["https://www.crunchbase.com/organization/personio"]
+            },
+        },
+    }
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    fed = [call.args[1].company_id for call in mock_feed.call_args_list]
+    assert fed == ["Example_id1"]
+    errors = mock_finished.call_args.args[1]["errors"]
+    assert list(errors) == ["Example_id2"]
+
+
+def test_get_company_details_passthrough(mocker, client: TestClient):
+    item = b'{"identifier":{"value":"Finto","permalink":"finto-acba"}}'
+
+    async def stream_companies_raw(urls, profile):
+        yield "finto-acba", item
+
+    mocker.patch.object(crunchbase_client, "passthrough_mode", "raw")
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.CrunchbaseClient.stream_companies_raw",
+        side_effect=stream_companies_raw,
+    )
+    mock_details = mocker.patch(
+        "parma_mining.crunchbase.api.main.CrunchbaseClient.stream_companies_details"
+    )
+    mock_feed = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.feed_raw_data"
+    )
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.crawling_finished",
+        return_value={},
+    )
+
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {
+                "urls": ["https://www.crunchbase.com/organization/finto-acba"]
+            },
+        },
+    }
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    mock_details.assert_not_called()
+    fed = mock_feed.call_args.args[1]
+    assert isinstance(fed, RawResponseModel)
+    assert fed.raw_data is item
+
+
+def test_get_company_details_profiles(mocker, client: TestClient):
+    async def stream_companies_details(urls, bypass_cache, profile):
+        for url in urls:
+            permalink = url.rsplit("/", 1)[-1]
+            yield permalink, CompanyModel(name=permalink, permalink=permalink)
+
+    mock_details = mocker.patch(
+        "parma_mining.crunchbase.api.main.CrunchbaseClient.stream_companies_details",
+        side_effect=stream_companies_details,
+    )
+    mock_feed = mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.feed_raw_data"
+    )
+    mocker.patch(
+        "parma_mining.crunchbase.api.main.AnalyticsClient.crawling_finished",
+        return_value={},
+    )
+
+    payload = {
+        "task_id": 123,
+        "profile": "lite",
+        "profiles": {"Example_id2": "full"},
+        "companies": {
+            "Example_id1": {
+                "urls": ["https://www.crunchbase.com/organization/finto-acba"]
+            },
+            "Example_id2": {
+                "urls": ["https://www.crunchbase.com/organization/finto-acba"]
+            },
+            "Example_id3": {
+                "urls": ["https://www.crunchbase.com/organization/personio"]
+            },
+        },
+    }
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    runs = {
+        call.kwargs["profile"]: call.args[0] for call in mock_details.call_args_list
+    }
+    assert runs == {
+        "lite": [
+            "https://www.crunchbase.com/organization/finto-acba",
+            "https://www.crunchbase.com/organization/personio",
+        ],
+        "full": ["https://www.crunchbase.com/organization/finto-acba"],
+    }
+    fed = {
+        call.args[1].company_id: call.args[1].profile
+        for call in mock_feed.call_args_list
+    }
+    assert fed == {"Example_id1": "lite", "Example_id2": "full", "Example_id3": "lite"}
+
+
+def test_get_company_details_unknown_profile(client: TestClient):
+    payload = {"task_id": 123, "profile": "tiny", "companies": {}}
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_422
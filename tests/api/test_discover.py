@@ -87,3 +87,19 @@ def test_discover_endpoint_with_crunchbase_client_error(
     with pytest.raises(Exception) as exc_info:
         client.post("/discover", json=request_data)
     assert "Mocked Exception" in str(exc_info.value)
+
+
+def test_discover_endpoint_resolves_duplicates_once(
+    client: TestClient, mock_crunchbase_client: MagicMock
+):
+    request_data = [
+        DiscoveryRequest(company_id="123", name="TestCompany").model_dump(),
+        DiscoveryRequest(company_id="456", name=" testcompany").model_dump(),
+    ]
+
+    response = client.post("/discover", json=request_data)
+
+    assert response.status_code == HTTP_200
+    mock_crunchbase_client.assert_called_once()
+    identifiers = response.json()["identifiers"]
+    assert identifiers["123"] == identifiers["456"] == {"urls": ["mock_url"]}
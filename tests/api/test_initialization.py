@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
@@ -24,7 +24,8 @@ def client():
 def mock_analytics_client(mocker) -> MagicMock:
     """Mocking the AnalyticsClient's register_measurements method."""
     mock = mocker.patch(
-        "parma_mining.crunchbase.api.main.AnalyticsClient.register_measurements"
+        "parma_mining.crunchbase.api.main.AnalyticsClient.register_measurements",
+        return_value=([], {"Mappings": []}),
     )
     return mock
 
@@ -35,6 +36,15 @@ def test_initialize_success(client: TestClient, mock_analytics_client: MagicMock
     mock_analytics_client.assert_called_once()
 
 
+def test_initialize_refresh(client: TestClient, mock_analytics_client: MagicMock):
+    with patch(
+        "parma_mining.crunchbase.api.main.measurement_registry.clear"
+    ) as mock_clear:
+        response = client.get("/initialize?source_id=123&refresh=true")
+    assert response.status_code == HTTP_200
+    mock_clear.assert_called_once_with(123)
+
+
 def test_initialize_missing_source_id(client: TestClient):
     response = client.get("/initialize")
     assert response.status_code == HTTP_422
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from parma_mining.crunchbase.api.main import analytics_client, app
+from parma_mining.mining_common.const import HTTP_200
+
+
+def test_stats_success():
+    with TestClient(app) as client:
+        assert analytics_client.pool_stats()["open"] is True
+        response = client.get("/stats")
+        assert response.status_code == HTTP_200
+        pool_stats = response.json()["analytics_http_pool"]
+        assert pool_stats["max_connections"] == analytics_client.max_connections
+        assert "requests" in pool_stats
+
+    assert analytics_client.pool_stats()["open"] is False
@@ -1,14 +1,21 @@
-from unittest.mock import patch
+import asyncio
+import copy
+import json
+from unittest.mock import AsyncMock, patch
 
 import httpx
 import pytest
 
 from parma_mining.crunchbase.analytics_client import AnalyticsClient
+from parma_mining.crunchbase.measurement_registry import MeasurementRegistry
 from parma_mining.crunchbase.model import (
     CompanyModel,
+    RawResponseModel,
     ResponseModel,
 )
+from parma_mining.crunchbase.normalization_map import CrunchbaseNormalizationMap
 from parma_mining.mining_common.const import HTTP_200, HTTP_500
+from parma_mining.mining_common.exceptions import AnalyticsError
 
 TOKEN = "mocked_token"
 
@@ -161,36 +168,281 @@ def mock_response_model(mock_organization_model):
     )
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
 def test_send_post_request_success(mock_post, analytics_client):
     mock_post.return_value = httpx.Response(HTTP_200, json={"key": "value"})
-    response = analytics_client.send_post_request(
-        TOKEN, "http://example.com", {"data": "test"}
+    response = asyncio.run(
+        analytics_client.send_post_request(
+            TOKEN, "http://example.com", {"data": "test"}
+        )
     )
     assert response == {"key": "value"}
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
 def test_send_post_request_failure(mock_post, analytics_client):
     mock_post.return_value = httpx.Response(HTTP_500, text="Internal Server Error")
     with pytest.raises(Exception) as exc_info:
-        analytics_client.send_post_request(
-            TOKEN, "http://example.com", {"data": "test"}
+        asyncio.run(
+            analytics_client.send_post_request(
+                TOKEN, "http://example.com", {"data": "test"}
+            )
         )
     assert "API request failed" in str(exc_info.value)
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
 def test_register_measurements(mock_post, analytics_client):
     mock_post.return_value = httpx.Response(HTTP_200, json={"id": "123"})
     mapping = {"Mappings": [{"DataType": "int", "MeasurementName": "test_metric"}]}
-    result, updated_mapping = analytics_client.register_measurements(TOKEN, mapping)
+    result, updated_mapping = asyncio.run(
+        analytics_client.register_measurements(TOKEN, mapping)
+    )
     assert "source_measurement_id" in updated_mapping["Mappings"][0]
     assert result[0]["source_measurement_id"] == "123"
+    assert "source_measurement_id" not in mapping["Mappings"][0]
+
+
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+def test_register_measurements_registry(mock_post, analytics_client):
+    mock_post.return_value = httpx.Response(HTTP_200, json={"id": "123"})
+    registry = MeasurementRegistry(":memory:")
+    mapping: dict[str, list[dict]] = {
+        "Mappings": [
+            {
+                "DataType": "nested",
+                "MeasurementName": "rounds",
+                "NestedMappings": [{"DataType": "int", "MeasurementName": "amount"}],
+            },
+            {"DataType": "int", "MeasurementName": "employees"},
+        ]
+    }
+
+    def register(mapping):
+        return asyncio.run(
+            analytics_client.register_measurements(
+                TOKEN, mapping, source_module_id=1, registry=registry
+            )
+        )
+
+    registered = register(mapping)
+    assert mock_post.await_count == len(registered[0])
+    # an unchanged map is served from the registry
+    assert register(mapping) == registered
+    assert mock_post.await_count == len(registered[0])
+
+    # only the changed measurement is registered again
+    mapping["Mappings"][1]["DataType"] = "text"
+    result, updated_mapping = register(mapping)
+    assert mock_post.await_count == len(registered[0]) + 1
+    assert updated_mapping["Mappings"][0] == registered[1]["Mappings"][0]
+    assert result[-1]["type"] == "text"
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
 def test_feed_raw_data(mock_post, analytics_client, mock_response_model):
     mock_post.return_value = httpx.Response(HTTP_200, json={"result": "success"})
-    result = analytics_client.feed_raw_data(TOKEN, mock_response_model)
+    result = asyncio.run(analytics_client.feed_raw_data(TOKEN, mock_response_model))
     assert result == {"result": "success"}
+
+
+def test_send_post_request_reuses_pooled_client():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        in_flight.append(client.pool_stats()["in_flight"])
+        return httpx.Response(HTTP_200, json={"id": len(requests)})
+
+    client = AnalyticsClient(transport=httpx.MockTransport(handler))
+    in_flight: list[int] = []
+
+    async def send_twice():
+        first = await client.send_post_request(TOKEN, "http://example.com", {})
+        http_client = client.http_client
+        client.open()
+        second = await client.send_post_request(TOKEN, "http://example.com", {})
+        assert client.http_client is http_client
+        await client.aclose()
+        return first, second
+
+    assert asyncio.run(send_twice()) == ({"id": 1}, {"id": 2})
+    assert requests[0].headers["Authorization"] == f"Bearer {TOKEN}"
+    assert in_flight == [1, 1]
+    stats = client.pool_stats()
+    assert stats["requests"] == len(requests)
+    assert stats["in_flight"] == 0
+    assert stats["open"] is False
+
+
+def test_pooled_client_configuration(analytics_client, mocker):
+    async_client = mocker.patch("httpx.AsyncClient", wraps=httpx.AsyncClient)
+
+    http_client = analytics_client.http_client
+
+    assert http_client.timeout.connect == analytics_client.connect_timeout
+    assert http_client.timeout.read == analytics_client.read_timeout
+    assert async_client.call_args.kwargs["limits"] == httpx.Limits(
+        max_connections=analytics_client.max_connections,
+        max_keepalive_connections=analytics_client.max_keepalive_connections,
+        keepalive_expiry=analytics_client.keepalive_expiry,
+    )
+    asyncio.run(analytics_client.aclose())
+
+
+def test_feed_raw_data_payload_is_byte_compatible(mock_response_model):
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(request.content)
+        return httpx.Response(HTTP_200, json={"result": "success"})
+
+    client = AnalyticsClient(transport=httpx.MockTransport(handler))
+    client.feed_raw_url = "http://example.com/feed-raw-data"
+    asyncio.run(client.feed_raw_data(TOKEN, mock_response_model))
+
+    # the payload previously sent: dumped, loaded and serialized again by httpx
+    legacy_data = {
+        "source_name": mock_response_model.source_name,
+        "company_id": mock_response_model.company_id,
+        "raw_data": json.loads(mock_response_model.raw_data.updated_model_dump()),
+    }
+    legacy_body = httpx.Request("POST", "http://example.com", json=legacy_data).content
+    assert bodies == [legacy_body]
+
+
+def test_feed_raw_data_passthrough(mock_response_model):
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(request.content)
+        return httpx.Response(HTTP_200, json={"result": "success"})
+
+    client = AnalyticsClient(transport=httpx.MockTransport(handler))
+    client.feed_raw_url = "http://example.com/feed-raw-data"
+    item = b'{"identifier":{"value":"\xc3\xa4","permalink":"a"},"rank":1}'
+    asyncio.run(
+        client.feed_raw_data(
+            TOKEN,
+            RawResponseModel(source_name="crunchbase", company_id="1", raw_data=item),
+        )
+    )
+
+    assert json.loads(bodies[0]) == {
+        "source_name": "crunchbase",
+        "company_id": "1",
+        "raw_data": json.loads(item),
+    }
+
+
+def test_feed_raw_data_profile(mock_organization_model):
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        return httpx.Response(HTTP_200, json={"result": "success"})
+
+    client = AnalyticsClient(transport=httpx.MockTransport(handler))
+    client.feed_raw_url = "http://example.com/feed-raw-data"
+    asyncio.run(
+        client.feed_raw_data(
+            TOKEN,
+            ResponseModel(
+                source_name="crunchbase",
+                company_id="1",
+                raw_data=mock_organization_model,
+                profile="lite",
+            ),
+        )
+    )
+
+    raw_data = bodies[0]["raw_data"]
+    assert raw_data["total_funding_usd"] == mock_organization_model.total_funding_usd
+    assert "funding_rounds" not in raw_data
+    assert "location" not in raw_data
+
+
+class FakeMeasurementBackend:
+    """Measurement endpoints deriving the ids from the registered measurements."""
+
+    def __init__(self, bulk: bool = True):
+        self.bulk = bulk
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @staticmethod
+    def measurement_id(data: dict) -> str:
+        """Return the id of a measurement."""
+        return f"{data.get('parent_measurement_id')}/{data['measurement_name']}"
+
+    async def send_post_request(self, token, api_endpoint, data):
+        """Register one measurement, or a list of them at the bulk endpoint."""
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+        finally:
+            self.in_flight -= 1
+        if api_endpoint == AnalyticsClient.measurement_bulk_url:
+            if not self.bulk:
+                raise AnalyticsError("API request failed with status code 404")
+            return [{"id": self.measurement_id(entry)} for entry in data]
+        return {"id": self.measurement_id(data)}
+
+
+def register_sequentially(mapping: dict, parent_id=None) -> list[dict]:
+    """Register the measurements depth-first, one after another."""
+    result = []
+    for field_mapping in mapping["Mappings"]:
+        data = {
+            "source_module_id": 1,
+            "type": field_mapping["DataType"],
+            "measurement_name": field_mapping["MeasurementName"],
+        }
+        if parent_id is not None:
+            data["parent_measurement_id"] = parent_id
+        data["source_measurement_id"] = FakeMeasurementBackend.measurement_id(data)
+        field_mapping["source_measurement_id"] = data["source_measurement_id"]
+        if "NestedMappings" in field_mapping:
+            result.extend(
+                register_sequentially(
+                    {"Mappings": field_mapping["NestedMappings"]},
+                    data["source_measurement_id"],
+                )
+            )
+        result.append(data)
+    return result
+
+
+def depth(mappings: list[dict]) -> int:
+    return max(
+        (1 + depth(mapping.get("NestedMappings", [])) for mapping in mappings),
+        default=0,
+    )
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+@pytest.mark.parametrize("backend_bulk", [False, True])
+def test_register_measurements_concurrently(analytics_client, bulk, backend_bulk):
+    backend = FakeMeasurementBackend(bulk=backend_bulk)
+    analytics_client.send_post_request = backend.send_post_request
+    analytics_client.registration_concurrency = 3
+    analytics_client.bulk_registration = bulk
+    mapping = CrunchbaseNormalizationMap().get_normalization_map()
+    expected_mapping = copy.deepcopy(mapping)
+    expected = register_sequentially(expected_mapping)
+
+    result, updated_mapping = asyncio.run(
+        analytics_client.register_measurements(TOKEN, mapping, source_module_id=1)
+    )
+
+    assert result == expected
+    assert updated_mapping == expected_mapping
+    assert backend.max_in_flight <= analytics_client.registration_concurrency
+    if bulk and backend_bulk:
+        # a single request per level of the map
+        assert backend.requests == depth(mapping["Mappings"])
+    else:
+        assert backend.max_in_flight > 1
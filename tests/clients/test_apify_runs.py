@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_apify import FakeApifyClient
+from parma_mining.crunchbase.apify_runs import ApifyRunManager
+from parma_mining.mining_common.exceptions import CrawlingExternalError
+
+
+@pytest.fixture
+def no_poll_delay(mocker):
+    mocker.patch.object(ApifyRunManager, "poll_interval", 0)
+    mocker.patch.object(ApifyRunManager, "max_poll_interval", 0)
+
+
+def test_call_waits_until_run_succeeded(no_poll_delay):
+    apify = FakeApifyClient(
+        [{"name": "Company"}], statuses=["READY", "RUNNING", "RUNNING", "SUCCEEDED"]
+    )
+    manager = ApifyRunManager(apify)
+
+    async def run():
+        finished = await manager.call("actor", {"input": 1})
+        return finished, await manager.dataset_items(finished)
+
+    finished, items = asyncio.run(run())
+
+    assert finished["status"] == "SUCCEEDED"
+    assert items == [{"name": "Company"}]
+    assert apify.run_inputs == [{"input": 1}]
+    assert manager.stats() == {
+        "started": 1,
+        "succeeded": 1,
+        "failed": 0,
+        "in_flight": 0,
+    }
+
+
+def test_call_raises_on_failed_run(no_poll_delay):
+    manager = ApifyRunManager(FakeApifyClient([], statuses=["RUNNING", "FAILED"]))
+
+    with pytest.raises(CrawlingExternalError):
+        asyncio.run(manager.call("actor", {}))
+    assert manager.stats()["failed"] == 1
+
+
+def test_call_aborts_run_after_timeout(no_poll_delay, mocker):
+    mocker.patch.object(ApifyRunManager, "run_timeout", 0)
+    apify = FakeApifyClient([], statuses=["RUNNING"])
+    manager = ApifyRunManager(apify)
+
+    with pytest.raises(CrawlingExternalError):
+        asyncio.run(manager.call("actor", {}))
+    assert apify.runs["run0"].status() == "ABORTED"
+    assert manager.stats()["in_flight"] == 0
+
+
+def test_many_runs_in_flight(no_poll_delay):
+    apify = FakeApifyClient(lambda run_input: [run_input])
+    manager = ApifyRunManager(apify)
+    in_flight = []
+
+    async def crawl(index: int):
+        run = await manager.start("actor", {"index": index})
+        in_flight.append(apify.in_flight())
+        run = await manager.wait_for_finish(run)
+        return await manager.dataset_items(run)
+
+    async def crawl_all():
+        return await asyncio.gather(*(crawl(index) for index in range(5)))
+
+    results = asyncio.run(crawl_all())
+
+    assert results == [[{"index": index}] for index in range(5)]
+    assert max(in_flight) == len(results)
+    assert apify.in_flight() == 0
+
+
+def test_stream_pages_while_run_is_going(no_poll_delay, mocker):
+    mocker.patch.object(ApifyRunManager, "page_size", 1)
+    items = [{"index": index} for index in range(3)]
+    apify = FakeApifyClient(items, statuses=["RUNNING"] * 4 + ["SUCCEEDED"])
+    manager = ApifyRunManager(apify)
+
+    async def stream():
+        run = await manager.start("actor", {})
+        return [
+            (item, apify.runs[run["id"]].status())
+            async for page in manager.stream_pages(run)
+            for item in page
+        ]
+
+    streamed = asyncio.run(stream())
+
+    assert [item for item, _ in streamed] == items
+    assert streamed[0][1] == "RUNNING"
+    assert manager.stats()["succeeded"] == 1
+
+
+def test_stream_pages_of_finished_run_in_parallel(mocker):
+    mocker.patch.object(ApifyRunManager, "page_size", 2)
+    mocker.patch.object(ApifyRunManager, "parallel_pages", 2)
+    items = [{"index": index} for index in range(5)]
+    apify = FakeApifyClient(items, statuses=["SUCCEEDED"])
+    manager = ApifyRunManager(apify)
+
+    async def stream():
+        run = await manager.start("actor", {})
+        return [page async for page in manager.stream_pages(run)]
+
+    pages = asyncio.run(stream())
+
+    assert pages == [items[0:2], items[2:4], items[4:]]
+    assert apify.runs["run0"].max_reading == manager.parallel_pages
+
+
+def test_stream_pages_raises_on_failed_run(no_poll_delay):
+    apify = FakeApifyClient([{"index": 0}], statuses=["RUNNING", "FAILED"])
+    manager = ApifyRunManager(apify)
+    streamed = []
+
+    async def stream():
+        run = await manager.start("actor", {})
+        async for page in manager.stream_pages(run):
+            streamed.extend(page)
+
+    with pytest.raises(CrawlingExternalError):
+        asyncio.run(stream())
+    assert streamed == [{"index": 0}]
+    assert manager.stats()["in_flight"] == 0
+
+
+def test_stream_raw_pages_keeps_fields(no_poll_delay):
+    items = [{"b": index, "a": {"index": index}, "c": None} for index in range(3)]
+    apify = FakeApifyClient(items)
+    manager = ApifyRunManager(apify)
+
+    async def stream():
+        run = await manager.start("actor", {})
+        return [page async for page in manager.stream_raw_pages(run, ["a", "b"])]
+
+    lines = [line for page in asyncio.run(stream()) for line in page]
+
+    assert lines == [
+        f'{{"a":{{"index":{index}}},"b":{index}}}'.encode() for index in range(3)
+    ]
+    assert manager.stats()["succeeded"] == 1
+
+
+def test_dataset_items_downloads_pages_in_parallel(mocker):
+    mocker.patch.object(ApifyRunManager, "download_page_size", 2)
+    mocker.patch.object(ApifyRunManager, "parallel_pages", 3)
+    items = [{"index": index, "unused": "x" * 10} for index in range(9)]
+    apify = FakeApifyClient(items, statuses=["SUCCEEDED"])
+    manager = ApifyRunManager(apify)
+
+    async def download():
+        run = await manager.start("actor", {})
+        return await manager.dataset_items(run, ["index"])
+
+    assert asyncio.run(download()) == [{"index": index} for index in range(9)]
+    assert apify.runs["run0"].max_reading == manager.parallel_pages
@@ -1,52 +1,61 @@
+import asyncio
+import json
 from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from parma_mining.crunchbase.client import CrunchbaseClient
-from parma_mining.crunchbase.model import DiscoveryResponse
+from benchmarks.fake_apify import FakeApifyClient, FakeDatasetClient
+from parma_mining.crunchbase.analytics_client import AnalyticsClient
+from parma_mining.crunchbase.apify_runs import ApifyRunManager
+from parma_mining.crunchbase.client import (
+    CrunchbaseClient,
+    LazyCompanyModel,
+    crawl_profiles,
+    extract_permalink,
+    parse_date,
+    parse_dates,
+    passthrough_keys,
+    raw_permalink,
+)
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+from parma_mining.crunchbase.extraction import CRAWL_PROFILES
+from parma_mining.crunchbase.model import DiscoveryResponse, ResponseModel
 from parma_mining.mining_common.exceptions import ClientError, CrawlingError
+from parma_mining.mining_common.item_archive import ItemArchive
+
+# the first scrape and the one bypassing the cache
+RUNS_WITH_BYPASS = 2
+# streamed in pages of two items and extracted in columnar batches of three
+STREAMED_ITEMS = 5
+COLUMNAR_BATCH = 3
+# search results read until the first Crunchbase organization
+CONSUMED_RESULTS = 2
+# one Actor run per crawl profile
+PROFILE_RUNS = 2
 
 
 @pytest.fixture
 def mock_crunchbase_client():
-    return CrunchbaseClient()
-
-
-@patch("parma_mining.crunchbase.client.search")
-def test_discover_company_success(mock_search, mock_crunchbase_client):
-    mock_search.return_value = [
-        "https://www.crunchbase.com/organization/test",
-        "https://www.crunchbase.com/organization/test/more",
-    ]
-
-    results = mock_crunchbase_client.discover_company("Test")
-    assert isinstance(results, DiscoveryResponse)
-    assert len(results.urls) == 1
-    assert results.urls[0] == "https://www.crunchbase.com/organization/test"
+    client = CrunchbaseClient()
+    client.discovery_cache = DiscoveryCache(":memory:")
+    return client
 
 
-@patch("parma_mining.crunchbase.client.search")
-def test_search_organizations_exception(mock_search_users, mock_crunchbase_client):
-    mock_search_users.side_effect = ClientError()
-    with pytest.raises(ClientError):
-        mock_crunchbase_client.discover_company("Test")
-
+def use_fake_apify(
+    crunchbase_client: CrunchbaseClient, items, statuses=None
+) -> FakeApifyClient:
+    """Replace the Apify API of the client with a local stand-in."""
+    apify = FakeApifyClient(items, statuses)
+    crunchbase_client.run_manager = ApifyRunManager(apify)
+    crunchbase_client.run_manager.poll_interval = 0
+    return apify
 
-@patch("parma_mining.crunchbase.client.ApifyClient")
-def test_get_company_details(mock_apify_client, mock_crunchbase_client):
-    # Create a mock for ApifyClient
-    mock_client = MagicMock()
-    mock_apify_client.return_value = mock_client
-
-    # Prepare mock results
-    mock_run_result = {
-        "defaultDatasetId": "mocked_dataset_id",
-        # ... (other fields you expect in the result)
-    }
 
-    # Prepare mock dataset item
-    mock_item = {
+@pytest.fixture
+def mock_item():
+    """Prepare mock dataset item."""
+    return {
         "identifier": {"value": "Mocked Company", "permalink": "mocked-company"},
         "short_description": "Mocked description",
         "website": {"value": "http://www.mockedcompany.com"},
@@ -103,13 +112,80 @@ def test_get_company_details(mock_apify_client, mock_crunchbase_client):
         "growth_insight_description": {},
     }
 
-    # Configure mocks
-    mock_client.actor.return_value.call.return_value = mock_run_result
-    mock_client.dataset.return_value.iterate_items.return_value = [mock_item]
+
+@patch("parma_mining.crunchbase.client.search")
+def test_discover_company_success(mock_search, mock_crunchbase_client):
+    mock_search.return_value = [
+        "https://www.crunchbase.com/organization/test",
+        "https://www.crunchbase.com/organization/test/more",
+    ]
+
+    results = mock_crunchbase_client.discover_company("Test")
+    assert isinstance(results, DiscoveryResponse)
+    assert len(results.urls) == 1
+    assert results.urls[0] == "https://www.crunchbase.com/organization/test"
+
+
+@patch("parma_mining.crunchbase.client.search")
+def test_search_organizations_exception(mock_search_users, mock_crunchbase_client):
+    mock_search_users.side_effect = ClientError()
+    with pytest.raises(ClientError):
+        mock_crunchbase_client.discover_company("Test")
+
+
+@patch("parma_mining.crunchbase.client.search")
+def test_discover_company_stops_at_first_match(mock_search, mock_crunchbase_client):
+    mock_crunchbase_client.search_tld = "com"
+    consumed = []
+
+    def search(query, **kwargs):
+        for url in [
+            "https://www.example.com/test",
+            "https://www.crunchbase.com/organization/test",
+            "https://www.crunchbase.com/organization/test-2",
+        ]:
+            consumed.append(url)
+            yield url
+
+    mock_search.side_effect = search
+
+    results = mock_crunchbase_client.discover_company("Test")
+
+    assert results.urls == ["https://www.crunchbase.com/organization/test"]
+    assert len(consumed) == CONSUMED_RESULTS
+    assert mock_search.call_args.kwargs["tld"] == "com"
+
+
+@patch("parma_mining.crunchbase.client.search")
+def test_discover_company_cached(mock_search, mock_crunchbase_client):
+    mock_search.return_value = ["https://www.crunchbase.com/organization/test"]
+
+    first = mock_crunchbase_client.discover_company("Test  Company")
+    second = mock_crunchbase_client.discover_company("test company")
+
+    assert first == second
+    mock_search.assert_called_once()
+
+
+@patch("parma_mining.crunchbase.client.search")
+def test_discover_company_negative_cached(mock_search, mock_crunchbase_client):
+    mock_search.return_value = ["https://www.example.com/test"]
+
+    for _ in range(2):
+        with pytest.raises(ClientError):
+            mock_crunchbase_client.discover_company("Unknown")
+    mock_search.assert_called_once()
+
+
+def test_get_company_details(mock_crunchbase_client, mock_item):
+    # Use a local stand-in of the Apify API
+    apify = use_fake_apify(mock_crunchbase_client, [mock_item])
 
     # Run the method
-    results = mock_crunchbase_client.get_company_details(
-        ["https://www.crunchbase.com/organization/test"]
+    results = asyncio.run(
+        mock_crunchbase_client.get_company_details(
+            ["https://www.crunchbase.com/organization/mocked-company"]
+        )
     )
 
     # Assert the results
@@ -119,13 +195,431 @@ def test_get_company_details(mock_apify_client, mock_crunchbase_client):
     assert results.founded_on == datetime.strptime(
         "2022-01-20", "%Y-%m-%d"
     )  # Adjust the date format
+    assert apify.runs["run0"].status() == "SUCCEEDED"
 
 
-@patch("parma_mining.crunchbase.client.ApifyClient")
-def test_get_organization_details_exception(mock_apify_client, mock_crunchbase_client):
+def test_get_organization_details_exception(mock_crunchbase_client):
     exception_instance = CrawlingError("Error fetching company details!")
-    mock_apify_client.side_effect = exception_instance
+    mock_crunchbase_client.run_manager = MagicMock()
+    mock_crunchbase_client.run_manager.start.side_effect = exception_instance
     with pytest.raises(CrawlingError):
-        mock_crunchbase_client.get_company_details(
-            ["https://www.crunchbase.com/organization/exceptional_test"]
+        asyncio.run(
+            mock_crunchbase_client.get_company_details(
+                ["https://www.crunchbase.com/organization/exceptional_test"]
+            )
+        )
+
+
+def test_get_company_details_not_scraped(mock_crunchbase_client, mock_item):
+    use_fake_apify(mock_crunchbase_client, [mock_item])
+    with pytest.raises(CrawlingError):
+        asyncio.run(
+            mock_crunchbase_client.get_company_details(
+                ["https://www.crunchbase.com/organization/other-company"]
+            )
+        )
+
+
+def test_get_companies_details(mock_crunchbase_client, mock_item):
+    other_item = {
+        **mock_item,
+        "identifier": {"value": "Other Company", "permalink": "Other-Company"},
+    }
+    broken_item = {
+        "identifier": {"value": "Broken", "permalink": "broken"},
+        "overview_fields_extended": {"founded_on": {"value": "not a date"}},
+    }
+    apify = use_fake_apify(mock_crunchbase_client, [other_item, broken_item, mock_item])
+
+    urls = [
+        "https://www.crunchbase.com/organization/mocked-company",
+        "https://www.crunchbase.com/organization/other-company",
+        "https://www.crunchbase.com/organization/broken",
+    ]
+    results = asyncio.run(mock_crunchbase_client.get_companies_details(urls))
+
+    assert len(apify.runs) == 1
+    assert apify.run_inputs[0]["scrapeCompanyUrls.urls"] == urls
+    assert set(results) == {"mocked-company", "other-company"}
+    assert results["mocked-company"].name == "Mocked Company"
+    assert results["other-company"].name == "Other Company"
+
+
+def test_get_companies_details_exception(mock_crunchbase_client):
+    use_fake_apify(mock_crunchbase_client, [], statuses=["RUNNING", "FAILED"])
+    with pytest.raises(CrawlingError):
+        asyncio.run(
+            mock_crunchbase_client.get_companies_details(
+                ["https://www.crunchbase.com/organization/test"]
+            )
         )
+
+
+@pytest.mark.parametrize(
+    "url, permalink",
+    [
+        ("https://www.crunchbase.com/organization/personio", "personio"),
+        ("https://www.crunchbase.com/organization/Personio/", "personio"),
+        ("https://crunchbase.com/organization/personio/people", "personio"),
+        ("https://www.crunchbase.com/person/jane-doe", None),
+        ("https://www.crunchbase.com/organization", None),
+        ("www.crunchbase.com/organization/Personio", "personio"),
+        ("crunchbase.com/organization/personio", "personio"),
+    ],
+)
+def test_extract_permalink(url, permalink):
+    assert extract_permalink(url) == permalink
+
+
+def test_get_companies_details_cached(mock_crunchbase_client, mock_item):
+    apify = use_fake_apify(mock_crunchbase_client, [mock_item])
+    urls = ["https://www.crunchbase.com/organization/Mocked-Company"]
+
+    first = asyncio.run(mock_crunchbase_client.get_companies_details(urls))
+    second = asyncio.run(mock_crunchbase_client.get_companies_details(urls))
+    assert first == second
+    assert len(apify.runs) == 1
+
+    asyncio.run(mock_crunchbase_client.get_companies_details(urls, bypass_cache=True))
+    assert len(apify.runs) == RUNS_WITH_BYPASS
+
+
+def test_stream_companies_details(mock_crunchbase_client, mock_item):
+    other_item = {
+        **mock_item,
+        "identifier": {"value": "Other Company", "permalink": "other-company"},
+    }
+    apify = use_fake_apify(
+        mock_crunchbase_client,
+        [mock_item, other_item],
+        statuses=["RUNNING", "RUNNING", "RUNNING", "SUCCEEDED"],
+    )
+    urls = [
+        "https://www.crunchbase.com/organization/mocked-company",
+        "https://www.crunchbase.com/organization/other-company",
+    ]
+
+    async def stream():
+        return [
+            (permalink, apify.runs["run0"].status())
+            async for permalink, _ in mock_crunchbase_client.stream_companies_details(
+                urls
+            )
+        ]
+
+    streamed = asyncio.run(stream())
+
+    assert streamed == [("mocked-company", "RUNNING"), ("other-company", "RUNNING")]
+
+
+def test_stream_companies_details_gathers_columnar_batches(
+    mock_crunchbase_client, mock_item
+):
+    items = [
+        {**mock_item, "identifier": {"value": f"Company {i}", "permalink": f"c{i}"}}
+        for i in range(STREAMED_ITEMS)
+    ]
+    use_fake_apify(mock_crunchbase_client, items)
+    mock_crunchbase_client.run_manager.page_size = 2
+    mock_crunchbase_client.extraction_mode = "columnar"
+    mock_crunchbase_client.columnar_min_items = COLUMNAR_BATCH
+    batches = []
+    extract_companies = mock_crunchbase_client.extract_companies
+
+    def record_batch(batch, profile):
+        batches.append(len(batch))
+        return extract_companies(batch, profile)
+
+    mock_crunchbase_client.extract_companies = record_batch
+    urls = [
+        f"https://www.crunchbase.com/organization/c{i}" for i in range(STREAMED_ITEMS)
+    ]
+
+    async def stream():
+        return [
+            permalink
+            async for permalink, _ in mock_crunchbase_client.stream_companies_details(
+                urls
+            )
+        ]
+
+    assert asyncio.run(stream()) == [f"c{i}" for i in range(STREAMED_ITEMS)]
+    # pages of two items are gathered until a columnar batch is complete
+    assert batches == [4, 1]
+
+
+def test_extract_company_partial_item(mock_crunchbase_client, mock_item):
+    del mock_item["overview_fields_extended"]
+    mock_item["funding_rounds_summary"] = None
+    mock_item["overview_timeline"] = {"entities": [{"properties": {}}]}
+
+    company = mock_crunchbase_client.extract_company(mock_item)
+
+    assert company.name == "Mocked Company"
+    assert company.founded_on is None
+    assert company.categories is None
+    assert company.last_funding_at is None
+    assert company.activities[0].title is None
+
+
+@pytest.mark.parametrize(
+    "value, date_format",
+    [
+        ("2022-01-20", "%Y-%m-%d"),
+        ("0999-12-31", "%Y-%m-%d"),
+        ("2022-1-5", "%Y-%m-%d"),
+        ("20.01.2022", "%d.%m.%Y"),
+    ],
+)
+def test_parse_date(value, date_format):
+    assert parse_date(value, date_format) == datetime.strptime(value, date_format)
+
+
+@pytest.mark.parametrize("value", ["20220120", "2022-02-30", "2022-01-20T10:00"])
+def test_parse_date_invalid(value):
+    with pytest.raises(ValueError):
+        datetime.strptime(value, "%Y-%m-%d")
+    with pytest.raises(ValueError):
+        parse_date(value)
+
+
+def test_parse_dates():
+    assert parse_dates(["2022-01-20", None, "2022-01-20"]) == [
+        datetime(2022, 1, 20),
+        None,
+        datetime(2022, 1, 20),
+    ]
+
+
+def test_extract_companies_columnar(mock_crunchbase_client, mock_item):
+    broken_item = {
+        **mock_item,
+        "overview_fields_extended": {"founded_on": {"value": "not a date"}},
+    }
+    ranked_item = {**mock_item, "rank_org_company": 7}
+    null_lead_item = {
+        **mock_item,
+        "funding_rounds_list": [{"lead_investor_identifiers": None}],
+    }
+    items = [mock_item, {}, broken_item, ranked_item, null_lead_item]
+    rows = mock_crunchbase_client.extract_companies(items)
+
+    mock_crunchbase_client.extraction_mode = "columnar"
+    mock_crunchbase_client.columnar_min_items = 1
+    columns = mock_crunchbase_client.extract_companies(items)
+
+    assert columns == rows
+    assert rows[2] is None
+    assert rows[3].rank_org_company == ranked_item["rank_org_company"]
+    assert rows[4].funding_rounds[0].lead_investors is None
+
+
+def test_extract_companies_lazy(mock_crunchbase_client, mock_item):
+    items = [mock_item, {}]
+    rows = mock_crunchbase_client.extract_companies(items)
+
+    mock_crunchbase_client.extraction_mode = "lazy"
+    views = mock_crunchbase_client.extract_companies(items)
+
+    assert all(isinstance(view, LazyCompanyModel) for view in views)
+    view = views[0]
+    assert isinstance(view, LazyCompanyModel)
+    response = ResponseModel(source_name="crunchbase", company_id="1", raw_data=view)
+    assert response.raw_data is view
+    assert response.model_dump()["raw_data"] == rows[0].model_dump()
+    assert AnalyticsClient.raw_data(response) == rows[0].model_dump()
+    lite = ResponseModel(
+        source_name="crunchbase", company_id="1", raw_data=view, profile="lite"
+    )
+    assert AnalyticsClient.raw_data(lite) == rows[0].model_dump(
+        include={field.name for field in CRAWL_PROFILES["lite"]}
+    )
+    # the dumps were built from the item without extracting any model
+    assert view.__dict__ == {}
+    assert views == rows
+    assert view._item is None
+
+
+def test_stream_companies_raw(mock_crunchbase_client, mock_item):
+    unrequested_item = {
+        **mock_item,
+        "identifier": {"value": "Other Company", "permalink": "other-company"},
+    }
+    use_fake_apify(mock_crunchbase_client, [mock_item, unrequested_item])
+    mock_crunchbase_client.passthrough_mode = "pruned"
+
+    async def stream():
+        return [
+            (permalink, json.loads(line))
+            async for permalink, line in mock_crunchbase_client.stream_companies_raw(
+                ["https://www.crunchbase.com/organization/Mocked-Company"]
+            )
+        ]
+
+    streamed = asyncio.run(stream())
+
+    keys = passthrough_keys()
+    assert streamed == [
+        ("mocked-company", {key: mock_item[key] for key in keys if key in mock_item})
+    ]
+
+
+def test_passthrough_keys():
+    mappings = [{"SourceField": "founded_on"}, {"SourceField": "categories"}]
+
+    assert passthrough_keys(mappings) == ["identifier", "overview_fields_extended"]
+    assert "funding_rounds_list" in passthrough_keys()
+
+
+def test_raw_permalink():
+    assert raw_permalink(b'{"identifier":{"permalink":"ABC"},"x":[1]}') == "abc"
+    assert raw_permalink(b'{"x":[1],"identifier":{"permalink":"abc"}}') == "abc"
+    with pytest.raises(Exception):
+        raw_permalink(b'{"x":[1]}')
+
+
+def test_stream_companies_details_projects_fields(mock_crunchbase_client, mock_item):
+    expected = mock_crunchbase_client.extract_company(mock_item)
+    apify = use_fake_apify(
+        mock_crunchbase_client, [{**mock_item, "unused_block": ["x"] * 100}]
+    )
+    read_fields = []
+    list_items = FakeDatasetClient.list_items
+
+    async def spy(self, offset=0, limit=None, fields=None):
+        read_fields.append(fields)
+        return await list_items(self, offset, limit, fields)
+
+    async def stream():
+        with patch.object(FakeDatasetClient, "list_items", spy):
+            return [
+                company
+                async for _, company in mock_crunchbase_client.stream_companies_details(
+                    ["https://www.crunchbase.com/organization/mocked-company"]
+                )
+            ]
+
+    assert asyncio.run(stream()) == [expected]
+    assert "unused_block" in apify.runs["run0"].items[0]
+    assert all("unused_block" not in fields for fields in read_fields)
+    assert "identifier" in read_fields[0]
+
+
+@pytest.mark.parametrize("extraction_mode", ["row", "lazy", "columnar"])
+def test_extract_company_profiles(mock_crunchbase_client, mock_item, extraction_mode):
+    mock_crunchbase_client.extraction_mode = extraction_mode
+    mock_crunchbase_client.columnar_min_items = 1
+    full = mock_crunchbase_client.extract_companies([mock_item])[0]
+
+    lite = mock_crunchbase_client.extract_companies([mock_item], "lite")[0]
+
+    lite_fields = crawl_profiles["lite"].field_names
+    assert lite.model_fields_set == lite_fields
+    assert lite.name == full.name
+    assert lite.total_funding_usd == full.total_funding_usd
+    assert lite.funding_rounds is None
+    assert lite.model_dump(include=lite_fields) == full.model_dump(include=lite_fields)
+
+
+def test_stream_companies_details_profile(mock_crunchbase_client, mock_item):
+    apify = use_fake_apify(mock_crunchbase_client, [mock_item])
+    url = "https://www.crunchbase.com/organization/mocked-company"
+
+    async def stream(profile):
+        return [
+            company
+            async for _, company in mock_crunchbase_client.stream_companies_details(
+                [url], profile=profile
+            )
+        ]
+
+    lite = asyncio.run(stream("lite"))[0]
+    full = asyncio.run(stream("full"))[0]
+
+    # the lite company in the cache does not satisfy the full profile
+    assert len(apify.runs) == PROFILE_RUNS
+    assert lite.activities is None
+    assert (
+        full.activities == mock_crunchbase_client.extract_company(mock_item).activities
+    )
+    assert asyncio.run(stream("lite"))[0] is lite
+    assert "funding_rounds_list" not in crawl_profiles["lite"].dataset_fields
+
+
+def test_extract_companies_process_pool(mock_crunchbase_client, mock_item):
+    items = [mock_item, {}, {**mock_item, "rank_org_company": 7}, mock_item]
+    rows = mock_crunchbase_client.extract_companies(items, "standard")
+
+    mock_crunchbase_client.extraction_processes = 2
+    mock_crunchbase_client.process_min_items = len(items)
+    mock_crunchbase_client.process_chunk_size = 1
+    try:
+        pooled = mock_crunchbase_client.extract_companies(items, "standard")
+        pooled_async = asyncio.run(
+            mock_crunchbase_client.extract_companies_async(items, "standard")
+        )
+    finally:
+        mock_crunchbase_client.close()
+
+    assert pooled == rows
+    assert pooled_async == rows
+
+
+def test_extract_companies_small_batch_in_process(mock_crunchbase_client, mock_item):
+    mock_crunchbase_client.extraction_processes = 2
+    mock_crunchbase_client.process_min_items = 2
+
+    companies = mock_crunchbase_client.extract_companies([mock_item])
+
+    assert companies == [mock_crunchbase_client.extract_company(mock_item)]
+    assert mock_crunchbase_client._extraction_pool is None
+
+
+def test_archive_and_replay_companies(mock_crunchbase_client, mock_item, tmp_path):
+    mock_crunchbase_client.item_archive = ItemArchive(str(tmp_path))
+    use_fake_apify(mock_crunchbase_client, [mock_item])
+
+    async def stream():
+        return [
+            company
+            async for _, company in mock_crunchbase_client.stream_companies_details(
+                ["https://www.crunchbase.com/organization/mocked-company"],
+                profile="lite",
+            )
+        ]
+
+    asyncio.run(stream())
+    replayed = list(mock_crunchbase_client.replay_companies())
+
+    # the complete items are downloaded and archived despite the lite profile
+    assert mock_crunchbase_client.item_archive.get("mocked-company") == mock_item
+    assert [(permalink, company) for permalink, _, company in replayed] == [
+        ("mocked-company", mock_crunchbase_client.extract_company(mock_item))
+    ]
+    mock_crunchbase_client.item_archive.close()
+
+
+def test_stream_companies_raw_archives_complete_items(
+    mock_crunchbase_client, mock_item, tmp_path
+):
+    mock_crunchbase_client.item_archive = ItemArchive(str(tmp_path))
+    mock_crunchbase_client.passthrough_mode = "pruned"
+    use_fake_apify(mock_crunchbase_client, [mock_item])
+
+    async def stream():
+        return [
+            permalink
+            async for permalink, _ in mock_crunchbase_client.stream_companies_raw(
+                ["https://www.crunchbase.com/organization/mocked-company"]
+            )
+        ]
+
+    assert asyncio.run(stream()) == ["mocked-company"]
+    # the items are not pruned, so that they can be reprocessed completely
+    assert mock_crunchbase_client.item_archive.get("mocked-company") == mock_item
+    mock_crunchbase_client.item_archive.close()
+
+
+def test_replay_companies_without_archive(mock_crunchbase_client):
+    with pytest.raises(ClientError):
+        list(mock_crunchbase_client.replay_companies())
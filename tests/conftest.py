@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the files of the local stores out of the working directory."""
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path / "cache"))
@@ -0,0 +1,120 @@
+"""Synthetic Crunchbase dataset items."""
+
+
+def full_item(index: int) -> dict:
+    """Prepare a dataset item using every field of the spec."""
+    return {
+        "identifier": {"value": f"Company {index}", "permalink": f"company-{index}"},
+        "short_description": "Description",
+        "website": {"value": "https://www.example.com"},
+        "ipo_status": "private",
+        "overview_company_fields": {"company_type": "for_profit"},
+        "overview_fields_extended": {
+            "founded_on": {"value": "2020-01-31"},
+            "legal_name": "Company GmbH",
+            "categories": [{"value": "Software"}, {"value": "AI"}],
+        },
+        "num_employees_enum": "c_00011_00050",
+        "rank_org_company": index,
+        "funding_rounds_list": [
+            {
+                "identifier": {"value": "Seed", "permalink": "seed"},
+                "announced_on": "2021-02-01",
+                "money_raised": {"value_usd": 1000000},
+                "num_investors": 2,
+                "lead_investor_identifiers": [
+                    {"value": "Investor", "permalink": "investor"}
+                ],
+            },
+            {"identifier": {"value": "Angel", "permalink": "angel"}},
+        ],
+        "funding_total": {"value_usd": 1000000},
+        "last_funding_type": "seed",
+        "funding_rounds_summary": {
+            "last_funding_at": "2021-02-01",
+            "num_funding_rounds": 2,
+        },
+        "investors_list": [
+            {
+                "investor_identifier": {"value": "Investor", "permalink": "investor"},
+                "funding_round_identifier": {"value": "Seed"},
+                "partner_identifiers": [{"value": "Partner", "permalink": "partner"}],
+            },
+            {
+                "investor_identifier": {"value": "Angel", "permalink": "angel"},
+                "funding_round_identifier": {"value": "Angel"},
+            },
+        ],
+        "investors_summary": {"num_investors": 2},
+        "acquired_by_fields": {
+            "acquirer_identifier": {"value": "Buyer", "permalink": "buyer"},
+            "acquisition_identifier": {"value": "Deal", "permalink": "deal"},
+            "acquisition_announced_on": {"value": "2023-03-01"},
+            "acquisition_price": {"value_usd": 5000000},
+        },
+        "acquisitions_list": [
+            {
+                "acquiree_identifier": {"value": "Target", "permalink": "target"},
+                "identifier": {"value": "Acquisition", "permalink": "acquisition"},
+                "announced_on": {"value": "2022-05-05"},
+            }
+        ],
+        "technology_highlights": {"builtwith_num_technologies_used": 10},
+        "apptopia_summary": {"apptopia_total_apps": 2},
+        "contact_fields": {"contact_email": "info@example.com"},
+        "org_similarity_list": [
+            {
+                "source": {"value": "Similar", "permalink": "similar"},
+                "source_short_description": "Similar company",
+            }
+        ],
+        "company_overview_highlights": {"num_org_similarities": 1},
+        "current_employees_featured_order_field": [
+            {
+                "person_identifier": {"value": "Founder", "permalink": "founder"},
+                "title": "CEO",
+                "started_on": {"value": "2020-01-31"},
+            }
+        ],
+        "people_highlights": {"num_current_positions": 3},
+        "event_appearances_list": [
+            {"identifier": {"value": "Event", "permalink": "event"}}
+        ],
+        "event_appearances_summary": {"num_event_appearances": 1},
+        "ipqwery_summary": {"ipqwery_num_patent_granted": 1},
+        "overview_timeline": {
+            "count": 2,
+            "entities": [
+                {
+                    "properties": {
+                        "identifier": {"value": "News", "entity_def_id": "press"},
+                        "activity_date": "2023-01-01",
+                        "activity_properties": {
+                            "author": "Author",
+                            "url": {"value": "https://news.example.com"},
+                        },
+                    }
+                },
+                {"properties": {"identifier": {"value": "Update"}}},
+            ],
+        },
+        "semrush_summary": {"semrush_global_rank": 100},
+        "semrush_rank_headline": {"semrush_visits_mom_pct": 1.5},
+        "semrush_location_list": [
+            {"rank": 1, "visits_pct": 0.5, "location_identifiers": [{"value": "DE"}]},
+            {"rank": 2, "location_identifiers": []},
+        ],
+        "growth_insight_description": {"growth_insight_description": "Growing"},
+        "siftery_summary": {"siftery_num_products": 4},
+    }
+
+
+def partial_item(index: int) -> dict:
+    """Prepare a dataset item missing most fields."""
+    return {
+        "identifier": {"value": f"Partial {index}", "permalink": f"partial-{index}"},
+        "overview_fields_extended": {"categories": []},
+        "funding_rounds_list": None,
+        "acquired_by_fields": {},
+        "overview_timeline": {"entities": [None, {"properties": None}]},
+    }
@@ -0,0 +1,36 @@
+import json
+
+from benchmarks.extraction import compare, main
+from benchmarks.fixtures import COMPANY_SIZES, company_item
+from parma_mining.crunchbase.client import extract_items
+
+
+def test_benchmark_fixtures_sizes():
+    small, large = company_item(0, "small"), company_item(0, "large")
+    small_company, large_company = extract_items([small, large])
+
+    assert company_item(0, "large") == large
+    assert small_company is not None
+    assert small_company.name == small["identifier"]["value"]
+    assert large_company is not None
+    assert large_company.activities is not None
+    assert len(large_company.activities) == COMPANY_SIZES["large"].activities
+    assert large_company.investors is not None
+    assert len(large_company.investors) == COMPANY_SIZES["large"].investors
+
+
+def test_benchmarks_report(tmp_path):
+    output = tmp_path / "results.json"
+    argv = ["--benchmark", "extract_company", "--benchmark", "feed_raw_data"]
+    argv += ["--size", "small", "--count", "2", "--repeat", "1"]
+
+    report = main([*argv, "--output", str(output)])
+
+    saved = json.loads(output.read_text())
+    assert saved["counts"] == {"small": 2}
+    assert [result["benchmark"] for result in saved["results"]] == [
+        "extract_company",
+        "feed_raw_data",
+    ]
+    assert all(result["best_seconds_per_item"] > 0 for result in saved["results"])
+    assert len(compare(report["results"], saved)) == len(saved["results"])
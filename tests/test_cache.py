@@ -0,0 +1,42 @@
+from parma_mining.mining_common.cache import TTLCache
+
+# the entries with a short and a long time to live
+EXPIRED_ENTRIES = 2
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", "value a")
+    cache.set("b", "value b")
+    assert cache.get("a") == "value a"
+    cache.set("c", "value c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "value a"
+    assert cache.get("c") == "value c"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == stats["max_size"]
+
+
+def test_ttl_cache_expiry(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("short", "value", ttl=5)
+    cache.set("long", "value", ttl=600)
+
+    monotonic.return_value = 106.0
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+
+    # entries never outlive the default time to live
+    monotonic.return_value = 161.0
+    assert cache.get("long") is None
+    assert cache.stats()["misses"] == EXPIRED_ENTRIES
+
+
+def test_ttl_cache_ignores_non_positive_ttl():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("expired", "value", ttl=0)
+    assert cache.get("expired") is None
+    assert cache.stats()["size"] == 0
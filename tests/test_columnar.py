@@ -0,0 +1,64 @@
+import pytest
+
+from parma_mining.crunchbase.client import extract_company_fields
+from parma_mining.crunchbase.extraction import COMPANY_FIELDS
+from parma_mining.crunchbase.model import CompanyModel
+from parma_mining.mining_common.columnar import extract_frame
+from parma_mining.mining_common.extraction import FieldSpec
+from tests.dependencies.mock_items import full_item, partial_item
+
+
+def test_extract_frame_matches_row_extraction():
+    items = [full_item(0), partial_item(1), full_item(2), {}, partial_item(4)]
+
+    extracted, fallback = extract_frame(COMPANY_FIELDS, items)
+
+    assert fallback == [False] * len(items)
+    assert [CompanyModel.model_validate(fields) for fields in extracted] == [
+        CompanyModel.model_validate(extract_company_fields(item)) for item in items
+    ]
+
+
+def test_extract_frame_flags_unparsable_dates():
+    broken = full_item(1)
+    broken["overview_timeline"]["entities"][0]["properties"]["activity_date"] = "?"
+    items = [full_item(0), broken, partial_item(2)]
+
+    _, fallback = extract_frame(COMPANY_FIELDS, items)
+
+    assert fallback == [False, True, False]
+
+
+def test_extract_frame_flags_null_required_keys():
+    null_lead = full_item(1)
+    null_lead["funding_rounds_list"][0]["lead_investor_identifiers"] = None
+    items = [full_item(0), null_lead, partial_item(2)]
+
+    _, fallback = extract_frame(COMPANY_FIELDS, items)
+
+    assert fallback == [False, True, False]
+
+
+def test_extract_frame_missing_columns():
+    extracted, fallback = extract_frame(
+        (
+            FieldSpec("name", ("identifier", "value")),
+            FieldSpec("date", ("date", "value"), "date"),
+            FieldSpec("tags", ("tags",), "list", item_path=("value",)),
+        ),
+        [{"identifier": {"value": "Name"}}, {}],
+    )
+
+    assert extracted == [
+        {"name": "Name", "date": None, "tags": None},
+        {"name": None, "date": None, "tags": None},
+    ]
+    assert fallback == [False, False]
+
+
+def test_extract_frame_inconsistent_types():
+    with pytest.raises(Exception):
+        extract_frame(
+            (FieldSpec("name", ("identifier", "value")),),
+            [{"identifier": {"value": "Name"}}, {"identifier": "Name"}],
+        )
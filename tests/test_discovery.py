@@ -0,0 +1,41 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from parma_mining.crunchbase.discovery import DiscoveryEngine
+from parma_mining.crunchbase.model import DiscoveryResponse
+from parma_mining.mining_common.exceptions import ClientError
+
+CONCURRENCY = 3
+
+
+def test_discovery_engine_runs_concurrently(mocker):
+    mocker.patch.object(DiscoveryEngine, "concurrency", CONCURRENCY)
+    barrier = threading.Barrier(CONCURRENCY, timeout=5)
+
+    def discover_company(name):
+        # only returns once CONCURRENCY searches are running at the same time
+        barrier.wait()
+        return DiscoveryResponse(
+            urls=[f"https://www.crunchbase.com/organization/{name}"]
+        )
+
+    crunchbase_client = MagicMock()
+    crunchbase_client.discover_company.side_effect = discover_company
+    engine = DiscoveryEngine(crunchbase_client)
+
+    results = engine.discover(["a", "b", "c", " A"])
+
+    assert set(results) == {"a", "b", "c"}
+    assert crunchbase_client.discover_company.call_count == CONCURRENCY
+
+
+def test_discovery_engine_raises_errors():
+    crunchbase_client = MagicMock()
+    crunchbase_client.discover_company.side_effect = ClientError()
+    engine = DiscoveryEngine(crunchbase_client)
+
+    with pytest.raises(ClientError):
+        engine.discover(["a"])
+    assert engine.discover([]) == {}
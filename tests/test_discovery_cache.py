@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+
+URLS = ["https://www.crunchbase.com/organization/test"]
+# the name found and the unknown one
+CACHED_QUERIES = 2
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiscoveryCache(str(tmp_path / "discovery.sqlite3"))
+
+
+def test_discovery_cache_hit_and_miss(cache):
+    assert cache.get("Test") is None
+    cache.put("Test", URLS)
+    assert cache.get("  TEST ") == URLS
+    cache.put("Unknown", [])
+    assert cache.get("unknown") == []
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["negative_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == CACHED_QUERIES
+
+
+def test_discovery_cache_expiry(cache, mocker):
+    cache.put("Test", URLS)
+    cache.put("Unknown", [])
+    assert cache.expires_at("test") > datetime.now() + cache.negative_ttl
+    assert cache.expires_at("unknown") <= datetime.now() + cache.negative_ttl
+
+    mocker.patch.object(DiscoveryCache, "ttl", timedelta(seconds=-1))
+    cache.put("Test", URLS)
+    assert cache.get("Test") is None
+    assert cache.expires_at("Test") is None
+
+
+def test_discovery_cache_is_persistent(tmp_path):
+    path = str(tmp_path / "discovery.sqlite3")
+    DiscoveryCache(path).put("Test", URLS)
+    assert DiscoveryCache(path).get("test") == URLS
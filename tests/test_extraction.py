@@ -0,0 +1,316 @@
+import typing
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from parma_mining.crunchbase.client import (
+    LazyCompanyModel,
+    construct_company,
+    extract_company_fields,
+)
+from parma_mining.crunchbase.extraction import CRAWL_PROFILES
+from parma_mining.crunchbase.model import (
+    CompanyModel,
+    CrawlProfileName,
+    FundingRoundModel,
+)
+from parma_mining.mining_common.extraction import (
+    FieldSpec,
+    compile_extractor,
+    source_keys,
+)
+from tests.dependencies.mock_items import full_item, partial_item
+
+RANK = 12
+NUM_INVESTORS = 3
+
+
+def test_compile_extractor_paths():
+    extract = compile_extractor(
+        (
+            FieldSpec("name", ("identifier", "value")),
+            FieldSpec("permalink", ("identifier", "permalink")),
+            FieldSpec("first", ("locations", 0, "value")),
+            FieldSpec("founded_on", ("founded_on", "value"), "date"),
+        )
+    )
+
+    assert extract(
+        {
+            "identifier": {"value": "Name", "permalink": "name"},
+            "locations": [{"value": "Munich"}],
+            "founded_on": {"value": "2020-01-31"},
+        }
+    ) == {
+        "name": "Name",
+        "permalink": "name",
+        "first": "Munich",
+        "founded_on": datetime(2020, 1, 31),
+    }
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        {},
+        {"identifier": None, "locations": [], "founded_on": {}},
+        {"identifier": "unexpected", "locations": {"0": 1}, "founded_on": []},
+    ],
+)
+def test_compile_extractor_missing_values(item):
+    extract = compile_extractor(
+        (
+            FieldSpec("name", ("identifier", "value")),
+            FieldSpec("first", ("locations", 0, "value")),
+            FieldSpec("founded_on", ("founded_on", "value"), "date"),
+        )
+    )
+
+    assert extract(item) == {"name": None, "first": None, "founded_on": None}
+
+
+def test_compile_extractor_nested():
+    extract = compile_extractor(
+        (
+            FieldSpec("tags", ("tags",), "list", item_path=("value",)),
+            FieldSpec(
+                "rounds",
+                ("rounds",),
+                "list",
+                (FieldSpec("name", ("identifier", "value")),),
+                required=("leads",),
+            ),
+            FieldSpec(
+                "acquirer",
+                ("acquired_by",),
+                "object",
+                (
+                    FieldSpec("name", ("acquirer", "value")),
+                    FieldSpec("deal", (), "object", (FieldSpec("usd", ("price",)),)),
+                ),
+                required=("acquirer",),
+            ),
+        )
+    )
+
+    assert extract(
+        {
+            "tags": [{"value": "a"}, {"value": "b"}],
+            "rounds": [
+                {"identifier": {"value": "Seed"}, "leads": []},
+                {"identifier": {"value": "Series A"}},
+            ],
+            "acquired_by": {"acquirer": {"value": "Buyer"}, "price": 1},
+        }
+    ) == {
+        "tags": ["a", "b"],
+        "rounds": [{"name": "Seed"}],
+        "acquirer": {"name": "Buyer", "deal": {"usd": 1}},
+    }
+    assert extract({"acquired_by": {}}) == {
+        "tags": None,
+        "rounds": None,
+        "acquirer": None,
+    }
+
+
+def test_compile_extractor_converters():
+    extract = compile_extractor(
+        (FieldSpec("date", ("date",), "date"),),
+        converters={"parse_date": lambda value, date_format: value[::-1]},
+    )
+
+    assert extract({"date": "abc"}) == {"date": "cba"}
+
+
+def test_compile_extractor_unknown_type():
+    with pytest.raises(ValueError):
+        compile_extractor((FieldSpec("name", ("name",), "unknown"),))
+
+
+def test_extract_company_fields():
+    fields = extract_company_fields(
+        {
+            "identifier": {"value": "Company", "permalink": "company"},
+            "overview_fields_extended": {
+                "founded_on": {"value": "2020-01-31"},
+                "categories": [{"value": "Software"}, {"value": "AI"}],
+            },
+            "funding_rounds_list": [
+                {
+                    "identifier": {"value": "Seed", "permalink": "seed"},
+                    "announced_on": "2021-02-01",
+                    "money_raised": {"value_usd": 100},
+                    "num_investors": 1,
+                    "lead_investor_identifiers": [
+                        {"value": "Investor", "permalink": "investor"}
+                    ],
+                },
+                {"identifier": {"value": "Unled", "permalink": "unled"}},
+            ],
+            "acquired_by_fields": {
+                "acquirer_identifier": {"value": "Buyer", "permalink": "buyer"},
+                "acquisition_identifier": {"value": "Deal", "permalink": "deal"},
+            },
+            "semrush_location_list": [
+                {"rank": 3, "location_identifiers": [{"value": "Germany"}]}
+            ],
+        }
+    )
+
+    assert fields["name"] == "Company"
+    assert fields["founded_on"] == datetime(2020, 1, 31)
+    assert fields["categories"] == ["Software", "AI"]
+    assert fields["funding_rounds"] == [
+        {
+            "name": "Seed",
+            "permalink": "seed",
+            "announced_on": datetime(2021, 2, 1),
+            "money_raised_usd": 100,
+            "num_investors": 1,
+            "lead_investors": [{"name": "Investor", "permalink": "investor"}],
+        }
+    ]
+    assert fields["acquirer"] == {
+        "name": "Buyer",
+        "permalink": "buyer",
+        "acquisition": {
+            "title": "Deal",
+            "permalink": "deal",
+            "date": None,
+            "price_usd": None,
+        },
+    }
+    assert fields["country_data"] == [
+        {"visits_pct": None, "rank_mom_pct": None, "rank": 3, "location": "Germany"}
+    ]
+    assert fields["investors"] is None
+
+
+def test_compile_extractor_model():
+    extract = compile_extractor(
+        (
+            FieldSpec("name", ("identifier", "value")),
+            FieldSpec("unknown", ("unknown",)),
+            FieldSpec(
+                "funding_rounds",
+                ("rounds",),
+                "list",
+                (
+                    FieldSpec("name", ("name",)),
+                    FieldSpec("announced_on", ("date",), "date"),
+                ),
+            ),
+        ),
+        model=CompanyModel,
+    )
+    item = {
+        "identifier": {"value": "Name"},
+        "unknown": 1,
+        "rounds": [{"name": "Seed", "date": "2020-01-31"}],
+    }
+
+    company = extract(item)
+
+    assert company == CompanyModel(
+        name="Name",
+        funding_rounds=[
+            FundingRoundModel(name="Seed", announced_on=datetime(2020, 1, 31))
+        ],
+    )
+    assert company.model_fields_set == {"name", "funding_rounds"}
+    assert company.funding_rounds[0].model_fields_set == {"name", "announced_on"}
+    assert list(company.model_dump()) == list(CompanyModel.model_fields)
+
+
+def test_construct_company_matches_validation():
+    items = [full_item(0), partial_item(1), {}]
+
+    for item in items:
+        constructed = construct_company(item)
+        validated = CompanyModel.model_validate(extract_company_fields(item))
+        assert constructed == validated
+        assert constructed.model_dump_json() == validated.model_dump_json()
+        assert constructed.model_fields_set == validated.model_fields_set
+
+
+def test_construct_company_coerces_like_validation():
+    item = full_item(0)
+    item["rank_org_company"] = str(RANK)
+    item["funding_rounds_list"][0]["num_investors"] = str(NUM_INVESTORS)
+
+    constructed = construct_company(item)
+
+    assert constructed == CompanyModel.model_validate(extract_company_fields(item))
+    assert constructed.rank_org_company == RANK
+    funding_round = constructed.model_dump()["funding_rounds"][0]
+    assert funding_round["num_investors"] == NUM_INVESTORS
+    assert LazyCompanyModel.from_item(item).rank_org_company == RANK
+    with pytest.raises(ValidationError):
+        construct_company({**item, "rank_org_company": "first"})
+
+
+def test_lazy_company_model_extracts_on_access():
+    company = LazyCompanyModel.from_item(full_item(0))
+
+    assert isinstance(company, CompanyModel)
+    assert company.name == "Company 0"
+    assert company.__dict__ == {"name": "Company 0"}
+    assert company.location is None
+
+
+@pytest.mark.parametrize("item", [full_item(0), partial_item(1), {}])
+def test_lazy_company_model_serializes_like_company_model(item):
+    company = construct_company(item)
+
+    assert LazyCompanyModel.from_item(item).model_dump() == company.model_dump()
+    assert (
+        LazyCompanyModel.from_item(item).model_dump_json() == company.model_dump_json()
+    )
+    assert LazyCompanyModel.from_item(item) == company
+    assert company == LazyCompanyModel.from_item(item)
+
+
+def test_lazy_company_model_dump_uses_accessed_values():
+    company = LazyCompanyModel.from_item(full_item(0))
+    assert company.funding_rounds is not None
+    company.funding_rounds[0].name = "Renamed"
+    company.name = "Changed"
+
+    dump = company.model_dump()
+
+    assert dump["name"] == "Changed"
+    assert dump["funding_rounds"][0]["name"] == "Renamed"
+    assert (
+        dump["activities"] == construct_company(full_item(0)).model_dump()["activities"]
+    )
+
+
+def test_source_keys():
+    assert source_keys(
+        (
+            FieldSpec("name", ("identifier", "value")),
+            FieldSpec("permalink", ("identifier", "permalink")),
+            FieldSpec(
+                "deal",
+                (),
+                "object",
+                (
+                    FieldSpec("usd", ("price", "value")),
+                    FieldSpec("id", ("identifier",)),
+                ),
+            ),
+        )
+    ) == ["identifier", "price"]
+
+
+def test_crawl_profiles():
+    assert set(CRAWL_PROFILES) == set(typing.get_args(CrawlProfileName))
+    lite, standard, full = (
+        {field.name for field in CRAWL_PROFILES[profile]}
+        for profile in ("lite", "standard", "full")
+    )
+    assert lite < standard < full
+    assert {"total_funding_usd", "num_employees_enum"} <= lite
+    assert "activities" not in standard
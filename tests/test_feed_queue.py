@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from parma_mining.crunchbase.analytics_client import AnalyticsClient
+from parma_mining.crunchbase.feed_queue import FeedQueue
+from parma_mining.crunchbase.model import CompanyModel, ErrorInfoModel, ResponseModel
+from parma_mining.crunchbase.snapshot_store import SnapshotStore
+from parma_mining.mining_common.exceptions import AnalyticsError, CrawlingError
+
+TOKEN = "mocked_token"
+COMPANIES = 10
+# the fed company and the failing one, checked again after its failure
+NEW_SNAPSHOTS = 3
+
+
+def response(company_id: str) -> ResponseModel:
+    return ResponseModel(
+        source_name="crunchbase",
+        company_id=company_id,
+        raw_data=CompanyModel(name=company_id),
+    )
+
+
+def test_feed_queue_drains_and_collects_errors(mocker):
+    mocker.patch.object(FeedQueue, "max_size", 2)
+    mocker.patch.object(FeedQueue, "workers", 2)
+    mocker.patch.object(FeedQueue, "batch_size", 3)
+    fed = []
+    flushes = []
+    original_flush = FeedQueue._flush
+
+    async def flush(self, batch):
+        flushes.append(len(batch))
+        await original_flush(self, batch)
+
+    mocker.patch.object(FeedQueue, "_flush", flush)
+
+    async def feed_raw_data(token, data, raw_data=None):
+        await asyncio.sleep(0.001)
+        if data.company_id == "company3":
+            raise AnalyticsError("Feed failed")
+        fed.append(data.company_id)
+
+    analytics_client = MagicMock()
+    analytics_client.feed_raw_data = feed_raw_data
+    errors: dict[str, ErrorInfoModel] = {}
+
+    async def produce():
+        async with FeedQueue(analytics_client, TOKEN, errors) as feed_queue:
+            for index in range(COMPANIES):
+                await feed_queue.put(response(f"company{index}"))
+                # the producer is never more than the queue size ahead
+                assert feed_queue._queue.qsize() <= FeedQueue.max_size
+        return feed_queue
+
+    feed_queue = asyncio.run(produce())
+
+    assert len(fed) == COMPANIES - 1
+    assert list(errors) == ["company3"]
+    assert errors["company3"].error_type == "AnalyticsError"
+    assert sum(flushes) == COMPANIES
+    assert max(flushes) <= FeedQueue.batch_size
+    assert feed_queue._queue.empty()
+    assert all(worker.done() for worker in feed_queue._workers)
+
+
+def test_feed_queue_reports_extraction_errors_as_crawling_errors():
+    fed = []
+
+    async def feed_raw_data(token, data, raw_data=None):
+        fed.append(data.company_id)
+
+    def raw_data(data):
+        # a lazily extracted company fails to extract its fields when dumped
+        if data.company_id == "broken":
+            raise ValueError("time data 'not a date' does not match format")
+        return AnalyticsClient.raw_data(data)
+
+    analytics_client = MagicMock()
+    analytics_client.feed_raw_data = feed_raw_data
+    analytics_client.raw_data = raw_data
+    errors: dict[str, ErrorInfoModel] = {}
+
+    async def produce():
+        async with FeedQueue(analytics_client, TOKEN, errors) as feed_queue:
+            for company_id in ["company", "broken"]:
+                await feed_queue.put(response(company_id))
+
+    asyncio.run(produce())
+
+    assert fed == ["company"]
+    assert list(errors) == ["broken"]
+    assert errors["broken"].error_type == CrawlingError.__name__
+
+
+def test_feed_queue_skips_unchanged_snapshots(mocker):
+    mocker.patch.object(SnapshotStore, "mode", "skip")
+    snapshots = SnapshotStore(":memory:")
+    fed = []
+
+    async def feed_raw_data(token, data, raw_data=None):
+        if data.company_id == "failing":
+            raise AnalyticsError("Feed failed")
+        fed.append((data.company_id, raw_data))
+
+    analytics_client = MagicMock()
+    analytics_client.feed_raw_data = feed_raw_data
+    analytics_client.raw_data = AnalyticsClient.raw_data
+    errors: dict[str, ErrorInfoModel] = {}
+
+    async def produce():
+        async with FeedQueue(analytics_client, TOKEN, errors, snapshots) as queue:
+            for company_id in ["company", "failing"]:
+                await queue.put(response(company_id))
+
+    asyncio.run(produce())
+    asyncio.run(produce())
+
+    assert [company_id for company_id, _ in fed] == ["company"]
+    assert fed[0][1]["name"] == "company"
+    assert list(errors) == ["failing"]
+    # the failed company was not saved and is checked as new again
+    assert snapshots.stats()["new"] == NEW_SNAPSHOTS
+    assert snapshots.stats()["unchanged"] == 1
@@ -0,0 +1,83 @@
+import gzip
+from datetime import datetime
+
+import pytest
+
+from parma_mining.mining_common.item_archive import ItemArchive
+
+MONTHS = [datetime(2024, month, 1) for month in (1, 2, 3)]
+# two versions of "a" and one of "b"
+ARCHIVED_ITEMS = 3
+
+
+def item(permalink: str, rank: int) -> dict:
+    return {"identifier": {"permalink": permalink}, "rank_org_company": rank}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = ItemArchive(str(tmp_path))
+    yield archive
+    archive.close()
+
+
+def test_item_archive_random_access(archive):
+    for month, crawled_at in enumerate(MONTHS):
+        archive.append(
+            [("a", item("a", month)), ("b", b'{"rank_org_company":7}\n')], crawled_at
+        )
+
+    assert archive.get("a") == item("a", 2)
+    assert archive.get("a", at=datetime(2024, 2, 15)) == item("a", 1)
+    assert archive.get("a", at=datetime(2023, 1, 1)) is None
+    assert archive.get("b") == {"rank_org_company": 7}
+    assert archive.get("missing") is None
+    assert [version.crawled_at for version in archive.versions("a")] == MONTHS
+
+
+def test_item_archive_streams_segments(tmp_path, mocker):
+    mocker.patch.object(ItemArchive, "segment_size", 1)
+    archive = ItemArchive(str(tmp_path))
+    for month, crawled_at in enumerate(MONTHS):
+        archive.append([("a", item("a", month))], crawled_at)
+
+    assert archive.stats()["segments"] == len(MONTHS)
+    ranks = [archived["rank_org_company"] for _, _, archived in archive.iter_items()]
+    assert ranks == [0, 1, 2]
+    assert [crawled_at for _, crawled_at, _ in archive.iter_items(MONTHS[1])] == (
+        MONTHS[1:]
+    )
+    # every segment is a plain compressed JSONL file
+    first = sorted(tmp_path.glob("segment-*.jsonl.gz"))[0]
+    assert gzip.decompress(first.read_bytes()).count(b"\n") == 1
+
+
+def test_item_archive_reopens_index(tmp_path):
+    archive = ItemArchive(str(tmp_path))
+    archive.append([("a", item("a", 1)), ("b", item("b", 2))], MONTHS[0])
+    archive.close()
+    with open(next(tmp_path.glob("*.idx")), "a") as index_file:
+        index_file.write('["c", "2024-')
+
+    reopened = ItemArchive(str(tmp_path))
+    reopened.append([("a", item("a", 3))], MONTHS[1])
+
+    assert reopened.get("b") == item("b", 2)
+    assert reopened.get("a") == item("a", 3)
+    assert reopened.stats()["items"] == ARCHIVED_ITEMS
+    reopened.close()
+
+
+def test_item_archive_streams_past_corrupt_index_entry(tmp_path):
+    archive = ItemArchive(str(tmp_path))
+    archive.append([(key, item(key, rank)) for rank, key in enumerate("abc")])
+    archive.close()
+    index_path = next(tmp_path.glob("*.idx"))
+    lines = index_path.read_text().splitlines(keepends=True)
+    index_path.write_text(lines[0] + '["b", "2024-\n' + lines[2])
+
+    reopened = ItemArchive(str(tmp_path))
+    streamed = {key: archived for key, _, archived in reopened.iter_items()}
+
+    assert streamed == {"a": item("a", 0), "c": item("c", 2)}
+    reopened.close()
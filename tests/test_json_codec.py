@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from parma_mining.mining_common import json_codec
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"name": "Änderung ✓", "rank": 1, "pct": 5.0, "tiny": 1e-05, "none": None},
+        [{"nested": {"list": [1, 2.5, "three"]}}],
+        {"unicode": "日本語", "escaped": 'quote " and \\ backslash'},
+    ],
+)
+def test_encode_matches_httpx(data):
+    assert json_codec.encode(data) == httpx.Request("POST", "/", json=data).content
+
+
+def test_encode_datetime_as_str():
+    date = datetime(2022, 1, 20, 13, 5, 1)
+    assert json_codec.encode({"date": date}) == b'{"date":"2022-01-20 13:05:01"}'
+
+
+def test_encode_rejects_nan():
+    with pytest.raises(ValueError):
+        json_codec.encode({"pct": float("nan")})
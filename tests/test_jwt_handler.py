@@ -1,3 +1,4 @@
+import time
 from unittest.mock import patch
 
 import pytest
@@ -5,6 +6,15 @@ from jose.exceptions import ExpiredSignatureError, JWTError
 
 from parma_mining.mining_common.jwt_handler import JWTHandler
 
+VERIFICATIONS = 2
+
+
+@pytest.fixture(autouse=True)
+def clear_jwt_cache():
+    JWTHandler.clear_cache()
+    yield
+    JWTHandler.clear_cache()
+
 
 @pytest.fixture
 def valid_jwt():
@@ -43,3 +53,27 @@ def test_verify_jwt_with_invalid_token(invalid_jwt):
         mock_decode.assert_called_once_with(
             invalid_jwt, JWTHandler.SHARED_SECRET_KEY, algorithms=[JWTHandler.ALGORITHM]
         )
+
+
+def test_verify_jwt_cached(valid_jwt, invalid_jwt):
+    claims = {"exp": time.time() + 60}
+    with patch("jose.jwt.decode", return_value=claims) as mock_decode:
+        assert JWTHandler.verify_jwt(valid_jwt) is True
+        assert JWTHandler.verify_jwt(valid_jwt) is True
+        mock_decode.assert_called_once()
+
+    with patch("jose.jwt.decode", side_effect=JWTError) as mock_decode:
+        assert JWTHandler.verify_jwt(invalid_jwt) is False
+        assert JWTHandler.verify_jwt(invalid_jwt) is False
+        mock_decode.assert_called_once()
+
+    stats = JWTHandler.stats()
+    assert stats["verified"]["hits"] == 1
+    assert stats["rejected"]["hits"] == 1
+
+
+def test_verify_jwt_cache_expires_with_token(valid_jwt):
+    with patch("jose.jwt.decode", return_value={"exp": time.time() - 1}) as mock_decode:
+        for _ in range(VERIFICATIONS):
+            assert JWTHandler.verify_jwt(valid_jwt) is True
+        assert mock_decode.call_count == VERIFICATIONS
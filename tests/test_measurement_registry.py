@@ -0,0 +1,27 @@
+from parma_mining.crunchbase.measurement_registry import MeasurementRegistry
+
+MEASUREMENT_ID = 7
+
+
+def test_measurement_registry_matches_fingerprint():
+    registry = MeasurementRegistry(":memory:")
+    fingerprint = registry.fingerprint({"type": "int", "measurement_name": "count"})
+    registry.put(1, '["count"]', fingerprint, MEASUREMENT_ID)
+
+    assert registry.get(1, '["count"]', fingerprint) == MEASUREMENT_ID
+    assert registry.get(1, '["count"]', registry.fingerprint({"type": "text"})) is None
+    assert registry.get(2, '["count"]', fingerprint) is None
+
+
+def test_measurement_registry_persists_maps(tmp_path):
+    path = str(tmp_path / "measurements.sqlite3")
+    mapping = {"Mappings": [{"source_measurement_id": 7}]}
+    MeasurementRegistry(path).put_map(1, "digest", [{"id": 7}], mapping)
+
+    registry = MeasurementRegistry(path)
+    assert registry.get_map(1, "digest") == ([{"id": 7}], mapping)
+    assert registry.get_map(1, "changed") is None
+
+    registry.clear(1)
+    assert registry.get_map(1, "digest") is None
+    assert registry.stats()["source_modules"] == 0
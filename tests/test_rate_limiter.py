@@ -0,0 +1,27 @@
+from parma_mining.mining_common.rate_limiter import TokenBucket
+
+
+def test_token_bucket_allows_burst_then_waits(mocker):
+    clock = {"now": 0.0}
+    mocker.patch("time.monotonic", side_effect=lambda: clock["now"])
+
+    def sleep(seconds):
+        clock["now"] += seconds
+
+    mock_sleep = mocker.patch("time.sleep", side_effect=sleep)
+    bucket = TokenBucket(rate=0.5, capacity=2)
+
+    bucket.acquire()
+    bucket.acquire()
+    mock_sleep.assert_not_called()
+
+    bucket.acquire()
+    assert clock["now"] == 1 / bucket.rate
+
+
+def test_token_bucket_without_limit(mocker):
+    mock_sleep = mocker.patch("time.sleep")
+    bucket = TokenBucket(rate=0)
+    for _ in range(10):
+        bucket.acquire()
+    mock_sleep.assert_not_called()
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from parma_mining.crunchbase.snapshot_store import SnapshotStore
+
+
+@pytest.fixture
+def store(mocker):
+    mocker.patch.object(SnapshotStore, "mode", "diff")
+    mocker.patch.object(SnapshotStore, "diff_max_fields", 1)
+    return SnapshotStore(":memory:")
+
+
+def payload(**changes) -> dict:
+    return {
+        "name": "Company",
+        "permalink": "company",
+        "founded_on": datetime(2020, 1, 31),
+        "num_employees_enum": "c_00011_00050",
+        "total_funding_usd": 100,
+        **changes,
+    }
+
+
+def test_snapshot_store_skips_unchanged(store):
+    fed, snapshot = store.check("1", "company", payload())
+    assert fed == payload()
+    store.save(snapshot)
+
+    fed, _ = store.check("1", "company", payload())
+    assert fed is None
+    # another company with the same permalink has its own snapshot
+    fed, _ = store.check("2", "company", payload())
+    assert fed == payload()
+
+
+def test_snapshot_store_diffs_changed_fields(store):
+    store.save(store.check("1", "company", payload())[1])
+
+    fed, snapshot = store.check("1", "company", payload(total_funding_usd=200))
+    assert fed == {"permalink": "company", "total_funding_usd": 200}
+    store.save(snapshot)
+    fed, _ = store.check("1", "company", payload(total_funding_usd=200))
+    assert fed is None
+
+    changed = payload(total_funding_usd=300, num_employees_enum="c_00051_00100")
+    fed, _ = store.check("1", "company", changed)
+    assert fed == changed
+
+
+def test_snapshot_store_merges_partial_payloads(store):
+    store.save(store.check("1", "company", payload())[1])
+    lite = {"permalink": "company", "total_funding_usd": 100}
+
+    fed, snapshot = store.check("1", "company", lite)
+    assert fed is None
+    store.save(snapshot)
+    assert store.check("1", "company", payload())[0] is None
+
+
+def test_snapshot_store_stats(store):
+    store.save(store.check("1", "company", payload())[1])
+    store.check("1", "company", payload())
+
+    stats = store.stats()
+    assert stats["new"] == 1
+    assert stats["unchanged"] == 1
+    assert stats["unchanged_rate"] == stats["unchanged"] / 2
+    assert stats["saved_bytes"] == stats["payload_bytes"] / 2
+    assert stats["entries"] == 1
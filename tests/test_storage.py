@@ -0,0 +1,33 @@
+from parma_mining.crunchbase.discovery_cache import DiscoveryCache
+from parma_mining.mining_common.storage import cache_dir, store_path
+
+URLS = ["https://www.crunchbase.com/organization/test"]
+
+
+def test_store_opened_on_first_use(tmp_path):
+    cache = DiscoveryCache()
+    path = cache_dir() / DiscoveryCache.file_name
+    assert path.parent == tmp_path / "cache"
+    assert not path.exists()
+
+    cache.put("Test", URLS)
+
+    assert path.exists()
+    assert cache.get("test") == URLS
+
+
+def test_store_path_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISCOVERY_CACHE_PATH", str(tmp_path / "discovery.db"))
+    assert store_path("DISCOVERY_CACHE_PATH", "discovery.sqlite3") == str(
+        tmp_path / "discovery.db"
+    )
+
+
+def test_store_falls_back_to_memory(tmp_path):
+    # the parent of the database is a file, so the directory cannot be created
+    (tmp_path / "file").touch()
+    cache = DiscoveryCache(str(tmp_path / "file" / "discovery.sqlite3"))
+
+    cache.put("Test", URLS)
+
+    assert cache.get("test") == URLS